@@ -0,0 +1,7 @@
+"""
+Potter build and release toolkit
+Each module also runs as a script (python3 scripts/build_app.py), so sibling
+imports are relative when the module is loaded as part of this package and
+plain when it runs from the scripts directory, which Python puts on sys.path
+for a script anyway. Importing the package never touches sys.path.
+"""
@@ -0,0 +1,5 @@
+"""python3 -m scripts <command> ..."""
+
+from .cli import main
+
+main()
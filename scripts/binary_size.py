@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Binary size attribution for Potter
+Reads the section and symbol tables of a Mach-O executable (thin or
+universal) directly, sizes each symbol by the distance to the next one in its
+section, and attributes code and data to Swift modules and types by decoding
+the leading context of each mangled name. Reports are saved per version so
+two releases can be diffed to see which types grew.
+"""
+
+import json
+import os
+import shutil
+import struct
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+if __package__:
+    from .build_cache import get_cache_dir, write_json
+    from .bundle_metadata import load_metadata
+else:
+    from build_cache import get_cache_dir, write_json
+    from bundle_metadata import load_metadata
+
+FAT_MAGIC = 0xcafebabe
+FAT_MAGIC_64 = 0xcafebabf
+MH_MAGIC_64 = 0xfeedfacf
+LC_SEGMENT_64 = 0x19
+LC_SYMTAB = 0x2
+
+CPU_TYPES = {0x01000007: 'x86_64', 0x0100000c: 'arm64'}
+
+N_STAB = 0xe0
+N_TYPE = 0x0e
+N_SECT = 0x0e
+
+S_ZEROFILL = 0x1
+S_GB_ZEROFILL = 0xc
+S_THREAD_LOCAL_ZEROFILL = 0x12
+S_ATTR_PURE_INSTRUCTIONS = 0x80000000
+S_ATTR_SOME_INSTRUCTIONS = 0x00000400
+
+# Swift 5+ ('$s'), pre-stable ('$S') and Swift 4 ('_T0') mangling prefixes
+SWIFT_PREFIXES = ('_$s', '$s', '_$S', '$S', '_T0')
+# Nominal type kinds that end a context identifier
+NOMINAL_KINDS = {'C': 'class', 'V': 'struct', 'O': 'enum', 'P': 'protocol', 'a': 'typealias'}
+STANDARD_TYPES = {
+    'a': 'Array', 'b': 'Bool', 'D': 'Dictionary', 'd': 'Double', 'f': 'Float', 'h': 'Set',
+    'i': 'Int', 'J': 'Character', 'q': 'Optional', 'S': 'String', 's': 'Substring', 'u': 'UInt',
+    'N': 'ClosedRange', 'n': 'Range', 'R': 'UnsafeBufferPointer', 'r': 'UnsafeRawBufferPointer',
+    'P': 'UnsafePointer', 'p': 'UnsafeMutablePointer', 'V': 'UnsafeRawPointer',
+    'v': 'UnsafeMutableRawPointer', 'E': 'Encodable', 'e': 'Decodable', 'H': 'Hashable',
+    'Q': 'Equatable', 'L': 'Comparable', 'T': 'Sequence', 'l': 'Collection', 'j': 'Numeric',
+    'y': 'StringProtocol', 'G': 'RandomNumberGenerator', 'g': 'RangeReplaceableCollection',
+}
+MAX_WORDS = 26
+
+# Release reports live next to the appcast rather than in build/cache, so
+# 'make clean' does not wipe the history binary-size-diff compares against
+REPORTS_DIR = "releases/binary-size"
+
+
+class Section:
+    """One Mach-O section"""
+
+    def __init__(self, segment: str, name: str, address: int, size: int, flags: int):
+        self.segment = segment
+        self.name = name
+        self.address = address
+        self.size = size
+        self.flags = flags
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.segment},{self.name}"
+
+    @property
+    def kind(self) -> str:
+        """'text' for code, 'data' for everything else"""
+        if self.flags & (S_ATTR_PURE_INSTRUCTIONS | S_ATTR_SOME_INSTRUCTIONS):
+            return 'text'
+        return 'data'
+
+    @property
+    def on_disk(self) -> bool:
+        return (self.flags & 0xff) not in (S_ZEROFILL, S_GB_ZEROFILL, S_THREAD_LOCAL_ZEROFILL)
+
+
+class Symbol:
+    """A defined symbol with its inferred size"""
+
+    def __init__(self, name: str, address: int, section: Section):
+        self.name = name
+        self.address = address
+        self.section = section
+        self.size = 0
+
+
+class MachOBinary:
+    """Sections and sized symbols of one architecture slice"""
+
+    def __init__(self, data: bytes, arch: Optional[str] = None):
+        self.arch, offset = self._select_slice(data, arch)
+        self.sections = []
+        self.symbols = []
+        self._parse(data, offset)
+
+    @classmethod
+    def load(cls, path: str, arch: Optional[str] = None) -> 'MachOBinary':
+        with open(path, 'rb') as f:
+            return cls(f.read(), arch)
+
+    @staticmethod
+    def _select_slice(data: bytes, arch: Optional[str]) -> Tuple[str, int]:
+        magic = struct.unpack_from('>I', data, 0)[0]
+        if magic in (FAT_MAGIC, FAT_MAGIC_64):
+            count = struct.unpack_from('>I', data, 4)[0]
+            slices = {}
+            for i in range(count):
+                if magic == FAT_MAGIC:
+                    cpu, _, offset, _, _ = struct.unpack_from('>iiIII', data, 8 + i * 20)
+                else:
+                    cpu, _, offset, _, _, _ = struct.unpack_from('>iiQQII', data, 8 + i * 32)
+                slices[CPU_TYPES.get(cpu & 0xffffffff, hex(cpu))] = offset
+            wanted = arch or ('arm64' if 'arm64' in slices else next(iter(slices)))
+            if wanted not in slices:
+                raise ValueError(f"No {wanted} slice (have {', '.join(slices)})")
+            return wanted, slices[wanted]
+
+        if struct.unpack_from('<I', data, 0)[0] != MH_MAGIC_64:
+            raise ValueError("Not a 64-bit Mach-O binary")
+        cpu = struct.unpack_from('<i', data, 4)[0]
+        found = CPU_TYPES.get(cpu & 0xffffffff, hex(cpu))
+        if arch and arch != found:
+            raise ValueError(f"Binary is {found}, not {arch}")
+        return found, 0
+
+    def _parse(self, data: bytes, base: int):
+        ncmds = struct.unpack_from('<I', data, base + 16)[0]
+        offset = base + 32
+        symtab = None
+        for _ in range(ncmds):
+            cmd, cmdsize = struct.unpack_from('<II', data, offset)
+            if cmd == LC_SEGMENT_64:
+                nsects = struct.unpack_from('<I', data, offset + 64)[0]
+                for i in range(nsects):
+                    header = offset + 72 + i * 80
+                    sectname, segname = struct.unpack_from('<16s16s', data, header)
+                    address, size = struct.unpack_from('<QQ', data, header + 32)
+                    flags = struct.unpack_from('<I', data, header + 64)[0]
+                    self.sections.append(Section(segname.rstrip(b'\0').decode('ascii', 'replace'),
+                                                 sectname.rstrip(b'\0').decode('ascii', 'replace'),
+                                                 address, size, flags))
+            elif cmd == LC_SYMTAB:
+                symtab = struct.unpack_from('<IIII', data, offset + 8)
+            offset += cmdsize
+
+        if symtab:
+            self._read_symbols(data, base, *symtab)
+
+    def _read_symbols(self, data: bytes, base: int, symoff: int, nsyms: int, stroff: int, strsize: int):
+        strings = data[base + stroff:base + stroff + strsize]
+        by_section = {}
+        for i in range(nsyms):
+            strx, n_type, n_sect, _, value = struct.unpack_from('<IBBHQ', data, base + symoff + i * 16)
+            if n_type & N_STAB or n_type & N_TYPE != N_SECT or not 0 < n_sect <= len(self.sections):
+                continue
+            end = strings.find(b'\0', strx)
+            name = strings[strx:end].decode('utf-8', 'replace')
+            section = self.sections[n_sect - 1]
+            symbol = Symbol(name, value, section)
+            self.symbols.append(symbol)
+            by_section.setdefault(n_sect - 1, []).append(symbol)
+
+        # A symbol extends to the next address in its section; aliases at
+        # the same address count once
+        for index, symbols in by_section.items():
+            section = self.sections[index]
+            symbols.sort(key=lambda s: (s.address, s.name))
+            for current, following in zip(symbols, symbols[1:] + [None]):
+                end = following.address if following else section.address + section.size
+                current.size = max(0, end - current.address)
+
+
+# ── Symbol names ──────────────────────────────────────────────
+
+class _SwiftContextReader:
+    """Reads the module and leading nominal types of a mangled Swift name
+
+    Handles length-prefixed identifiers with word substitutions, standard
+    type substitutions and the ObjC/C module ('So'); everything after the
+    leading context (members, signatures, suffixes) is ignored.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.words = []
+
+    def peek(self) -> str:
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+
+    def next(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def number(self) -> Optional[int]:
+        start = self.pos
+        while self.peek().isdigit():
+            self.pos += 1
+        return int(self.text[start:self.pos]) if self.pos > start else None
+
+    def identifier(self) -> Optional[str]:
+        if not self.peek().isdigit():
+            return None
+        word_substitutions = False
+        if self.peek() == '0':
+            self.pos += 1
+            if self.peek() == '0':
+                # Punycode (non-ASCII) identifiers are rare enough to skip
+                return None
+            word_substitutions = True
+
+        identifier = ''
+        while True:
+            while word_substitutions and self.peek().isalpha():
+                char = self.next()
+                index = ord(char.lower()) - ord('a')
+                if char.isupper():
+                    word_substitutions = False
+                if index >= len(self.words):
+                    return None
+                identifier += self.words[index]
+            if self.peek() == '0':
+                self.pos += 1
+                break
+            length = self.number()
+            if not length or self.pos + length > len(self.text):
+                return None if not identifier else identifier
+            chunk = self.text[self.pos:self.pos + length]
+            self.pos += length
+            identifier += chunk
+            self._collect_words(chunk)
+            if not word_substitutions:
+                break
+        return identifier
+
+    def _collect_words(self, chunk: str):
+        start = None
+        for index in range(len(chunk) + 1):
+            char = chunk[index] if index < len(chunk) else ''
+            if start is not None and (char in ('_', '') or (char.isupper() and not chunk[index - 1].isupper())):
+                if index - start >= 2 and len(self.words) < MAX_WORDS:
+                    self.words.append(chunk[start:index])
+                start = None
+            if start is None and char and not char.isdigit() and char != '_':
+                start = index
+
+    def context(self) -> Tuple[Optional[str], List[str]]:
+        types = []
+        if self.text.startswith('So', self.pos):
+            self.pos += 2
+            module = '__C'
+        elif self.peek() == 'S' and self.text[self.pos + 1:self.pos + 2] in STANDARD_TYPES:
+            self.pos += 2
+            module = 'Swift'
+            types.append(STANDARD_TYPES[self.text[self.pos - 1]])
+        elif self.peek() == 's' and not self.text[self.pos + 1:self.pos + 2].isdigit():
+            self.pos += 1
+            module = 'Swift'
+        else:
+            module = self.identifier()
+            if module is None:
+                return None, []
+
+        while True:
+            start = self.pos
+            name = self.identifier()
+            if name is None or self.peek() not in NOMINAL_KINDS:
+                self.pos = start
+                break
+            self.pos += 1
+            types.append(name)
+        # An extension in another module ('<type> <module> E') belongs to that module
+        start = self.pos
+        extending_module = self.identifier()
+        if extending_module and self.peek() == 'E':
+            return extending_module, types
+        self.pos = start
+        return module, types
+
+
+def split_symbol(name: str) -> Tuple[str, str]:
+    """(module, type) a symbol's size is attributed to"""
+    for prefix in SWIFT_PREFIXES:
+        if name.startswith(prefix):
+            module, types = _SwiftContextReader(name[len(prefix):]).context()
+            if module is None:
+                return '(swift)', ''
+            if module == '__C':
+                module = '(objc)'
+            return module, '.'.join(types)
+
+    bare = name[1:] if name.startswith('_') else name
+    if bare.startswith(('-[', '+[')):
+        return '(objc)', bare[2:].split(' ', 1)[0].split('(', 1)[0]
+    for prefix in ('OBJC_CLASS_$_', 'OBJC_METACLASS_$_', 'OBJC_IVAR_$_'):
+        if bare.startswith(prefix):
+            return '(objc)', bare[len(prefix):].split('.', 1)[0]
+    return '(c)', ''
+
+
+def demangle_names(names: List[str]) -> Dict[str, str]:
+    """Readable names via swift-demangle when the toolchain provides it"""
+    tool = shutil.which('swift-demangle')
+    if not tool and shutil.which('xcrun'):
+        found = subprocess.run(['xcrun', '--find', 'swift-demangle'], capture_output=True, text=True)
+        tool = found.stdout.strip() if found.returncode == 0 else None
+    if not tool or not names:
+        return {name: name for name in names}
+
+    result = subprocess.run([tool, '--simplified', '--compact'], input='\n'.join(names),
+                            capture_output=True, text=True)
+    lines = result.stdout.splitlines()
+    if result.returncode != 0 or len(lines) != len(names):
+        return {name: name for name in names}
+    return dict(zip(names, lines))
+
+
+# ── Reports ────────────────────────────────────────────────────
+
+def analyze(binary: MachOBinary, top: int = 50) -> Dict:
+    """Size by section, module and type, plus the largest symbols"""
+    modules = {}
+    types = {}
+    sections = {}
+    attributed = {}
+
+    for section in binary.sections:
+        if section.on_disk:
+            sections[section.full_name] = section.size
+
+    for symbol in binary.symbols:
+        if not symbol.size or not symbol.section.on_disk:
+            continue
+        module, type_name = split_symbol(symbol.name)
+        kind = symbol.section.kind
+        entry = modules.setdefault(module, {'text': 0, 'data': 0})
+        entry[kind] += symbol.size
+        if type_name:
+            entry = types.setdefault(f"{module}.{type_name}", {'text': 0, 'data': 0})
+            entry[kind] += symbol.size
+        attributed[symbol.section.full_name] = attributed.get(symbol.section.full_name, 0) + symbol.size
+
+    largest = sorted((s for s in binary.symbols if s.size), key=lambda s: -s.size)[:top]
+    readable = demangle_names([s.name for s in largest])
+    return {
+        'arch': binary.arch,
+        'total': sum(sections.values()),
+        'unattributed': sum(sections.values()) - sum(attributed.values()),
+        'sections': sections,
+        'modules': modules,
+        'types': types,
+        'symbols': [{'name': readable[s.name], 'section': s.section.full_name, 'size': s.size} for s in largest],
+    }
+
+
+def find_executable(path: str) -> str:
+    """The main executable of an .app, or path itself"""
+    if path.endswith('.app') and os.path.isdir(path):
+        metadata = load_metadata(os.path.join(path, 'Contents', 'Info.plist'))
+        name = metadata.executable or os.path.basename(path)[:-4]
+        return os.path.join(path, 'Contents', 'MacOS', name)
+    return path
+
+
+def report_path(version: str) -> str:
+    return os.path.join(REPORTS_DIR, f"{version}.json")
+
+
+def _saved_report_path(version: str) -> Optional[str]:
+    # Reports saved before they moved out of the build cache are still read
+    for path in (report_path(version), os.path.join(get_cache_dir('binary_size'), f"{version}.json")):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def save_report(report: Dict, version: str) -> str:
+    path = report_path(version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_json(path, report, indent=2, sort_keys=True)
+    return path
+
+
+def load_report(source: str) -> Dict:
+    """A report from a JSON file, a saved version, an .app or an executable"""
+    if source.endswith('.json') and os.path.exists(source):
+        with open(source) as f:
+            return json.load(f)
+    saved = None if os.path.exists(source) else _saved_report_path(source)
+    if saved:
+        with open(saved) as f:
+            return json.load(f)
+    return analyze(MachOBinary.load(find_executable(source)))
+
+
+def record_binary_size(app_path: str) -> Optional[str]:
+    """Save a report for a freshly built release bundle under its version
+
+    Only call this for release builds: reports are keyed by version alone, so
+    a dev build would replace the release it is compared against. Size
+    tracking must never fail a build, so unreadable binaries are only reported.
+    """
+    try:
+        version = load_metadata(os.path.join(app_path, 'Contents', 'Info.plist')).version
+        report = analyze(MachOBinary.load(find_executable(app_path)))
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️  Binary size not recorded: {e}")
+        return None
+
+    path = save_report(report, version)
+    largest = sorted(report['types'].items(), key=lambda t: -_total(t[1]))[:3]
+    print(f"📏 Executable {_kb(report['total']).strip()} ({report['arch']}); largest types: "
+          f"{', '.join(f'{name} {_kb(_total(sizes)).strip()}' for name, sizes in largest) or 'none'}")
+    return path
+
+
+def _total(sizes: Dict[str, int]) -> int:
+    return sizes['text'] + sizes['data']
+
+
+def diff_reports(old: Dict, new: Dict, key: str = 'types') -> List[Tuple[str, int, int]]:
+    """(name, old size, new size) for entries that changed, largest change first"""
+    names = set(old[key]) | set(new[key])
+    empty = {'text': 0, 'data': 0}
+    changes = []
+    for name in names:
+        before = _total(old[key].get(name, empty))
+        after = _total(new[key].get(name, empty))
+        if before != after:
+            changes.append((name, before, after))
+    return sorted(changes, key=lambda change: (-abs(change[2] - change[1]), change[0]))
+
+
+def _kb(size: int) -> str:
+    return f"{size / 1024:9.1f} KB"
+
+
+def print_report(report: Dict, count: int = 20):
+    print(f"📦 {report['arch']}: {_kb(report['total']).strip()} on disk "
+          f"({_kb(report['unattributed']).strip()} not covered by symbols)")
+    print("\n🧩 Modules (text + data):")
+    for module, sizes in sorted(report['modules'].items(), key=lambda m: -_total(m[1]))[:count]:
+        print(f"   {_kb(_total(sizes))}  {module}  (text {_kb(sizes['text']).strip()}, data {_kb(sizes['data']).strip()})")
+    print(f"\n🏷️  Largest {count} types:")
+    for name, sizes in sorted(report['types'].items(), key=lambda t: -_total(t[1]))[:count]:
+        print(f"   {_kb(_total(sizes))}  {name}")
+    print(f"\n🔬 Largest {min(count, len(report['symbols']))} symbols:")
+    for symbol in report['symbols'][:count]:
+        print(f"   {_kb(symbol['size'])}  {symbol['name']}")
+
+
+def print_diff(old: Dict, new: Dict, count: int = 20):
+    delta = new['total'] - old['total']
+    print(f"📦 {_kb(old['total']).strip()} → {_kb(new['total']).strip()} ({'+' if delta >= 0 else ''}{delta / 1024:.1f} KB)")
+    for key, title in (('modules', '🧩 Modules'), ('types', '🏷️  Types')):
+        changes = diff_reports(old, new, key)
+        if not changes:
+            continue
+        print(f"\n{title} that changed most:")
+        for name, before, after in changes[:count]:
+            change = after - before
+            print(f"   {'+' if change > 0 else '-'}{abs(change) / 1024:8.1f} KB  {name}"
+                  f"{'  (new)' if not before else '  (removed)' if not after else ''}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Attribute executable size to Swift modules and types')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze_parser = subparsers.add_parser('analyze', help='Report sizes for an .app or executable')
+    analyze_parser.add_argument('path')
+    analyze_parser.add_argument('--arch', help='Slice of a universal binary (default: arm64)')
+    analyze_parser.add_argument('--save', metavar='VERSION', help='Keep the report for later diffs')
+    analyze_parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    analyze_parser.add_argument('--top', type=int, default=20)
+
+    diff_parser = subparsers.add_parser('diff', help='Compare two versions, reports, apps or executables')
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new')
+    diff_parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'analyze':
+            report = analyze(MachOBinary.load(find_executable(args.path), args.arch))
+            if args.save:
+                print(f"💾 Saved {save_report(report, args.save)}")
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print_report(report, args.top)
+        else:
+            print_diff(load_report(args.old), load_report(args.new), args.top)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -10,14 +10,61 @@ import subprocess
 import shutil
 import json
 import argparse
+import plistlib
+import tempfile
 from pathlib import Path
 import uuid
 from datetime import datetime
 
+# Only what every build needs is imported here; the DMG, notarization, test
+# and size-report modules are imported by the steps that use them
+if __package__:
+    from .signing_utils import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_SIGNING_WORKERS,
+        CodesignBackend,
+        SigningScheduler,
+        discover_signing_plan,
+        get_cdhash,
+        resolve_signing_identity,
+        verify_components,
+    )
+    from .build_manifest import (
+        create_manifest,
+        diff_manifests,
+        hash_file,
+        load_manifest,
+        save_manifest,
+        tree_digest,
+    )
+    from .bundle_metadata import SPARKLE_KEYS, load_metadata
+else:
+    from signing_utils import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_SIGNING_WORKERS,
+        CodesignBackend,
+        SigningScheduler,
+        discover_signing_plan,
+        get_cdhash,
+        resolve_signing_identity,
+        verify_components,
+    )
+    from build_manifest import (
+        create_manifest,
+        diff_manifests,
+        hash_file,
+        load_manifest,
+        save_manifest,
+        tree_digest,
+    )
+    from bundle_metadata import SPARKLE_KEYS, load_metadata
+
 # Build configuration
 BUNDLE_ID = "com.potter.swift"
 APP_NAME = "Potter"
 SWIFT_PROJECT_DIR = "swift-potter"
+# Relative to SWIFT_PROJECT_DIR; used when tests build alongside the release compile
+TEST_SCRATCH_PATH = ".build-tests"
 
 def get_signing_config():
     """Get code signing configuration from environment"""
@@ -86,8 +133,19 @@ def get_entitlements_file(target='local'):
     print(f"📝 Using entitlements file: {entitlements_file}")
     return entitlements_file
 
-def run_swift_tests():
-    """Run Swift tests and return True if all tests pass"""
+def run_swift_tests(test_shards=None, all_tests=False, use_test_cache=True, scratch_path=None):
+    """Run Swift tests and return True if all tests pass
+
+    Only suites affected by changes since the last green run are tested,
+    unless all_tests is set or a periodic full run is due. Sources that
+    already passed (same hash and toolchain) replay the cached result.
+    scratch_path builds the tests outside .build, e.g. while a release
+    compile holds it.
+    """
+    if __package__:
+        from .swift_test_runner import run_test_gate
+    else:
+        from swift_test_runner import run_test_gate
     print("🧪 Running Swift test suite before build...")
     print("=" * 50)
     
@@ -96,28 +154,12 @@ def run_swift_tests():
         return False
     
     try:
-        # Change to Swift project directory
-        original_cwd = os.getcwd()
-        os.chdir(SWIFT_PROJECT_DIR)
-        
-        # Run Swift tests with single worker to avoid test isolation issues
-        result = subprocess.run(
-            ['swift', 'test', '--parallel', '--num-workers', '1'],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout for tests (longer due to single worker)
-        )
-        
-        # Return to original directory
-        os.chdir(original_cwd)
+        # Isolated shards replace '--num-workers 1', which was needed because
+        # tests shared HOME, Application Support and the pasteboard
+        passed = run_test_gate(SWIFT_PROJECT_DIR, shard_count=test_shards, all_tests=all_tests,
+                               use_cache=use_test_cache, scratch_path=scratch_path)
         
-        # Print test output
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr)
-        
-        if result.returncode == 0:
+        if passed:
             print("✅ All Swift tests passed! Proceeding with build...")
             return True
         else:
@@ -125,67 +167,88 @@ def run_swift_tests():
             print("💡 Fix failing tests before building")
             return False
             
-    except subprocess.TimeoutExpired:
-        print("❌ Swift tests timed out after 3 minutes")
-        os.chdir(original_cwd)
-        return False
     except Exception as e:
         print(f"❌ Error running Swift tests: {e}")
-        os.chdir(original_cwd)
         return False
 
-def build_swift_executable(target='local'):
-    """Build the Swift executable with target-specific flags"""
-    print(f"🔨 Building Swift executable for {target} target...")
-    
+def start_swift_build(target='local'):
+    """Start the release compile in the background; returns (process, log) or None
+
+    Output goes to a log file rather than a pipe so a long build never blocks
+    on a full pipe while nobody is reading it.
+    """
     if not os.path.exists(SWIFT_PROJECT_DIR):
         print(f"❌ Swift project directory not found: {SWIFT_PROJECT_DIR}")
+        return None
+    
+    # Build command with target-specific flags
+    build_cmd = ['swift', 'build', '-c', 'release']
+    
+    # Add compilation flags based on target
+    if target == 'appstore':
+        print("📱 Building for App Store (APP_STORE flag enabled)")
+        build_cmd.extend(['-Xswiftc', '-DAPP_STORE'])
+    else:
+        print("🖥️ Building for direct distribution (Sparkle enabled)")
+    
+    try:
+        log = tempfile.TemporaryFile(mode='w+')
+        process = subprocess.Popen(build_cmd, cwd=SWIFT_PROJECT_DIR, stdout=log,
+                                   stderr=subprocess.STDOUT, text=True)
+        return process, log
+    except Exception as e:
+        print(f"❌ Error building Swift executable: {e}")
+        return None
+
+def finish_swift_build(build):
+    """Wait for a release compile started by start_swift_build"""
+    if build is None:
         return False
     
+    process, log = build
     try:
-        # Change to Swift project directory
-        original_cwd = os.getcwd()
-        os.chdir(SWIFT_PROJECT_DIR)
-        
-        # Build command with target-specific flags
-        build_cmd = ['swift', 'build', '-c', 'release']
-        
-        # Add compilation flags based on target
-        if target == 'appstore':
-            print("📱 Building for App Store (APP_STORE flag enabled)")
-            build_cmd.extend(['-Xswiftc', '-DAPP_STORE'])
-        else:
-            print("🖥️ Building for direct distribution (Sparkle enabled)")
-        
-        result = subprocess.run(
-            build_cmd,
-            capture_output=True,
-            text=True
-        )
+        returncode = process.wait()
+        log.seek(0)
+        output = log.read()
+        log.close()
         
         # Fix the auto-generated resource bundle accessor to remove hardcoded fallback
         fix_resource_bundle_accessor()
         
-        # Return to original directory
-        os.chdir(original_cwd)
-        
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ Swift executable built successfully!")
             return True
         else:
-            print(f"❌ Swift build failed: {result.stderr}")
-            if result.stdout:
-                print(f"Output: {result.stdout}")
+            print(f"❌ Swift build failed: {output}")
             return False
             
     except Exception as e:
         print(f"❌ Error building Swift executable: {e}")
-        os.chdir(original_cwd)
         return False
 
+def cancel_swift_build(build):
+    """Stop a background release compile whose result is no longer wanted"""
+    if build is None:
+        return
+    process, log = build
+    if process.poll() is None:
+        print("🛑 Discarding release build")
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    log.close()
+
+def build_swift_executable(target='local'):
+    """Build the Swift executable with target-specific flags"""
+    print(f"🔨 Building Swift executable for {target} target...")
+    return finish_swift_build(start_swift_build(target))
+
 def fix_resource_bundle_accessor():
     """Remove the hardcoded development path fallback from auto-generated resource bundle accessor"""
-    accessor_path = ".build/arm64-apple-macosx/release/Potter.build/DerivedSources/resource_bundle_accessor.swift"
+    accessor_path = f"{SWIFT_PROJECT_DIR}/.build/arm64-apple-macosx/release/Potter.build/DerivedSources/resource_bundle_accessor.swift"
     
     if not os.path.exists(accessor_path):
         print("⚠️  Resource bundle accessor not found, skipping fix")
@@ -288,41 +351,18 @@ def create_info_plist(app_path, target='local'):
         print(f"❌ Source Info.plist not found at {source_info_plist}")
         return False
     
-    # Copy source Info.plist to app bundle
-    info_plist_path = f"{app_path}/Contents/Info.plist"
-    shutil.copy2(source_info_plist, info_plist_path)
-    
-    # Read and modify the copied plist
-    import plistlib
-    with open(info_plist_path, 'rb') as f:
-        plist_data = plistlib.load(f)
+    source = load_metadata(source_info_plist)
+    metadata = source.for_bundle(APP_NAME, BUNDLE_ID, target)
     
-    # Update bundle-specific fields
-    plist_data['CFBundleExecutable'] = APP_NAME
-    plist_data['CFBundleIdentifier'] = BUNDLE_ID
-    plist_data['CFBundleName'] = APP_NAME
-    plist_data['CFBundleDisplayName'] = APP_NAME
-    plist_data['CFBundleIconFile'] = 'AppIcon'
-    
-    # Remove Sparkle-specific keys for App Store builds
     if target == 'appstore':
-        sparkle_keys = [
-            'SUFeedURL',
-            'SUPublicEDKey', 
-            'SUEnableAutomaticChecks',
-            'SUScheduledCheckInterval'
-        ]
-        
-        for key in sparkle_keys:
-            if key in plist_data:
-                del plist_data[key]
+        for key in SPARKLE_KEYS:
+            if source.get(key) is not None:
                 print(f"📱 Removed Sparkle key for App Store: {key}")
     else:
         print("🖥️ Keeping Sparkle configuration for direct distribution")
     
-    # Write the modified plist back
-    with open(info_plist_path, 'wb') as f:
-        plistlib.dump(plist_data, f)
+    # Binary, as Xcode ships it: smaller and faster for the system to parse
+    metadata.write(f"{app_path}/Contents/Info.plist", plistlib.FMT_BINARY)
     
     print("✅ Info.plist created from source")
     return True
@@ -406,123 +446,39 @@ def bundle_frameworks(app_path):
         print("❌ Could not find Sparkle framework in any expected location")
         return False
 
-def sign_app(app_path, signing_identity, entitlements_file, target='local'):
-    """Sign the application bundle"""
+def sign_app(app_path, signing_identity, entitlements_file, target='local',
+             signing_workers=DEFAULT_SIGNING_WORKERS, use_signing_cache=True,
+             signing_batch_size=DEFAULT_BATCH_SIZE):
+    """Sign the application bundle, inside-out, with concurrent batched codesign calls"""
+    if __package__:
+        from .signing_cache import SigningCache
+    else:
+        from signing_cache import SigningCache
     print(f"🔐 Signing app with {signing_identity}...")
     
     try:
-        # Sign frameworks first (if any)
-        frameworks_dir = f"{app_path}/Contents/Frameworks"
-        if os.path.exists(frameworks_dir):
-            for framework in os.listdir(frameworks_dir):
-                if framework.endswith('.framework'):
-                    framework_path = f"{frameworks_dir}/{framework}"
-                    print(f"🔐 Signing framework: {framework}")
-                    
-                    # Sign XPC services and other executables first with minimal flags
-                    xpc_services_dir = f"{framework_path}/Versions/B/XPCServices"
-                    if os.path.exists(xpc_services_dir):
-                        for xpc_service in os.listdir(xpc_services_dir):
-                            if xpc_service.endswith('.xpc'):
-                                xpc_path = f"{xpc_services_dir}/{xpc_service}"
-                                print(f"🔐 Signing XPC service: {xpc_service}")
-                                
-                                xpc_cmd = [
-                                    'codesign', '--force', '--verbose',
-                                    '--sign', signing_identity,
-                                    '--timestamp',
-                                    '--options', 'runtime',
-                                    xpc_path
-                                ]
-                                
-                                xpc_result = subprocess.run(xpc_cmd, capture_output=True, text=True)
-                                if xpc_result.returncode != 0:
-                                    print(f"❌ XPC service signing failed: {xpc_result.stderr}")
-                                    return False
-                                print(f"✅ XPC service {xpc_service} signed")
-                    
-                    # Sign Autoupdate executable
-                    autoupdate_path = f"{framework_path}/Versions/B/Autoupdate"
-                    if os.path.exists(autoupdate_path):
-                        print("🔐 Signing Autoupdate executable")
-                        autoupdate_cmd = [
-                            'codesign', '--force', '--verbose',
-                            '--sign', signing_identity,
-                            '--timestamp',
-                            '--options', 'runtime',
-                            autoupdate_path
-                        ]
-                        
-                        autoupdate_result = subprocess.run(autoupdate_cmd, capture_output=True, text=True)
-                        if autoupdate_result.returncode != 0:
-                            print(f"❌ Autoupdate signing failed: {autoupdate_result.stderr}")
-                            return False
-                        print("✅ Autoupdate executable signed")
-                    
-                    # Sign Updater.app if it exists
-                    updater_app_path = f"{framework_path}/Versions/B/Updater.app"
-                    if os.path.exists(updater_app_path):
-                        print("🔐 Signing Updater.app")
-                        updater_cmd = [
-                            'codesign', '--force', '--verbose',
-                            '--sign', signing_identity,
-                            '--timestamp',
-                            '--options', 'runtime',
-                            updater_app_path
-                        ]
-                        
-                        updater_result = subprocess.run(updater_cmd, capture_output=True, text=True)
-                        if updater_result.returncode != 0:
-                            print(f"❌ Updater.app signing failed: {updater_result.stderr}")
-                            return False
-                        print("✅ Updater.app signed")
-                    
-                    # Sign the framework itself (all components already signed individually)
-                    cmd = [
-                        'codesign', '--force', '--verbose',
-                        '--sign', signing_identity,
-                        '--timestamp',
-                        '--options', 'runtime',
-                        framework_path
-                    ]
-                    
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        print(f"❌ Framework signing failed: {result.stderr}")
-                        return False
-                    print(f"✅ Framework {framework} signed")
-        
-        # Sign the main executable
-        executable_path = f"{app_path}/Contents/MacOS/{APP_NAME}"
-        
-        cmd = [
-            'codesign', '--force', '--verify', '--verbose',
-            '--sign', signing_identity,
-            '--entitlements', entitlements_file,
-            '--timestamp',
-            '--options', 'runtime',
-            executable_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"❌ Executable signing failed: {result.stderr}")
+        plan = discover_signing_plan(app_path, APP_NAME, entitlements_file)
+        
+        # Frameworks that are byte-identical to a previous build get their
+        # signed copy restored instead of being signed again
+        cache = SigningCache() if use_signing_cache else None
+        misses = []
+        if cache:
+            plan, misses = cache.partition(plan, signing_identity)
+        
+        scheduler = SigningScheduler(
+            CodesignBackend(signing_identity),
+            max_workers=signing_workers,
+            batch_size=signing_batch_size,
+        )
+        if not scheduler.run(plan):
             return False
         
-        # Sign the main app bundle
-        cmd = [
-            'codesign', '--force', '--verify', '--verbose',
-            '--sign', signing_identity,
-            '--entitlements', entitlements_file,
-            '--timestamp',
-            '--options', 'runtime',
-            app_path
-        ]
+        if cache:
+            cache.store_all(misses)
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"❌ App bundle signing failed: {result.stderr}")
-            return False
+        # Record what was signed so later verification can detect tampering
+        save_manifest(create_manifest(app_path, os.cpu_count() or 1), get_app_manifest_path(app_path))
         
         print("✅ App signed successfully")
         return True
@@ -531,96 +487,118 @@ def sign_app(app_path, signing_identity, entitlements_file, target='local'):
         print(f"❌ Signing error: {e}")
         return False
 
+def get_app_manifest_path(app_path):
+    """Location of the post-signing manifest for an app bundle"""
+    return f"{os.path.dirname(app_path)}/{APP_NAME}.manifest.json"
+
 def verify_signature(app_path):
-    """Verify the app signature"""
+    """Verify each signed component in parallel, the build manifest, then Gatekeeper"""
+    if __package__:
+        from .signing_cache import GatekeeperCache
+        from .notarization_manager import BUNDLE_TICKET_PATH
+    else:
+        from signing_cache import GatekeeperCache
+        from notarization_manager import BUNDLE_TICKET_PATH
     print("🔍 Verifying signature...")
     
     try:
-        # Verify signature
-        result = subprocess.run([
-            'codesign', '--verify', '--deep', '--strict', '--verbose=2',
+        plan = discover_signing_plan(app_path, APP_NAME, None)
+        failed = [result for result in verify_components(plan) if not result.success]
+        if failed:
+            for result in failed:
+                print(f"❌ Signature verification failed for {result.component}: {result.output}")
+            return False
+        
+        print("✅ Signature verification passed")
+        
+        # Compare against the manifest written at signing time
+        manifest = load_manifest(get_app_manifest_path(app_path))
+        if manifest is not None:
+            changes = diff_manifests(manifest, create_manifest(app_path, os.cpu_count() or 1))
+            modified = [
+                path for path in changes['added'] + changes['removed'] + changes['changed']
+                if path != BUNDLE_TICKET_PATH
+            ]
+            if modified:
+                print(f"❌ Bundle modified after signing: {', '.join(modified[:10])}")
+                return False
+            print("✅ Bundle matches build manifest")
+        
+        # Check if it will pass Gatekeeper, reusing earlier verdicts for the same code
+        cdhash = get_cdhash(app_path)
+        gatekeeper_cache = GatekeeperCache()
+        if cdhash and gatekeeper_cache.is_accepted(cdhash):
+            print("✅ Gatekeeper assessment passed (cached)")
+            return True
+        
+        gatekeeper_result = subprocess.run([
+            'spctl', '--assess', '--type', 'execute', '--verbose',
             app_path
         ], capture_output=True, text=True)
         
-        if result.returncode == 0:
-            print("✅ Signature verification passed")
-            
-            # Check if it will pass Gatekeeper
-            gatekeeper_result = subprocess.run([
-                'spctl', '--assess', '--type', 'execute', '--verbose',
-                app_path
-            ], capture_output=True, text=True)
-            
-            if gatekeeper_result.returncode == 0:
-                print("✅ Gatekeeper assessment passed")
-                return True
-            else:
-                print(f"⚠️  Gatekeeper assessment: {gatekeeper_result.stderr}")
-                print("   App may need notarization")
-                return True  # Still considered success, just needs notarization
+        if gatekeeper_result.returncode == 0:
+            if cdhash:
+                gatekeeper_cache.record_accepted(cdhash, gatekeeper_result.stderr)
+            print("✅ Gatekeeper assessment passed")
+            return True
         else:
-            print(f"❌ Signature verification failed: {result.stderr}")
-            return False
+            print(f"⚠️  Gatekeeper assessment: {gatekeeper_result.stderr}")
+            print("   App may need notarization")
+            return True  # Still considered success, just needs notarization
             
     except Exception as e:
         print(f"❌ Verification error: {e}")
         return False
 
 def notarize_app(app_path, config):
-    """Notarize the app with Apple"""
-    if not config.get('apple_id') or not config.get('app_password'):
+    """Submit the app for notarization and keep polling in the background
+
+    Returns a PendingNotarization whose finish() waits and staples, or None
+    if notarization was skipped or the submission failed.
+    """
+    if __package__:
+        from .notarization_manager import create_notarization_manager
+        from .zip_writer import create_zip
+    else:
+        from notarization_manager import create_notarization_manager
+        from zip_writer import create_zip
+    manager = create_notarization_manager(config)
+    if not manager:
         print("⚠️  Skipping notarization - Apple ID or app password not provided")
-        return True
+        return None
     
     print("📝 Submitting app for notarization...")
     
+    zip_path = app_path.replace('.app', '.zip')
     try:
-        # Create a zip file for notarization
-        zip_path = app_path.replace('.app', '.zip')
-        subprocess.run([
-            'ditto', '-c', '-k', '--keepParent',
-            app_path, zip_path
-        ], check=True)
+        # Identical code was notarized before; no need to zip or upload
+        if manager.has_cached_tickets([app_path]):
+            return manager.start(app_path, tree_digest(app_path), staple_paths=[app_path])
         
-        # Submit for notarization using notarytool
-        cmd = [
-            'xcrun', 'notarytool', 'submit',
-            zip_path,
-            '--apple-id', config['apple_id'],
-            '--password', config['app_password'],
-            '--team-id', config.get('team_id', ''),
-            '--wait'
-        ]
+        # Create a zip file for notarization (same layout as ditto -c -k --keepParent,
+        # compressed on all cores). notarytool only takes a file path: it hashes
+        # the archive and uploads it in sized parts, so it cannot be streamed
+        create_zip(app_path, zip_path)
         
-        print("🕐 Submitting for notarization (this may take several minutes)...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("✅ Notarization successful!")
-            
-            # Staple the ticket
-            staple_cmd = ['xcrun', 'stapler', 'staple', app_path]
-            staple_result = subprocess.run(staple_cmd, capture_output=True, text=True)
-            
-            if staple_result.returncode == 0:
-                print("✅ Notarization ticket stapled")
-            else:
-                print("⚠️  Failed to staple ticket, but notarization was successful")
-            
-            # Clean up zip file
-            os.remove(zip_path)
-            return True
-        else:
-            print(f"❌ Notarization failed: {result.stderr}")
-            print(f"Output: {result.stdout}")
-            os.remove(zip_path)
-            return False
+        # Submit without blocking; Apple processes it while the build continues
+        return manager.start(zip_path, tree_digest(app_path), staple_paths=[app_path])
         
     except Exception as e:
         print(f"❌ Notarization error: {e}")
+        return None
+    finally:
+        # The upload is complete once submit returns
         if os.path.exists(zip_path):
             os.remove(zip_path)
-        return False
+
+def finish_app_notarization(pending):
+    """Wait for a background app notarization and staple it; False on failure"""
+    print("🕐 Waiting for app notarization...")
+    if pending.finish():
+        print("✅ App notarized successfully")
+        return True
+    print("❌ App notarization or stapling failed")
+    return False
 
 def generate_cool_name():
     """Generate a cool build name"""
@@ -706,23 +684,74 @@ def embed_build_id(app_path):
         print(f"❌ Failed to embed build ID: {e}")
         return False
 
-def create_dmg_professional(app_path):
-    """Create a professional DMG with custom background using modern approach"""
+DMG_LAYOUT = {
+    'positions': {f"{APP_NAME}.app": (160, 250), "Applications": (440, 250)},
+    'window_bounds': (400, 100, 1000, 600),
+    'icon_size': 100,
+}
+
+def prepare_dmg_source(app_path, source_folder, volume_name, background_path):
+    """Stage the app, Applications link and Finder layout in the DMG source folder"""
+    if __package__:
+        from .bundle_staging import stage_tree, verify_staged_tree
+        from .dsstore_writer import create_dmg_layout
+    else:
+        from bundle_staging import stage_tree, verify_staged_tree
+        from dsstore_writer import create_dmg_layout
+    os.makedirs(source_folder, exist_ok=True)
+    
+    # Stage the app without copying its bytes (clone, hardlink, then copy)
+    print("📁 Preparing DMG contents...")
+    staged_app = f"{source_folder}/{APP_NAME}.app"
+    method = stage_tree(app_path, staged_app)
+    if not method:
+        print("❌ Could not stage app for DMG")
+        return False
+    problems = verify_staged_tree(app_path, staged_app)
+    if problems:
+        print(f"❌ Staged app does not match the signed app ({method}):")
+        for problem in problems[:10]:
+            print(f"   {problem}")
+        return False
+    print(f"✅ App staged via {method}")
+    
+    # Create Applications symlink
+    subprocess.run([
+        'ln', '-s', '/Applications', f"{source_folder}/Applications"
+    ], check=True)
+    
+    # Bake the Finder layout into the source folder; no mount or AppleScript needed
+    print("🎭 Configuring DMG layout...")
+    create_dmg_layout(source_folder, volume_name, background_path=background_path, **DMG_LAYOUT)
+    print("✅ DMG layout configured")
+    return True
+
+def create_dmg_professional(app_path, dmg_format='UDZO', incremental=False):
+    """Create a professional DMG with custom background using modern approach
+
+    With incremental=True the previous read-write image is patched with the
+    app's changes and only changed chunks are recompressed.
+    """
+    if __package__:
+        from .udif_writer import hdiutil_convert, hdiutil_verify, verify_udif, write_udif
+        from .dmg_incremental import IncrementalDMG, dmg_layout_key
+    else:
+        from udif_writer import hdiutil_convert, hdiutil_verify, verify_udif, write_udif
+        from dmg_incremental import IncrementalDMG, dmg_layout_key
     print("💿 Creating professional DMG for distribution...")
     
+    source_folder = None
+    raw_image = None
     try:
         # Get version from the app's Info.plist
-        info_plist_path = f"{app_path}/Contents/Info.plist"
-        import plistlib
-        with open(info_plist_path, 'rb') as f:
-            plist_data = plistlib.load(f)
-        
-        version = plist_data.get('CFBundleShortVersionString', '2.0.0')
+        version = load_metadata(f"{app_path}/Contents/Info.plist").get('CFBundleShortVersionString', '2.0.0')
         
         # Get version codename for enhanced naming
         try:
-            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-            from codename_utils import get_enhanced_dmg_name
+            if __package__:
+                from .codename_utils import get_enhanced_dmg_name
+            else:
+                from codename_utils import get_enhanced_dmg_name
             dmg_name = get_enhanced_dmg_name(version)
             print(f"🎭 Using enhanced DMG name: {dmg_name}")
         except Exception as e:
@@ -741,21 +770,6 @@ def create_dmg_professional(app_path):
                 else:
                     os.remove(path)
         
-        # Create source folder structure
-        os.makedirs(source_folder, exist_ok=True)
-        
-        # Copy app to source folder using ditto to preserve signatures
-        print("📁 Preparing DMG contents...")
-        subprocess.run([
-            'ditto', '--rsrc', '--extattr', 
-            app_path, f"{source_folder}/{APP_NAME}.app"
-        ], check=True)
-        
-        # Create Applications symlink
-        subprocess.run([
-            'ln', '-s', '/Applications', f"{source_folder}/Applications"
-        ], check=True)
-        
         # Find background image
         background_path = None
         background_candidates = [
@@ -771,127 +785,73 @@ def create_dmg_professional(app_path):
         if not background_path:
             print("⚠️  No background image found")
         
-        # Use hdiutil create with proper formatting
-        print("🔨 Creating DMG with hdiutil...")
-        
         # Get enhanced volume name with codename
         try:
-            from codename_utils import get_enhanced_volume_name
+            if __package__:
+                from .codename_utils import get_enhanced_volume_name
+            else:
+                from codename_utils import get_enhanced_volume_name
             volume_name = get_enhanced_volume_name(version)
             print(f"🎭 Using enhanced volume name: {volume_name}")
         except Exception as e:
             print(f"⚠️  Could not get codename for volume, using standard naming: {e}")
             volume_name = f"{APP_NAME} Installer"
         
-        cmd = [
-            'hdiutil', 'create',
-            '-volname', volume_name,
-            '-srcfolder', source_folder,
-            '-ov',
-            '-format', 'UDRW',  # Read-write for customization
-            f"{app_dir}/temp_{dmg_name}"
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"❌ Initial DMG creation failed: {result.stderr}")
-            return None
-        
-        print("✅ Initial DMG created successfully")
-        
-        # Mount for customization
-        mount_point = f"/Volumes/{APP_NAME} Installer"
-        print(f"📀 Mounting DMG at {mount_point}...")
-        
-        # Unmount any existing volume
-        subprocess.run(['hdiutil', 'detach', mount_point], 
-                      capture_output=True, text=True)
-        
-        mount_result = subprocess.run([
-            'hdiutil', 'attach', f"{app_dir}/temp_{dmg_name}",
-            '-mountpoint', mount_point
-        ], capture_output=True, text=True)
-        
-        if mount_result.returncode != 0:
-            print(f"❌ Failed to mount DMG: {mount_result.stderr}")
-            return None
-        
-        print("✅ DMG mounted successfully")
-        
-        # Copy background and configure layout
-        if background_path:
-            print("🎨 Applying background image...")
-            # Create .background folder (alternative approach)
-            bg_folder = f'{mount_point}/.background'
-            os.makedirs(bg_folder, exist_ok=True)
-            bg_dest = f'{bg_folder}/background.png'
-            shutil.copy2(background_path, bg_dest)
+        raw_image = f"{app_dir}/temp_{os.path.splitext(dmg_name)[0]}.cdr"
+        
+        # Incremental builds patch the previous read-write image when only the
+        # app changed; anything else (volume name, background, layout) rebuilds
+        incremental_image = None
+        updated = False
+        if incremental:
+            incremental_image = IncrementalDMG(APP_NAME)
+            layout_key = dmg_layout_key(volume_name, background_path, DMG_LAYOUT)
+            updated = incremental_image.can_update(layout_key) and incremental_image.update(app_path)
+        
+        if not updated:
+            if not prepare_dmg_source(app_path, source_folder, volume_name, background_path):
+                shutil.rmtree(source_folder)
+                return None
             
-            # Also copy to root level as fallback
-            bg_dest_root = f'{mount_point}/.background.png'
-            shutil.copy2(background_path, bg_dest_root)
-            
-            # Verify the copy worked
-            if os.path.exists(bg_dest) and os.path.exists(bg_dest_root):
-                print(f"✅ Background copied to both locations")
+            if incremental_image:
+                created = incremental_image.create(source_folder, volume_name, app_path, layout_key)
             else:
-                print(f"❌ Background copy failed")
-                background_path = None  # Don't try to set it in AppleScript
+                # Build an uncompressed image straight from the prepared folder
+                print("🔨 Creating DMG with hdiutil...")
+                cmd = [
+                    'hdiutil', 'create',
+                    '-volname', volume_name,
+                    '-srcfolder', source_folder,
+                    '-ov',
+                    '-format', 'UDTO',
+                    raw_image
+                ]
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                created = result.returncode == 0
+                if not created:
+                    print(f"❌ DMG creation failed: {result.stderr}")
             
-        # Configure DMG appearance with AppleScript
-        print("🎭 Configuring DMG layout...")
-        applescript = f'''
-tell application "Finder"
-    tell disk "{APP_NAME} Installer"
-        open
-        set current view of container window to icon view
-        set toolbar visible of container window to false
-        set statusbar visible of container window to false
-        set the bounds of container window to {{400, 100, 1000, 600}}
-        set viewOptions to the icon view options of container window
-        set arrangement of viewOptions to not arranged
-        set icon size of viewOptions to 100'''
-        
-        if background_path:
-            applescript += '''
-        set background picture of viewOptions to file ".background:background.png"'''
-            
-        applescript += f'''
-        set position of item "{APP_NAME}.app" to {{160, 250}}
-        set position of item "Applications" to {{440, 250}}
-        close
-        open
-        update without registering applications
-        delay 2
-    end tell
-end tell'''
-        
-        # Run AppleScript with timeout and error handling
-        try:
-            subprocess.run([
-                'osascript', '-e', applescript
-            ], timeout=30, check=False)  # Don't fail build if AppleScript fails
-            print("✅ DMG layout configured")
-        except subprocess.TimeoutExpired:
-            print("⚠️  AppleScript timed out, continuing with basic layout")
-        except Exception as e:
-            print(f"⚠️  AppleScript failed: {e}, continuing with basic layout")
-        
-        # Unmount
-        print("📤 Finalizing DMG...")
-        subprocess.run(['hdiutil', 'detach', mount_point], 
-                      capture_output=True, text=True)
-        
-        # Convert to compressed final DMG
-        subprocess.run([
-            'hdiutil', 'convert', f"{app_dir}/temp_{dmg_name}",
-            '-format', 'UDZO',
-            '-o', dmg_path
-        ], check=True)
-        
-        # Clean up
-        os.remove(f"{app_dir}/temp_{dmg_name}")
-        shutil.rmtree(source_folder)
+            shutil.rmtree(source_folder)
+            if not created:
+                return None
+        
+        # Compress on all cores instead of a single-threaded hdiutil convert
+        print("🗜️  Compressing DMG...")
+        if incremental_image:
+            incremental_image.export(dmg_path, dmg_format, raw_image)
+        else:
+            write_udif(raw_image, dmg_path, dmg_format)
+        
+        # The native writer is only trusted once hdiutil itself accepts the result
+        if not verify_udif(dmg_path) or hdiutil_verify(dmg_path) is False:
+            print("↩️  Falling back to hdiutil convert")
+            if incremental_image:
+                incremental_image.discard_compressed()
+            source = raw_image if os.path.exists(raw_image) else incremental_image.rw_image
+            if not hdiutil_convert(source, dmg_path, dmg_format) or not hdiutil_verify(dmg_path):
+                return None
+        if os.path.exists(raw_image):
+            os.remove(raw_image)
         
         print(f"✅ Professional DMG created: {dmg_path}")
         return dmg_path
@@ -899,13 +859,10 @@ end tell'''
     except Exception as e:
         print(f"❌ DMG creation error: {e}")
         # Clean up on error
-        cleanup_paths = [f"{app_dir}/temp_{dmg_name}", source_folder]
-        for path in cleanup_paths:
-            if os.path.exists(path):
-                if os.path.isdir(path):
-                    shutil.rmtree(path)
-                else:
-                    os.remove(path)
+        if source_folder and os.path.exists(source_folder):
+            shutil.rmtree(source_folder)
+        if raw_image and os.path.exists(raw_image):
+            os.remove(raw_image)
         return None
 
 def sign_dmg(dmg_path, signing_identity):
@@ -931,51 +888,64 @@ def sign_dmg(dmg_path, signing_identity):
         print(f"❌ DMG signing error: {e}")
         return False
 
-def notarize_dmg(dmg_path, config):
-    """Notarize the DMG file"""
-    if not config.get('apple_id') or not config.get('app_password'):
+def notarize_dmg(dmg_path, config, app_path=None):
+    """Notarize the DMG file
+
+    Apple notarizes everything nested in the DMG, so when app_path is given
+    the same ticket is also stapled to that app and no separate app
+    submission is needed.
+    """
+    if __package__:
+        from .notarization_manager import create_notarization_manager
+    else:
+        from notarization_manager import create_notarization_manager
+    manager = create_notarization_manager(config)
+    if not manager:
         print("⚠️  Skipping DMG notarization - Apple ID or app password not provided")
         return True
     
     print(f"📝 Submitting DMG for notarization: {dmg_path}")
     
     try:
-        # Submit DMG for notarization using notarytool
-        cmd = [
-            'xcrun', 'notarytool', 'submit',
-            dmg_path,
-            '--apple-id', config['apple_id'],
-            '--password', config['app_password'],
-            '--team-id', config.get('team_id', ''),
-            '--wait'
-        ]
+        staple_paths = [dmg_path] + ([app_path] if app_path else [])
+        submission = manager.submit(dmg_path, hash_file(dmg_path), staple_paths=staple_paths)
+        print("🕐 Waiting for DMG notarization (this may take several minutes)...")
         
-        print("🕐 Submitting DMG for notarization (this may take several minutes)...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
+        if manager.wait(submission):
+            if app_path and not verify_gatekeeper_after_stapling(dmg_path, app_path):
+                return False
             print("✅ DMG notarization successful!")
-            
-            # Staple the ticket
-            staple_cmd = ['xcrun', 'stapler', 'staple', dmg_path]
-            staple_result = subprocess.run(staple_cmd, capture_output=True, text=True)
-            
-            if staple_result.returncode == 0:
-                print("✅ DMG notarization ticket stapled")
-            else:
-                print("⚠️  Failed to staple DMG ticket, but notarization was successful")
-            
             return True
-        else:
-            print(f"❌ DMG notarization failed: {result.stderr}")
-            print(f"Output: {result.stdout}")
-            return False
+        
+        print("❌ DMG notarization failed")
+        return False
         
     except Exception as e:
         print(f"❌ DMG notarization error: {e}")
         return False
 
-def build_app(target='local', skip_tests=False, skip_notarization=False, unsigned=False, dmg=True):
+def verify_gatekeeper_after_stapling(dmg_path, app_path):
+    """Confirm Gatekeeper accepts the stapled DMG and app"""
+    checks = [
+        (dmg_path, ['spctl', '--assess', '--type', 'open', '--context', 'context:primary-signature',
+                    '--verbose', dmg_path]),
+        (app_path, ['spctl', '--assess', '--type', 'execute', '--verbose', app_path]),
+    ]
+    
+    for path, cmd in checks:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ Gatekeeper rejected {os.path.basename(path)} after stapling: {result.stderr}")
+            return False
+        print(f"✅ Gatekeeper accepts stapled {os.path.basename(path)}")
+    
+    return True
+
+def build_app(target='local', skip_tests=False, skip_notarization=False, unsigned=False, dmg=True,
+              signing_workers=DEFAULT_SIGNING_WORKERS, signing_cache=True,
+              signing_batch_size=DEFAULT_BATCH_SIZE, notarize_mode='separate', dmg_format='auto',
+              incremental_dmg=False, test_shards=None, all_tests=False, test_cache=True,
+              parallel_build=False):
     """Main build function.
 
     Args:
@@ -984,12 +954,28 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
         skip_notarization: Skip Apple notarization step
         unsigned: Build without code signing (for local testing/DMG sharing)
         dmg: Create a DMG (for local target)
+        signing_workers: Maximum concurrent codesign invocations per level
+        signing_cache: Reuse signed frameworks from previous builds
+        signing_batch_size: Maximum paths per codesign invocation (1 disables batching)
+        notarize_mode: 'separate' notarizes the app and the DMG; 'dmg' submits only
+            the DMG and staples its ticket to both
+        dmg_format: UDIF format (UDZO, UDBZ, ULFO, ULMO), or 'auto' to pick one for
+            the build profile (release when signed, dev when unsigned) from the
+            last dmg_benchmark.py run
+        incremental_dmg: Patch the previous DMG with what changed instead of
+            rebuilding it (watch-mode and nightly builds)
+        test_shards: Parallel test processes (default: one per core)
+        all_tests: Run the whole suite instead of only tests affected by changes
+        test_cache: Replay a cached green result when sources and toolchain match
+        parallel_build: Compile the release executable while the tests run (the
+            tests build in their own scratch path); discarded if tests fail
     """
-
-    # Run tests first unless skipped
-    if not skip_tests:
-        if not run_swift_tests():
-            return False
+    if __package__:
+        from .dmg_benchmark import resolve_dmg_format
+        from .binary_size import record_binary_size
+    else:
+        from dmg_benchmark import resolve_dmg_format
+        from binary_size import record_binary_size
 
     mode = "unsigned" if unsigned else target
     print(f"🔄 Swift Potter App Builder ({mode} target)")
@@ -1008,12 +994,38 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
             print("\n💡 Or build unsigned: python3 scripts/build_app.py --unsigned")
             return False
         print(f"✅ {message}")
+
+        # Resolve certificate hashes up front so a missing, expired or
+        # duplicated certificate fails the build before tests and compilation
+        identity_name = config['developer_id_app'] if target == 'local' else config['mac_app_store']
+        try:
+            signing_identity = resolve_signing_identity(identity_name)
+            print(f"✅ Signing identity resolved: {identity_name} ({signing_identity})")
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            print("💡 Run 'make check-signing' to diagnose certificate setup")
+            return False
     else:
         print("⚠️  Building unsigned (no code signing)")
 
-    # Build Swift executable
-    if not build_swift_executable(target):
-        return False
+    # Run tests unless skipped
+    if not skip_tests and parallel_build:
+        # Debug tests and the release compile share nothing but sources
+        print(f"🔨 Building Swift executable for {target} target while tests run...")
+        release_build = start_swift_build(target)
+        if not run_swift_tests(test_shards, all_tests, test_cache, scratch_path=TEST_SCRATCH_PATH):
+            cancel_swift_build(release_build)
+            return False
+        if not finish_swift_build(release_build):
+            return False
+    else:
+        if not skip_tests:
+            if not run_swift_tests(test_shards, all_tests, test_cache):
+                return False
+
+        # Build Swift executable
+        if not build_swift_executable(target):
+            return False
 
     # Create app bundle
     app_path = create_app_bundle(target)
@@ -1024,6 +1036,11 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
     if not create_info_plist(app_path, target):
         return False
 
+    # Keep a size breakdown of signed executables for release-to-release
+    # diffs; unsigned dev builds of the same version would overwrite it
+    if not unsigned:
+        record_binary_size(app_path)
+
     # Copy app icon
     copy_app_icon(app_path)
 
@@ -1039,7 +1056,7 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
         print("✅ Unsigned app bundle created")
         if dmg and target == 'local':
             print("📦 Creating DMG (unsigned)...")
-            dmg_path = create_dmg_professional(app_path)
+            dmg_path = create_dmg_professional(app_path, resolve_dmg_format(dmg_format, 'dev'), incremental_dmg)
             if dmg_path:
                 print(f"✅ DMG created: {dmg_path}")
             else:
@@ -1048,39 +1065,56 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
         # Signed build
         entitlements_file = get_entitlements_file(target)
 
-        if target == 'local':
-            signing_identity = config['developer_id_app']
-        else:  # appstore
-            signing_identity = config['mac_app_store']
-
-        if sign_app(app_path, signing_identity, entitlements_file, target):
+        if sign_app(app_path, signing_identity, entitlements_file, target,
+                    signing_workers, use_signing_cache=signing_cache,
+                    signing_batch_size=signing_batch_size):
             if verify_signature(app_path):
                 print("✅ App successfully signed and verified")
 
-                # Notarization (for local distribution)
-                if target == 'local' and not skip_notarization:
-                    if notarize_app(app_path, config):
-                        print("✅ App notarized successfully")
-                    else:
-                        print("⚠️  Notarization failed - app may trigger security warnings")
+                # With --notarize-mode dmg one DMG submission covers the app
+                # too; otherwise the app is notarized on its own first
+                app_notarization = None
+                single_submission = notarize_mode == 'dmg' and dmg
+                if target == 'local' and not skip_notarization and not single_submission:
+                    app_notarization = notarize_app(app_path, config)
                 elif target == 'local' and skip_notarization:
                     print("⚠️  Skipping notarization as requested - app may trigger security warnings")
 
+                # The DMG stages a copy of the app, so its ticket has to be
+                # stapled before the DMG is built
+                if app_notarization and not finish_app_notarization(app_notarization):
+                    return False
+
                 # Create DMG AFTER signing to include signed app
                 if dmg and target == 'local':
                     print("📦 Creating professional DMG with signed app...")
-                    dmg_path = create_dmg_professional(app_path)
-                    if dmg_path:
-                        # Sign and notarize the DMG
-                        if sign_dmg(dmg_path, config['developer_id_app']):
-                            if not skip_notarization and notarize_dmg(dmg_path, config):
-                                print(f"✅ Distribution DMG created and notarized: {dmg_path}")
-                            else:
-                                print(f"✅ Distribution DMG created and signed: {dmg_path}")
+                    dmg_path = create_dmg_professional(app_path, resolve_dmg_format(dmg_format, 'release'), incremental_dmg)
+                    dmg_signed = bool(dmg_path) and sign_dmg(dmg_path, signing_identity)
+                    if dmg_signed:
+                        # Notarize the DMG
+                        stapled_app_path = app_path if single_submission else None
+                        if skip_notarization:
+                            print(f"✅ Distribution DMG created and signed: {dmg_path}")
+                        elif notarize_dmg(dmg_path, config, stapled_app_path):
+                            print(f"✅ Distribution DMG created and notarized: {dmg_path}")
                         else:
-                            print(f"✅ Distribution DMG created (unsigned): {dmg_path}")
+                            # A DMG without a valid stapled ticket must not ship
+                            print(f"❌ DMG notarization or stapling failed: {dmg_path}")
+                            return False
+                    elif dmg_path and (skip_notarization or not single_submission):
+                        # The app itself is already signed and, if requested, notarized
+                        print(f"✅ Distribution DMG created (unsigned): {dmg_path}")
                     else:
-                        print("❌ DMG creation failed, but signed app is available")
+                        if dmg_path:
+                            print(f"❌ DMG signing failed, so it cannot be notarized: {dmg_path}")
+                        else:
+                            print("❌ DMG creation failed, but signed app is available")
+                        if single_submission and not skip_notarization:
+                            # Nothing covered the app; notarize it on its own
+                            print("📝 Falling back to notarizing the app on its own...")
+                            app_notarization = notarize_app(app_path, config)
+                            if app_notarization and not finish_app_notarization(app_notarization):
+                                return False
 
             else:
                 print("❌ Signature verification failed")
@@ -1095,6 +1129,10 @@ def build_app(target='local', skip_tests=False, skip_notarization=False, unsigne
 
 def main():
     """Main build process with CLI support"""
+    if __package__:
+        from .udif_writer import FORMATS as DMG_FORMATS
+    else:
+        from udif_writer import FORMATS as DMG_FORMATS
     parser = argparse.ArgumentParser(description='Swift Potter App Builder')
     parser.add_argument('--target', choices=['local', 'appstore'], default='local',
                        help='Build target: local (for local distribution) or appstore (for App Store)')
@@ -1106,6 +1144,26 @@ def main():
                        help='Build without code signing (creates unsigned .app and DMG)')
     parser.add_argument('--no-dmg', action='store_true',
                        help='Skip DMG creation (app bundle only)')
+    parser.add_argument('--signing-workers', type=int, default=DEFAULT_SIGNING_WORKERS,
+                       help=f'Concurrent codesign invocations (default: {DEFAULT_SIGNING_WORKERS})')
+    parser.add_argument('--no-signing-cache', action='store_true',
+                       help='Re-sign bundled frameworks even if a cached signed copy exists')
+    parser.add_argument('--notarize-mode', choices=['separate', 'dmg'], default='separate',
+                       help="Notarize app and DMG separately, or only the DMG with its ticket stapled to both")
+    parser.add_argument('--signing-batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help=f'Paths per codesign invocation, 1 disables batching (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--dmg-format', choices=['auto'] + sorted(DMG_FORMATS), default='auto',
+                       help='DMG compression format; auto picks per build profile from dmg_benchmark.py results')
+    parser.add_argument('--incremental-dmg', action='store_true',
+                       help='Update the previous DMG with only the files that changed')
+    parser.add_argument('--test-shards', type=int,
+                       help='Parallel isolated test processes (default: one per core)')
+    parser.add_argument('--all-tests', action='store_true',
+                       help='Run every test, not only those affected by changes since the last green run')
+    parser.add_argument('--no-test-cache', action='store_true',
+                       help='Run the tests even if these sources already passed (also POTTER_NO_TEST_CACHE=1)')
+    parser.add_argument('--parallel-build', action='store_true',
+                       help='Compile the release build while the tests run; discarded if tests fail')
 
     args = parser.parse_args()
 
@@ -1139,6 +1197,16 @@ def main():
         skip_notarization=args.skip_notarization,
         unsigned=args.unsigned,
         dmg=not args.no_dmg,
+        signing_workers=args.signing_workers,
+        signing_cache=not args.no_signing_cache,
+        signing_batch_size=args.signing_batch_size,
+        notarize_mode=args.notarize_mode,
+        dmg_format=args.dmg_format,
+        incremental_dmg=args.incremental_dmg,
+        test_shards=args.test_shards,
+        all_tests=args.all_tests,
+        test_cache=not args.no_test_cache,
+        parallel_build=args.parallel_build,
     )
     
     if success:
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Metric-driven bisect for performance regressions
+Finds the first commit where a measurement (DMG size, app size, build time,
+test time or any command printing a number) crossed a threshold. Each round
+measures several evenly spaced candidates in parallel git worktrees, so the
+search narrows by a factor of (slots + 1) per round instead of 2. Timings are
+measured one commit at a time, since concurrent builds skew them. Worktrees
+keep their SwiftPM build directories between rounds, builds share the main
+checkout's caches, and every measurement is remembered across runs.
+"""
+
+import glob
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+if __package__:
+    from .build_cache import get_cache_dir, get_cache_root, update_json
+    from .build_service import host_build_slots
+    from .worktrees import KEEP_ON_CHECKOUT, Worktree, build_environment, commits_between, git, repo_root, resolve_commit
+else:
+    from build_cache import get_cache_dir, get_cache_root, update_json
+    from build_service import host_build_slots
+    from worktrees import KEEP_ON_CHECKOUT, Worktree, build_environment, commits_between, git, repo_root, resolve_commit
+
+# Flags every historical build_app.py understands
+BUILD_FLAGS = ['--unsigned', '--skip-tests']
+
+METRICS = {
+    'dmg-size': 'Size of the unsigned DMG in bytes',
+    'app-size': 'Size of the unsigned Potter.app in bytes',
+    'build-time': 'Seconds for a clean unsigned app build',
+    'test-time': 'Seconds to run the Swift tests (build excluded)',
+    'command': 'Last number printed by --command, run in the checkout',
+}
+# Builds running side by side slow each other down, so these get one slot
+TIMING_METRICS = {'build-time', 'test-time'}
+
+
+def _tree_size(root: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            total += os.lstat(os.path.join(dirpath, name)).st_size
+    return total
+
+
+def _run(command, cwd: str, env: Dict[str, str], shell: bool = False) -> str:
+    result = subprocess.run(command, cwd=cwd, env=env, shell=shell, capture_output=True, text=True)
+    if result.returncode != 0:
+        output = (result.stderr or result.stdout).strip().splitlines()
+        raise RuntimeError(output[-1] if output else f"exit code {result.returncode}")
+    return result.stdout
+
+
+def measure(path: str, metric: str, env: Dict[str, str], command: Optional[str] = None) -> float:
+    """One measurement of metric in the checkout at path"""
+    build = [sys.executable, 'scripts/build_app.py'] + BUILD_FLAGS
+    if metric == 'dmg-size':
+        _run(build, path, env)
+        dmgs = glob.glob(os.path.join(path, 'dist', '**', '*.dmg'), recursive=True)
+        if not dmgs:
+            raise RuntimeError("build produced no DMG")
+        return float(os.path.getsize(max(dmgs, key=os.path.getmtime)))
+    if metric == 'app-size':
+        _run(build + ['--no-dmg'], path, env)
+        return float(_tree_size(os.path.join(path, 'dist', 'Potter.app')))
+    if metric == 'build-time':
+        start = time.perf_counter()
+        _run(build + ['--no-dmg'], path, env)
+        return time.perf_counter() - start
+    if metric == 'test-time':
+        package = os.path.join(path, 'swift-potter')
+        _run(['swift', 'build', '--build-tests'], package, env)
+        start = time.perf_counter()
+        _run(['swift', 'test', '--skip-build'], package, env)
+        return time.perf_counter() - start
+    if metric == 'command':
+        output = _run(command, path, env, shell=True).split()
+        numbers = [token for token in output if _is_number(token)]
+        if not numbers:
+            raise RuntimeError("command printed no number")
+        return float(numbers[-1])
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+class MeasurementCache:
+    """Measurements by commit and metric, kept across bisect runs"""
+
+    def __init__(self, metric: str, command: Optional[str] = None):
+        self.path = os.path.join(get_cache_dir('bisect'), 'measurements.json')
+        self.key = metric if metric != 'command' else f"command:{command}"
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, commit: str) -> List[float]:
+        return list(self.data.get(self.key, {}).get(commit, []))
+
+    def add(self, commit: str, values: List[float]):
+        def change(data):
+            data.setdefault(self.key, {})[commit] = values
+            return data
+        with self._lock:
+            self.data = update_json(self.path, change, {}, indent=2, sort_keys=True)
+
+
+class MetricBisect:
+    """k-ary search for the first commit whose metric is past the threshold"""
+
+    def __init__(self, good: str, bad: str, metric: str, threshold: Optional[float] = None,
+                 lower_is_worse: bool = False, command: Optional[str] = None, runs: int = 1,
+                 slots: Optional[int] = None, repo: str = '.'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if metric == 'command' and not command:
+            raise ValueError("The command metric needs --command")
+
+        self.repo = repo_root(repo)
+        self.good = resolve_commit(self.repo, good)
+        self.bad = resolve_commit(self.repo, bad)
+        self.metric = metric
+        self.threshold = threshold
+        self.lower_is_worse = lower_is_worse
+        self.command = command
+        self.runs = runs
+        self.slots = slots or host_build_slots()
+        if metric in TIMING_METRICS:
+            if self.slots > 1 and slots:
+                print(f"⚠️  {metric} is measured one commit at a time; ignoring --slots {slots}")
+            self.slots = 1
+        self.cache = MeasurementCache(metric, command)
+        self.values = {}
+        self.skipped = {}
+
+        # Timing a build from a warm .build of another commit would measure
+        # the diff, not the build
+        self.keep = () if metric == 'build-time' else KEEP_ON_CHECKOUT
+        worktree_root = os.path.join(get_cache_dir('bisect'), 'worktrees')
+        self._worktrees = queue.Queue()
+        for slot in range(self.slots):
+            self._worktrees.put(Worktree(self.repo, os.path.join(worktree_root, f"slot-{slot}")))
+        self._env = build_environment(get_cache_root())
+
+    def is_bad(self, value: float) -> bool:
+        return value < self.threshold if self.lower_is_worse else value > self.threshold
+
+    def _measure_commit(self, commit: str) -> Optional[float]:
+        values = self.cache.get(commit)
+        if len(values) < self.runs:
+            worktree = self._worktrees.get()
+            try:
+                worktree.checkout(commit, keep=self.keep)
+                for _ in range(self.runs - len(values)):
+                    values.append(measure(worktree.path, self.metric, self._env, self.command))
+            except (RuntimeError, OSError) as e:
+                self.skipped[commit] = str(e)
+                return None
+            finally:
+                self._worktrees.put(worktree)
+            self.cache.add(commit, values)
+
+        # Median damps noisy timing runs
+        value = statistics.median(values[:self.runs])
+        self.values[commit] = value
+        return value
+
+    def _measure_all(self, commits: List[str]) -> Dict[str, Optional[float]]:
+        with ThreadPoolExecutor(max_workers=self.slots) as executor:
+            results = dict(zip(commits, executor.map(self._measure_commit, commits)))
+        for commit, value in results.items():
+            label = f"skipped ({self.skipped[commit]})" if value is None else self.format_value(value)
+            print(f"   {commit[:10]}  {label}  {_subject(self.repo, commit)}")
+        return results
+
+    def format_value(self, value: float) -> str:
+        if self.metric.endswith('-size'):
+            return f"{value / (1024 * 1024):9.2f} MB"
+        if self.metric.endswith('-time'):
+            return f"{value:9.1f} s "
+        return f"{value:12g}"
+
+    def run(self) -> Tuple[Optional[str], List[str]]:
+        """First bad commit (None if not found) and untestable commits next to it"""
+        commits = commits_between(self.repo, self.good, self.bad)
+        if not commits:
+            raise ValueError(f"{self.bad[:10]} is not a descendant of {self.good[:10]}")
+
+        print(f"🔎 Bisecting {len(commits)} commits on {self.metric} with {self.slots} parallel worktrees")
+        endpoints = self._measure_all([self.good, self.bad])
+        good_value, bad_value = endpoints[self.good], endpoints[self.bad]
+        if good_value is None or bad_value is None:
+            raise RuntimeError("could not measure the good and bad endpoints")
+        if self.threshold is None:
+            self.threshold = (good_value + bad_value) / 2
+            print(f"📏 Threshold {self.format_value(self.threshold).strip()} (midpoint of the endpoints)")
+        if self.is_bad(good_value) or not self.is_bad(bad_value):
+            print("⚠️  The endpoints do not straddle the threshold - nothing to bisect")
+            return None, []
+
+        # Indices into commits; -1 stands for the good endpoint
+        status = {len(commits) - 1: 'bad'}
+        round_number = 0
+        while True:
+            last_good = max([i for i, s in status.items() if s == 'good'], default=-1)
+            first_bad = min(i for i, s in status.items() if s == 'bad' and i > last_good)
+            untested = [i for i in range(last_good + 1, first_bad) if i not in status]
+            if not untested:
+                break
+
+            round_number += 1
+            picks = sorted({untested[len(untested) * (k + 1) // (self.slots + 1)]
+                            for k in range(min(self.slots, len(untested)))})
+            print(f"🔁 Round {round_number}: {len(untested)} candidates left, measuring {len(picks)}")
+            results = self._measure_all([commits[i] for i in picks])
+            for i in picks:
+                value = results[commits[i]]
+                status[i] = 'skip' if value is None else 'bad' if self.is_bad(value) else 'good'
+
+        skipped = [commits[i] for i in range(last_good + 1, first_bad) if status.get(i) == 'skip']
+        return commits[first_bad], skipped
+
+
+def _subject(repo: str, commit: str) -> str:
+    return git(['log', '-1', '--format=%s', commit], repo).strip()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Find the commit that regressed a build metric')
+    parser.add_argument('--good', required=True, help='A commit where the metric was fine')
+    parser.add_argument('--bad', default='HEAD', help='A commit where it regressed (default: HEAD)')
+    parser.add_argument('--metric', choices=sorted(METRICS), required=True,
+                        help='; '.join(f"{name}: {text}" for name, text in sorted(METRICS.items())))
+    parser.add_argument('--command', help="Shell command for the 'command' metric")
+    parser.add_argument('--threshold', type=float, help='Values past this are bad (default: endpoint midpoint)')
+    parser.add_argument('--lower-is-worse', action='store_true', help='Bad means below the threshold')
+    parser.add_argument('--runs', type=int, default=1, help='Measurements per commit (median is used)')
+    parser.add_argument('--slots', type=int, help='Parallel worktrees (default: from cores and memory; timing metrics use 1)')
+    args = parser.parse_args()
+
+    try:
+        bisect = MetricBisect(args.good, args.bad, args.metric, args.threshold, args.lower_is_worse,
+                              args.command, args.runs, args.slots)
+        first_bad, skipped = bisect.run()
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not first_bad:
+        sys.exit(1)
+    if skipped:
+        print(f"\n🎯 First bad commit is {first_bad[:10]} or one of {len(skipped)} untestable commits before it:")
+        for commit in skipped:
+            print(f"   {commit[:10]}  {_subject(bisect.repo, commit)}")
+    else:
+        print(f"\n🎯 First bad commit: {first_bad[:10]}  {_subject(bisect.repo, first_bad)}")
+    print(f"   {bisect.format_value(bisect.values[first_bad]).strip()} "
+          f"(threshold {bisect.format_value(bisect.threshold).strip()})")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Build cache location helpers
+All build-time caches live under one root so they can be shared or wiped together.
+Several builds (build service slots, bisect worktrees) may share one root, so
+cache files are written through a unique temporary file and read-modify-write
+updates hold a cross-process lock.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Callable
+
+DEFAULT_CACHE_ROOT = "build/cache"
+
+
+def get_cache_root() -> str:
+    """Root directory for build caches (override with POTTER_BUILD_CACHE)"""
+    return os.path.abspath(os.getenv('POTTER_BUILD_CACHE', DEFAULT_CACHE_ROOT))
+
+
+def get_cache_dir(name: str) -> str:
+    """Get (and create) the cache directory for one cache kind"""
+    cache_dir = os.path.join(get_cache_root(), name)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock for path, across threads and processes
+
+    Lock files live in the cache's locks directory, never next to path.
+    """
+    name = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    with open(os.path.join(get_cache_dir('locks'), f"{name}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path: str, data: bytes):
+    """Replace path with data; readers see the old or new file, never a mix"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path: str, data: Any, **dump_args):
+    atomic_write(path, json.dumps(data, **dump_args).encode('utf-8'))
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def update_json(path: str, change: Callable[[Any], Any], default: Any = None, **dump_args) -> Any:
+    """Read-modify-write a JSON file under its lock, so concurrent updates all land
+
+    change receives the current contents (default if missing) and returns the
+    new contents, which are also returned.
+    """
+    with file_lock(path):
+        data = change(read_json(path, default))
+        write_json(path, data, **dump_args)
+    return data
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Build manifest utilities
+Describes a directory tree (paths, types, modes, symlink targets and content
+hashes) so builds can detect changes without comparing bytes twice
+"""
+
+import hashlib
+import json
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_manifest(root: str, max_workers: int = 1) -> Dict[str, Dict]:
+    """Map every path under root (relative, '/'-separated) to its description
+
+    hashlib releases the GIL while hashing, so max_workers > 1 spreads file
+    hashing across cores.
+    """
+    if not os.path.isdir(root) or os.path.islink(root):
+        return {'.': _describe(root)}
+
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(dirnames + filenames):
+            paths.append(os.path.join(dirpath, name))
+        # os.walk does not descend into symlinked directories; keep it that way
+        dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            descriptions = list(executor.map(_describe, paths))
+    else:
+        descriptions = [_describe(path) for path in paths]
+
+    return {
+        os.path.relpath(path, root).replace(os.sep, '/'): description
+        for path, description in zip(paths, descriptions)
+    }
+
+
+def _describe(path: str) -> Dict:
+    st = os.lstat(path)
+    mode = stat.S_IMODE(st.st_mode)
+
+    if stat.S_ISLNK(st.st_mode):
+        return {'type': 'symlink', 'target': os.readlink(path)}
+    if stat.S_ISDIR(st.st_mode):
+        return {'type': 'dir', 'mode': mode}
+    return {'type': 'file', 'mode': mode, 'size': st.st_size, 'sha256': hash_file(path)}
+
+
+def diff_manifests(old: Dict[str, Dict], new: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """Paths added, removed and changed between two manifests"""
+    return {
+        'added': sorted(path for path in new if path not in old),
+        'removed': sorted(path for path in old if path not in new),
+        'changed': sorted(path for path in new if path in old and new[path] != old[path]),
+    }
+
+
+def manifest_digest(manifest: Dict[str, Dict]) -> str:
+    """Single hash summarising a whole manifest"""
+    encoded = json.dumps(manifest, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def tree_digest(root: str) -> str:
+    """Content hash of a directory tree (or single file)"""
+    return manifest_digest(create_manifest(root))
+
+
+def save_manifest(manifest: Dict[str, Dict], path: str):
+    """Write a manifest as JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def load_manifest(path: str) -> Optional[Dict[str, Dict]]:
+    """Read a manifest written by save_manifest, or None if missing/corrupt"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Local build service for Potter
+Accepts build requests over HTTP (on a Unix socket or a TCP port) and runs
+them in git worktrees. Requests with the same input key (commit plus build
+options) share one build, release builds jump ahead of dev builds, and the
+number of concurrent builds follows the host's cores and memory. Callers get
+the artifact paths back; finished artifacts are kept and served again to
+later requests for the same key.
+"""
+
+import hashlib
+import heapq
+import http.client
+import json
+import os
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+if __package__:
+    from .build_cache import get_cache_dir, get_cache_root, update_json
+    from .worktrees import Worktree, build_environment, repo_root, resolve_commit
+else:
+    from build_cache import get_cache_dir, get_cache_root, update_json
+    from worktrees import Worktree, build_environment, repo_root, resolve_commit
+
+# Lower runs first
+PRIORITIES = {'release': 0, 'dev': 1}
+
+# Options a request may set, with their defaults; anything else is rejected.
+# (Incremental DMGs keep per-app state and cannot be shared between slots.)
+BUILD_OPTIONS = {
+    'target': 'local',
+    'unsigned': False,
+    'dmg': True,
+    'skip_tests': False,
+    'skip_notarization': False,
+    'dmg_format': 'auto',
+}
+
+# A Swift release build saturates about this many cores and this much memory
+CORES_PER_BUILD = 4
+MEMORY_PER_BUILD = 6 * 1024 ** 3
+
+
+def default_socket_path() -> str:
+    # AF_UNIX paths are limited to ~104 bytes on macOS, so not under build/cache
+    return os.getenv('POTTER_BUILD_SOCKET') or os.path.join(tempfile.gettempdir(),
+                                                           f"potter-build-{os.getuid()}.sock")
+
+
+def host_build_slots() -> int:
+    """Concurrent builds this host can sustain"""
+    cores = os.cpu_count() or 1
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        memory = MEMORY_PER_BUILD
+    return max(1, min(cores // CORES_PER_BUILD, memory // MEMORY_PER_BUILD))
+
+
+def normalize_options(options: Dict) -> Dict:
+    unknown = set(options) - set(BUILD_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown build options: {', '.join(sorted(unknown))}")
+    normalized = dict(BUILD_OPTIONS)
+    normalized.update(options)
+    if normalized['target'] not in ('local', 'appstore'):
+        raise ValueError(f"Unknown target: {normalized['target']}")
+    return normalized
+
+
+def build_key(commit: str, options: Dict) -> str:
+    """Input key: identical keys produce identical artifacts"""
+    key_data = {'commit': commit, 'options': normalize_options(options)}
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_command(options: Dict) -> List[str]:
+    command = [sys.executable, 'scripts/build_app.py', '--target', options['target'],
+               '--dmg-format', options['dmg_format']]
+    for option, flag in (('unsigned', '--unsigned'), ('skip_tests', '--skip-tests'),
+                         ('skip_notarization', '--skip-notarization')):
+        if options[option]:
+            command.append(flag)
+    if not options['dmg']:
+        command.append('--no-dmg')
+    return command
+
+
+class BuildJob:
+    """One build, shared by every request with its key"""
+
+    def __init__(self, key: str, commit: str, options: Dict, priority: str):
+        self.key = key
+        self.commit = commit
+        self.options = options
+        self.priority = priority
+        self.status = 'queued'
+        self.artifacts = []
+        self.error = None
+        self.log_path = None
+        self.requests = 1
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            'key': self.key,
+            'commit': self.commit,
+            'options': self.options,
+            'priority': self.priority,
+            'status': self.status,
+            'artifacts': self.artifacts,
+            'error': self.error,
+            'log': self.log_path,
+            'requests': self.requests,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class BuildQueue:
+    """Coalescing priority queue of builds run by a fixed set of worktree slots"""
+
+    def __init__(self, repo: str = '.', slots: Optional[int] = None, cache_dir: Optional[str] = None):
+        self.repo = repo_root(repo)
+        self.slots = slots or host_build_slots()
+        self.cache_dir = cache_dir or get_cache_dir('build_service')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.cache_root = get_cache_root()
+        self.results_path = os.path.join(self.cache_dir, 'results.json')
+        self.jobs = {}
+        self._heap = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        for slot in range(self.slots):
+            thread = threading.Thread(target=self._worker, args=(slot,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, rev: str, options: Dict, priority: Optional[str] = None) -> BuildJob:
+        """Queue a build, or join the existing build or result for the same key"""
+        options = normalize_options(options)
+        commit = resolve_commit(self.repo, rev)
+        key = build_key(commit, options)
+        # Signed builds are the ones that ship
+        priority = priority or ('dev' if options['unsigned'] else 'release')
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        with self._condition:
+            job = self.jobs.get(key)
+            if job and job.status in ('queued', 'running'):
+                job.requests += 1
+                if PRIORITIES[priority] < PRIORITIES[job.priority]:
+                    job.priority = priority
+                    if job.status == 'queued':
+                        # The stale heap entry is skipped when popped
+                        self._push(job)
+                return job
+            if job and job.status == 'succeeded' and all(os.path.exists(p) for p in job.artifacts):
+                job.requests += 1
+                return job
+
+            stored = self._load_results().get(key)
+            if stored and stored['artifacts'] and all(os.path.exists(p) for p in stored['artifacts']):
+                job = BuildJob(key, commit, options, priority)
+                job.status = 'succeeded'
+                job.artifacts = stored['artifacts']
+                job.log_path = stored.get('log')
+                job.finished = stored.get('finished')
+                job.done.set()
+                self.jobs[key] = job
+                return job
+
+            job = BuildJob(key, commit, options, priority)
+            self.jobs[key] = job
+            self._push(job)
+            self._condition.notify()
+            return job
+
+    def _push(self, job: BuildJob):
+        self._sequence += 1
+        heapq.heappush(self._heap, (PRIORITIES[job.priority], self._sequence, job.key, job.priority))
+
+    def _next_job(self) -> BuildJob:
+        with self._condition:
+            while True:
+                while self._heap:
+                    _, _, key, priority = heapq.heappop(self._heap)
+                    job = self.jobs[key]
+                    if job.status == 'queued' and job.priority == priority:
+                        job.status = 'running'
+                        job.started = time.time()
+                        return job
+                self._condition.wait()
+
+    def _worker(self, slot: int):
+        worktree = Worktree(self.repo, os.path.join(self.cache_dir, 'worktrees', f"slot-{slot}"))
+        while True:
+            job = self._next_job()
+            print(f"🔨 [slot {slot}] Building {job.commit[:10]} ({job.priority}, key {job.key[:12]})")
+            try:
+                job.artifacts = self._build(worktree, job)
+                job.status = 'succeeded'
+                print(f"✅ [slot {slot}] {job.commit[:10]} → {', '.join(job.artifacts)}")
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+                print(f"❌ [slot {slot}] {job.commit[:10]} failed: {e}")
+            job.finished = time.time()
+            if job.status == 'succeeded':
+                self._save_result(job)
+            job.done.set()
+
+    def _build(self, worktree: Worktree, job: BuildJob) -> List[str]:
+        log_dir = os.path.join(self.cache_dir, 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+        job.log_path = os.path.join(log_dir, f"{job.key}.log")
+
+        worktree.checkout(job.commit)
+        with open(job.log_path, 'w') as log:
+            result = subprocess.run(build_command(job.options), cwd=worktree.path,
+                                    env=build_environment(self.cache_root),
+                                    stdout=log, stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            raise RuntimeError(f"build exited with {result.returncode} (log: {job.log_path})")
+
+        dist = os.path.join(worktree.path, 'dist-appstore' if job.options['target'] == 'appstore' else 'dist')
+        if not os.path.isdir(dist):
+            raise RuntimeError(f"build produced no {os.path.basename(dist)} directory")
+
+        # Move outputs out of the slot, which the next build cleans
+        artifact_dir = os.path.join(self.cache_dir, 'artifacts', job.key)
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+        os.makedirs(artifact_dir)
+        artifacts = []
+        for name in sorted(os.listdir(dist)):
+            if name.endswith(('.app', '.dmg', '.pkg', '.zip')):
+                target = os.path.join(artifact_dir, name)
+                shutil.move(os.path.join(dist, name), target)
+                artifacts.append(target)
+        if not artifacts:
+            raise RuntimeError("build produced no artifacts")
+        return artifacts
+
+    def _load_results(self) -> Dict:
+        try:
+            with open(self.results_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_result(self, job: BuildJob):
+        entry = {'commit': job.commit, 'options': job.options, 'artifacts': job.artifacts,
+                 'log': job.log_path, 'finished': job.finished}
+        update_json(self.results_path, lambda results: {**results, job.key: entry}, {}, indent=2)
+
+    def get(self, key: str) -> Optional[BuildJob]:
+        with self._condition:
+            return self.jobs.get(key)
+
+    def status(self) -> Dict:
+        with self._condition:
+            return {
+                'slots': self.slots,
+                'jobs': [job.to_dict() for job in sorted(self.jobs.values(), key=lambda j: j.submitted)],
+            }
+
+
+# ── HTTP interface ─────────────────────────────────────────────
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """POST /builds, GET /builds, GET /builds/<key>[?wait=1]"""
+
+    queue = None
+
+    def address_string(self):
+        # Unix socket peers have no host address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send(self, code: int, payload: Dict):
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _wait(self, job: BuildJob, query: Dict) -> Dict:
+        if query.get('wait', ['0'])[0] in ('1', 'true'):
+            job.done.wait()
+        return job.to_dict()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts == ['builds']:
+            self._send(200, self.queue.status())
+        elif len(parts) == 2 and parts[0] == 'builds':
+            job = self.queue.get(parts[1])
+            if job:
+                self._send(200, self._wait(job, parse_qs(url.query)))
+            else:
+                self._send(404, {'error': 'not found'})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/builds':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job = self.queue.submit(request.get('commit', 'HEAD'), request.get('options', {}),
+                                    request.get('priority'))
+        except (ValueError, RuntimeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        payload = self._wait(job, parse_qs(url.query))
+        self._send(200 if job.done.is_set() else 202, payload)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def serve(queue: BuildQueue, socket_path: Optional[str] = None, port: Optional[int] = None):
+    handler = type('Handler', (BuildRequestHandler,), {'queue': queue})
+    if port:
+        # Loopback only: the service runs arbitrary commits' build scripts
+        server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        where = f"http://127.0.0.1:{port}"
+    else:
+        socket_path = socket_path or default_socket_path()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        os.chmod(socket_path, 0o600)
+        where = socket_path
+
+    queue.start()
+    print(f"🏗️  Build service listening on {where} ({queue.slots} concurrent builds)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Build service stopped")
+    finally:
+        server.server_close()
+        if not port and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _connection(socket_path: Optional[str], url: Optional[str]) -> http.client.HTTPConnection:
+    if url:
+        parsed = urlparse(url)
+        return http.client.HTTPConnection(parsed.hostname, parsed.port)
+    return UnixHTTPConnection(socket_path or default_socket_path())
+
+
+def request_build(commit: str = 'HEAD', options: Optional[Dict] = None, priority: Optional[str] = None,
+                  wait: bool = True, socket_path: Optional[str] = None, url: Optional[str] = None) -> Dict:
+    """Submit a build to a running service; returns the job (with artifacts once done)"""
+    connection = _connection(socket_path, url)
+    body = json.dumps({'commit': commit, 'options': options or {}, 'priority': priority})
+    try:
+        connection.request('POST', f"/builds?wait={1 if wait else 0}", body,
+                           {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        payload = json.loads(response.read() or b'{}')
+    finally:
+        connection.close()
+    if response.status >= 400:
+        raise RuntimeError(payload.get('error', f"HTTP {response.status}"))
+    return payload
+
+
+def service_status(socket_path: Optional[str] = None, url: Optional[str] = None) -> Dict:
+    connection = _connection(socket_path, url)
+    try:
+        connection.request('GET', '/builds')
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Shared local build service')
+    parser.add_argument('--socket', help='Unix socket path (default: $POTTER_BUILD_SOCKET or a per-user temp path)')
+    parser.add_argument('--url', help='Talk to a service on http://127.0.0.1:PORT instead of a socket')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the service')
+    serve_parser.add_argument('--port', type=int, help='Listen on 127.0.0.1:PORT instead of a Unix socket')
+    serve_parser.add_argument('--slots', type=int, help='Concurrent builds (default: from cores and memory)')
+
+    submit_parser = subparsers.add_parser('submit', help='Request a build and print its artifacts')
+    submit_parser.add_argument('--commit', default='HEAD')
+    submit_parser.add_argument('--target', choices=['local', 'appstore'], default='local')
+    submit_parser.add_argument('--unsigned', action='store_true')
+    submit_parser.add_argument('--no-dmg', action='store_true')
+    submit_parser.add_argument('--skip-tests', action='store_true')
+    submit_parser.add_argument('--skip-notarization', action='store_true')
+    submit_parser.add_argument('--dmg-format', default='auto')
+    submit_parser.add_argument('--priority', choices=sorted(PRIORITIES))
+    submit_parser.add_argument('--no-wait', action='store_true', help='Return once queued')
+
+    subparsers.add_parser('status', help='Show queued, running and finished builds')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(BuildQueue(slots=args.slots), args.socket, args.port)
+        sys.exit(0)
+
+    try:
+        if args.command == 'status':
+            for job in service_status(args.socket, args.url)['jobs']:
+                print(f"{job['status']:<10} {job['priority']:<8} {job['commit'][:10]}  "
+                      f"×{job['requests']}  {', '.join(job['artifacts']) or job['error'] or ''}")
+            sys.exit(0)
+
+        # Resolve locally so the service builds exactly what the caller sees
+        commit = resolve_commit(repo_root(), args.commit)
+        job = request_build(commit, {
+            'target': args.target,
+            'unsigned': args.unsigned,
+            'dmg': not args.no_dmg,
+            'skip_tests': args.skip_tests,
+            'skip_notarization': args.skip_notarization,
+            'dmg_format': args.dmg_format,
+        }, args.priority, wait=not args.no_wait, socket_path=args.socket, url=args.url)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if job['status'] == 'succeeded':
+        for artifact in job['artifacts']:
+            print(artifact)
+    elif job['status'] == 'failed':
+        print(f"❌ Build failed: {job['error']}")
+        sys.exit(1)
+    else:
+        print(f"⏳ Build {job['key'][:12]} {job['status']}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Bundle metadata for Potter
+One typed view of Info.plist shared by version_manager and build_app. The
+source plist is parsed once per process (reloaded only if the file changes
+on disk), derived values such as the codename are computed once, and writes
+go through an exclusive lock and an atomic rename so concurrent release
+jobs cannot interleave or leave a half-written Info.plist behind.
+"""
+
+import copy
+import os
+import plistlib
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+if __package__:
+    from .build_cache import atomic_write, file_lock
+else:
+    from build_cache import atomic_write, file_lock
+
+SOURCE_INFO_PLIST = "swift-potter/Sources/Resources/Info.plist"
+
+# Keys that only make sense for Sparkle (direct distribution) builds
+SPARKLE_KEYS = ('SUFeedURL', 'SUPublicEDKey', 'SUEnableAutomaticChecks', 'SUScheduledCheckInterval')
+
+VERSION_RE = re.compile(r'^\d+\.\d+\.\d+$')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class BundleMetadata:
+    """Read-only, typed view of an Info.plist; changes return a new instance"""
+
+    def __init__(self, data: Dict[str, Any], path: Optional[str] = None,
+                 fmt: plistlib.PlistFormat = plistlib.FMT_XML):
+        self._data = data
+        self.path = path
+        self.format = fmt
+        self._codename = None
+
+    @property
+    def version(self) -> str:
+        version = self._data.get('CFBundleShortVersionString')
+        if not version:
+            raise ValueError("CFBundleShortVersionString not found in Info.plist")
+        return version
+
+    @property
+    def build_version(self) -> Optional[str]:
+        return self._data.get('CFBundleVersion')
+
+    @property
+    def bundle_id(self) -> Optional[str]:
+        return self._data.get('CFBundleIdentifier')
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._data.get('CFBundleName')
+
+    @property
+    def executable(self) -> Optional[str]:
+        return self._data.get('CFBundleExecutable')
+
+    @property
+    def minimum_system_version(self) -> Optional[str]:
+        return self._data.get('LSMinimumSystemVersion')
+
+    @property
+    def has_sparkle(self) -> bool:
+        return any(key in self._data for key in SPARKLE_KEYS)
+
+    @property
+    def codename(self) -> str:
+        """Codename of this plist's version, computed once per instance (it runs a Swift script)"""
+        if self._codename is None:
+            if __package__:
+                from .codename_utils import get_codename_for_version
+            else:
+                from codename_utils import get_codename_for_version
+            self._codename = get_codename_for_version(self.version)
+        return self._codename
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return copy.deepcopy(self._data.get(key, default))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._data)
+
+    def updated(self, changes: Optional[Dict[str, Any]] = None, removed: Iterable[str] = ()) -> 'BundleMetadata':
+        """Copy with keys set and/or removed"""
+        data = self.as_dict()
+        data.update(changes or {})
+        for key in removed:
+            data.pop(key, None)
+        return BundleMetadata(data, self.path, self.format)
+
+    def with_version(self, version: str) -> 'BundleMetadata':
+        if not VERSION_RE.match(version):
+            raise ValueError(f"Invalid version format: {version}. Must be X.Y.Z")
+        return self.updated({'CFBundleVersion': version, 'CFBundleShortVersionString': version})
+
+    def for_bundle(self, app_name: str, bundle_id: str, target: str = 'local') -> 'BundleMetadata':
+        """Metadata for a built app: fixed identity, no Sparkle keys for the App Store"""
+        return self.updated({
+            'CFBundleExecutable': app_name,
+            'CFBundleIdentifier': bundle_id,
+            'CFBundleName': app_name,
+            'CFBundleDisplayName': app_name,
+            'CFBundleIconFile': 'AppIcon',
+        }, removed=SPARKLE_KEYS if target == 'appstore' else ())
+
+    def to_bytes(self, fmt: Optional[plistlib.PlistFormat] = None) -> bytes:
+        return plistlib.dumps(self._data, fmt=fmt or self.format)
+
+    def write(self, path: str, fmt: Optional[plistlib.PlistFormat] = None):
+        """Atomically write to path (the bundle copy typically uses FMT_BINARY)"""
+        atomic_write(path, self.to_bytes(fmt))
+
+
+def _parse(path: str) -> BundleMetadata:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    fmt = plistlib.FMT_BINARY if raw.startswith(b'bplist00') else plistlib.FMT_XML
+    return BundleMetadata(plistlib.loads(raw), path, fmt)
+
+
+def load_metadata(path: str = SOURCE_INFO_PLIST) -> BundleMetadata:
+    """Parsed Info.plist, cached per process until the file changes on disk"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Info.plist not found at {path}")
+
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    key = os.path.abspath(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    metadata = _parse(path)
+    with _cache_lock:
+        _cache[key] = (signature, metadata)
+    return metadata
+
+
+@contextmanager
+def locked_plist(path: str = SOURCE_INFO_PLIST):
+    """Hold an exclusive lock for path (advisory, across processes)"""
+    with file_lock(path):
+        yield
+
+
+def update_metadata(change: Callable[[BundleMetadata], BundleMetadata],
+                    path: str = SOURCE_INFO_PLIST) -> BundleMetadata:
+    """Read-modify-write under the lock, so concurrent updates serialize"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Info.plist not found at {path}")
+
+    with locked_plist(path):
+        # Re-read under the lock; the cached copy may predate another writer
+        current = _parse(path)
+        updated = change(current)
+        updated.write(path, current.format)
+        st = os.stat(path)
+
+    with _cache_lock:
+        _cache[os.path.abspath(path)] = ((st.st_mtime_ns, st.st_size, st.st_ino), updated)
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Show Potter bundle metadata')
+    parser.add_argument('path', nargs='?', default=SOURCE_INFO_PLIST)
+    parser.add_argument('--codename', action='store_true', help='Also compute the release codename')
+    args = parser.parse_args()
+
+    metadata = load_metadata(args.path)
+    print(f"📦 {metadata.name} {metadata.version} (build {metadata.build_version})")
+    print(f"   Bundle ID:  {metadata.bundle_id}")
+    print(f"   Executable: {metadata.executable}")
+    print(f"   Minimum macOS: {metadata.minimum_system_version}")
+    print(f"   Sparkle: {'yes' if metadata.has_sparkle else 'no'}")
+    print(f"   Format: {'binary' if metadata.format == plistlib.FMT_BINARY else 'XML'}")
+    if args.codename:
+        print(f"   Codename: {metadata.codename}")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Zero-copy staging of app bundles
+Materializes a bundle somewhere else (e.g. the DMG source folder) without
+moving its bytes: APFS clones where available, then hardlinks, then a real
+copy. A post-check confirms the staged tree still matches the original,
+including extended attributes and the code signature.
+"""
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+from typing import List, Optional
+
+if __package__:
+    from .build_manifest import hash_file
+    from .signing_utils import SigningComponent, get_cdhash, verify_component
+    from .zip_writer import read_xattrs
+else:
+    from build_manifest import hash_file
+    from signing_utils import SigningComponent, get_cdhash, verify_component
+    from zip_writer import read_xattrs
+
+STAGING_METHODS = ('clone', 'hardlink', 'copy')
+
+
+def _clone_tree(src: str, dest: str) -> bool:
+    # BSD cp -c uses clonefile(2): copy-on-write, with xattrs and flags intact
+    if sys.platform != 'darwin':
+        return False
+    result = subprocess.run(['cp', '-c', '-R', '-p', src, dest], capture_output=True, text=True)
+    if result.returncode != 0:
+        shutil.rmtree(dest, ignore_errors=True)
+        return False
+    return True
+
+
+def _hardlink_tree(src: str, dest: str) -> bool:
+    try:
+        for dirpath, dirnames, filenames in os.walk(src):
+            rel = os.path.relpath(dirpath, src)
+            target_dir = dest if rel == '.' else os.path.join(dest, rel)
+            os.makedirs(target_dir, exist_ok=True)
+            shutil.copystat(dirpath, target_dir, follow_symlinks=False)
+
+            for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+                path = os.path.join(dirpath, name)
+                if os.path.islink(path):
+                    os.symlink(os.readlink(path), os.path.join(target_dir, name))
+                else:
+                    os.link(path, os.path.join(target_dir, name))
+            dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+        return True
+    except OSError:
+        # Typically EXDEV: source and destination are on different volumes
+        shutil.rmtree(dest, ignore_errors=True)
+        return False
+
+
+def _copy_tree(src: str, dest: str) -> bool:
+    if sys.platform == 'darwin':
+        result = subprocess.run(['ditto', '--rsrc', '--extattr', src, dest], capture_output=True, text=True)
+        return result.returncode == 0
+    shutil.copytree(src, dest, symlinks=True)
+    return True
+
+
+def stage_tree(src: str, dest: str, methods=STAGING_METHODS) -> Optional[str]:
+    """Materialize src at dest; returns the method that worked, or None"""
+    if os.path.lexists(dest):
+        raise FileExistsError(dest)
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    stagers = {'clone': _clone_tree, 'hardlink': _hardlink_tree, 'copy': _copy_tree}
+    for method in methods:
+        if stagers[method](src, dest):
+            return method
+    return None
+
+
+def verify_staged_tree(src: str, dest: str) -> List[str]:
+    """Differences between a staged tree and its source; empty when intact
+
+    Hardlinked files share an inode with the source and need no hashing;
+    clones and copies are compared by content.
+    """
+    problems = []
+
+    def walk(root: str) -> List[str]:
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in dirnames + filenames:
+                paths.append(os.path.relpath(os.path.join(dirpath, name), root))
+            dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+        return sorted(paths)
+
+    src_paths = walk(src)
+    dest_paths = set(walk(dest))
+    problems += [f"missing {p}" for p in src_paths if p not in dest_paths]
+    problems += [f"unexpected {p}" for p in sorted(dest_paths - set(src_paths))]
+
+    for rel in ['.'] + [p for p in src_paths if p in dest_paths]:
+        src_path = os.path.join(src, rel)
+        dest_path = os.path.join(dest, rel)
+        src_st = os.lstat(src_path)
+        dest_st = os.lstat(dest_path)
+
+        if stat.S_IFMT(src_st.st_mode) != stat.S_IFMT(dest_st.st_mode):
+            problems.append(f"type differs: {rel}")
+            continue
+        if stat.S_ISLNK(src_st.st_mode):
+            if os.readlink(src_path) != os.readlink(dest_path):
+                problems.append(f"symlink target differs: {rel}")
+            continue
+        if stat.S_IMODE(src_st.st_mode) != stat.S_IMODE(dest_st.st_mode):
+            problems.append(f"mode differs: {rel}")
+        if stat.S_ISREG(src_st.st_mode) and (src_st.st_dev, src_st.st_ino) != (dest_st.st_dev, dest_st.st_ino):
+            if src_st.st_size != dest_st.st_size or hash_file(src_path) != hash_file(dest_path):
+                problems.append(f"content differs: {rel}")
+        if read_xattrs(src_path) != read_xattrs(dest_path):
+            problems.append(f"extended attributes differ: {rel}")
+
+    # The bundle seal covers every resource, so one verification of the staged
+    # bundle catches anything the structural check missed
+    if not problems and sys.platform == 'darwin' and shutil.which('codesign') and get_cdhash(src):
+        result = verify_component(SigningComponent(dest, 'app', 0))
+        if not result.success:
+            problems.append(f"code signature invalid: {result.output.strip()}")
+
+    return problems
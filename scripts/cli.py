@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Single entry point for Potter's build and release scripts
+Subcommands map to the existing script modules and are imported only when
+invoked, so 'potter-tools version --get' never pays for the build, DMG or
+AI release-notes machinery. Each subcommand runs its module exactly as
+'python3 scripts/<module>.py' would.
+"""
+
+import os
+import re
+import runpy
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# name -> (module, description, import budget in ms)
+COMMANDS = {
+    'build': ('build_app', 'Build, sign, notarize and package the app', 120),
+    'build-service': ('build_service', 'Shared build queue: serve, submit, status', 120),
+    'binary-size': ('binary_size', 'Attribute executable size to Swift modules and types', 80),
+    'bisect': ('build_bisect', 'Find the commit that regressed a build metric', 120),
+    'release': ('release_manager', 'Version, build and publish a release', 150),
+    'version': ('version_manager', 'Show or change the app version', 60),
+    'metadata': ('bundle_metadata', 'Show Info.plist metadata', 60),
+    'codename': ('codename_utils', 'Show the release codename and build name', 60),
+    'test': ('swift_test_runner', 'Run Swift tests in isolated parallel shards', 150),
+    'test-impact': ('test_impact', 'Show which test suites a change affects', 60),
+    'test-profile': ('test_profiler', 'Report slow tests and duration regressions', 100),
+    'notarize': ('notarization_manager', 'Resume or inspect notarization submissions', 120),
+    'dmg-benchmark': ('dmg_benchmark', 'Benchmark DMG formats', 150),
+    'udif': ('udif_writer', 'Convert or verify UDIF disk images', 150),
+    'zip': ('zip_writer', 'Create notarization zips', 100),
+    'ds-store': ('dsstore_writer', 'Dump a .DS_Store file', 60),
+}
+
+# Optional dependencies no subcommand may import before it needs them
+DEFERRED_MODULES = ('openai', 'dotenv')
+
+_IMPORT_TIME_RE = re.compile(r'^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$')
+
+
+def run_command(name: str, argv: List[str]):
+    """Run a subcommand's module as __main__ with argv as its arguments"""
+    module = COMMANDS[name][0]
+    sys.argv = [f"{module}.py"] + argv
+    # Inside the package the module runs under its qualified name, so its
+    # sibling imports resolve relative to the package
+    runpy.run_module(f"{__package__}.{module}" if __package__ else module,
+                     run_name='__main__', alter_sys=True)
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """Cumulative import time of module in a fresh interpreter (ms), and every
+    module it pulled in with its own cumulative time"""
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=scripts_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else module)
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if match:
+            imported[match.group(2)] = int(match.group(1)) / 1000
+    return imported.get(module, 0.0), imported
+
+
+def check_import_budgets(names: Optional[List[str]] = None, runs: int = 3) -> bool:
+    """Check each subcommand's import time against its budget
+
+    Takes the best of several runs to smooth out a cold disk cache, and
+    fails outright if a deferred dependency is imported at all.
+    """
+    ok = True
+    for name in names or sorted(COMMANDS):
+        module, _, budget = COMMANDS[name]
+        try:
+            samples = [measure_import(module) for _ in range(runs)]
+        except ImportError as e:
+            print(f"❌ {name:<14} import failed: {e}")
+            ok = False
+            continue
+
+        elapsed, imported = min(samples, key=lambda sample: sample[0])
+        eager = [dep for dep in DEFERRED_MODULES if dep in imported]
+        if eager:
+            print(f"❌ {name:<14} imports {', '.join(eager)} at startup")
+            ok = False
+        elif elapsed > budget:
+            print(f"❌ {name:<14} {elapsed:6.1f} ms  (budget {budget} ms)")
+            ok = False
+        else:
+            print(f"✅ {name:<14} {elapsed:6.1f} ms  (budget {budget} ms)")
+    return ok
+
+
+def print_commands():
+    print("usage: potter-tools <command> [args...]\n")
+    print("Commands:")
+    for name, (_, description, _) in sorted(COMMANDS.items()):
+        print(f"  {name:<16} {description}")
+    print(f"  {'import-budget':<16} Check each command's import time against its budget")
+    print("\nRun 'potter-tools <command> --help' for a command's options.")
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print_commands()
+        return
+
+    name, rest = argv[0], argv[1:]
+    if name == 'import-budget':
+        import argparse
+
+        parser = argparse.ArgumentParser(prog='potter-tools import-budget',
+                                         description="Check each command's import time against its budget")
+        parser.add_argument('commands', nargs='*', metavar='command', help='Commands to check (default: all)')
+        parser.add_argument('--runs', type=int, default=3, help='Measurements per command (best is used)')
+        args = parser.parse_args(rest)
+        unknown = [command for command in args.commands if command not in COMMANDS]
+        if unknown:
+            parser.error(f"unknown command(s): {', '.join(unknown)}")
+        sys.exit(0 if check_import_budgets(args.commands or None, args.runs) else 1)
+
+    if name not in COMMANDS:
+        print(f"❌ Unknown command: {name}\n")
+        print_commands()
+        sys.exit(2)
+    run_command(name, rest)
+
+
+if __name__ == "__main__":
+    main()
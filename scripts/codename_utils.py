@@ -8,8 +8,25 @@ import subprocess
 import re
 import os
 import sys
+import tempfile
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
 
+def _run_swift_script(source):
+    """Run a throwaway Swift script from its own temp file
+
+    Builds run concurrently (build service slots, bisect worktrees, the
+    release's background build), so a fixed path would be shared between them.
+    """
+    with tempfile.NamedTemporaryFile('w', prefix='potter-codename-', suffix='.swift') as f:
+        f.write(source)
+        f.flush()
+        return subprocess.run(['swift', f.name], capture_output=True, text=True)
+
+# Each call compiles and runs a Swift script; the answer is fixed per version,
+# so compute it once per process
+@lru_cache(maxsize=None)
 def get_codename_for_version(version_string):
     """Get codename for a specific version (deterministic based on version and date)"""
     try:
@@ -70,16 +87,7 @@ print("CODENAME:\\(names.versionCodename)")
 print("BUILD_NAME:\\(names.buildName)")
 '''
         
-        # Write temporary script
-        temp_file = "/tmp/extract_version_codename.swift"
-        with open(temp_file, 'w') as f:
-            f.write(temp_script)
-        
-        # Run Swift script
-        result = subprocess.run(['swift', temp_file], capture_output=True, text=True)
-        
-        # Clean up
-        os.remove(temp_file)
+        result = _run_swift_script(temp_script)
         
         if result.returncode == 0:
             # Parse output to extract codename
@@ -96,6 +104,11 @@ print("BUILD_NAME:\\(names.buildName)")
 
 def get_current_codename():
     """Extract current version codename from Swift ProcessManager"""
+    # Date-based, so cached per day: the build service runs for days
+    return _codename_for_day(date.today())
+
+@lru_cache(maxsize=None)
+def _codename_for_day(day):
     try:
         # Create a temporary Swift script to extract the codename
         temp_script = '''
@@ -151,16 +164,7 @@ print("CODENAME:\\(names.versionCodename)")
 print("BUILD_NAME:\\(names.buildName)")
 '''
         
-        # Write temporary script
-        temp_file = "/tmp/extract_codename.swift"
-        with open(temp_file, 'w') as f:
-            f.write(temp_script)
-        
-        # Run Swift script
-        result = subprocess.run(['swift', temp_file], capture_output=True, text=True)
-        
-        # Clean up
-        os.remove(temp_file)
+        result = _run_swift_script(temp_script)
         
         if result.returncode == 0:
             # Parse output to extract codename
@@ -177,6 +181,10 @@ print("BUILD_NAME:\\(names.buildName)")
 
 def get_current_build_name():
     """Extract current build name from Swift ProcessManager"""
+    return _build_name_for_day(date.today())
+
+@lru_cache(maxsize=None)
+def _build_name_for_day(day):
     try:
         # Create a temporary Swift script to extract the build name
         temp_script = '''
@@ -231,16 +239,7 @@ let names = CreativeBuildNames.generate()
 print("BUILD_NAME:\\(names.buildName)")
 '''
         
-        # Write temporary script
-        temp_file = "/tmp/extract_build_name.swift"
-        with open(temp_file, 'w') as f:
-            f.write(temp_script)
-        
-        # Run Swift script
-        result = subprocess.run(['swift', temp_file], capture_output=True, text=True)
-        
-        # Clean up
-        os.remove(temp_file)
+        result = _run_swift_script(temp_script)
         
         if result.returncode == 0:
             # Parse output to extract build name
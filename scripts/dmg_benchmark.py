@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+DMG compression format benchmark
+Builds the same staged app into every UDIF format and records compression
+time, image size and decompression throughput (plus mount time where hdiutil
+is available). Results are cached so builds can pick a format per profile.
+Off macOS the raw image is a tar stand-in and the codecs are Python's, which
+keeps the relative comparison meaningful on Linux CI.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+if __package__:
+    from .build_cache import get_cache_dir, write_json
+    from .build_manifest import tree_digest
+    from .udif_writer import FORMATS, SECTOR_SIZE, UDIFImage, write_udif
+else:
+    from build_cache import get_cache_dir, write_json
+    from build_manifest import tree_digest
+    from udif_writer import FORMATS, SECTOR_SIZE, UDIFImage, write_udif
+
+DEFAULT_FORMAT = 'UDZO'
+# Release builds take the smallest image that still decompresses at least
+# this fraction as fast as UDZO, so downloads shrink without slow mounts
+MIN_RELATIVE_THROUGHPUT = 0.5
+BUILD_PROFILES = ('release', 'dev')
+# Real DMGs are only built on macOS; stand-in results from elsewhere measure
+# a tar image with Python's codecs and must not choose a release format
+BUILD_PLATFORM = 'darwin'
+
+
+def get_results_path() -> str:
+    return os.path.join(get_cache_dir('dmg_benchmark'), 'results.json')
+
+
+def build_raw_image(app_path: str, raw_path: str, volume_name: str = 'Potter Benchmark') -> str:
+    """Stage the app like the DMG source folder and produce an uncompressed image"""
+    if sys.platform != 'darwin' or not shutil.which('hdiutil'):
+        # Stand-in for an HFS+/APFS image: tar output is 512-byte aligned
+        with tarfile.open(raw_path, 'w', format=tarfile.PAX_FORMAT) as tar:
+            tar.add(app_path, arcname=os.path.basename(app_path))
+        return raw_path
+
+    staging = tempfile.mkdtemp(prefix='potter-dmg-benchmark-')
+    try:
+        subprocess.run(['ditto', app_path, os.path.join(staging, os.path.basename(app_path))], check=True)
+        os.symlink('/Applications', os.path.join(staging, 'Applications'))
+        base = os.path.splitext(raw_path)[0]
+        subprocess.run([
+            'hdiutil', 'create', '-volname', volume_name, '-srcfolder', staging,
+            '-ov', '-format', 'UDTO', base
+        ], check=True, capture_output=True, text=True)
+        # hdiutil always appends .cdr
+        if f"{base}.cdr" != raw_path:
+            os.replace(f"{base}.cdr", raw_path)
+        return raw_path
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def measure_mount(dmg_path: str) -> Optional[float]:
+    """Seconds to attach (without verification) and detach the image, if hdiutil exists"""
+    if not shutil.which('hdiutil'):
+        return None
+
+    mount_point = tempfile.mkdtemp(prefix='potter-dmg-mount-')
+    try:
+        start = time.perf_counter()
+        result = subprocess.run([
+            'hdiutil', 'attach', dmg_path, '-nobrowse', '-noverify', '-noautoopen',
+            '-mountpoint', mount_point
+        ], capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            print(f"⚠️  Could not mount {dmg_path}: {result.stderr.strip()}")
+            return None
+        subprocess.run(['hdiutil', 'detach', mount_point], capture_output=True, text=True)
+        return elapsed
+    finally:
+        shutil.rmtree(mount_point, ignore_errors=True)
+
+
+def benchmark_format(raw_path: str, image_format: str, work_dir: str,
+                     max_workers: Optional[int] = None) -> Dict:
+    """Compress raw_path into one format and measure it"""
+    dmg_path = os.path.join(work_dir, f"benchmark-{image_format}.dmg")
+    raw_size = os.path.getsize(raw_path)
+    result = {'format': image_format}
+
+    try:
+        start = time.perf_counter()
+        write_udif(raw_path, dmg_path, image_format, max_workers)
+        result['compress_seconds'] = round(time.perf_counter() - start, 3)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+
+    size = os.path.getsize(dmg_path)
+    result['size'] = size
+    result['ratio'] = round(size / raw_size, 4) if raw_size else 1.0
+
+    start = time.perf_counter()
+    decompressed = sum(len(data) for _, data in UDIFImage(dmg_path).iter_sectors())
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    result['decompress_mb_per_s'] = round(decompressed / elapsed / (1024 * 1024), 1)
+    result['mount_seconds'] = measure_mount(dmg_path)
+
+    os.remove(dmg_path)
+    return result
+
+
+def run_benchmark(app_path: str, formats: Optional[List[str]] = None,
+                  max_workers: Optional[int] = None, raw_path: Optional[str] = None) -> Dict:
+    """Benchmark every format for one app and save the results"""
+    formats = formats or list(FORMATS)
+    work_dir = tempfile.mkdtemp(prefix='potter-dmg-benchmark-')
+
+    try:
+        if not raw_path:
+            print("📦 Building uncompressed image...")
+            raw_path = build_raw_image(app_path, os.path.join(work_dir, 'image.cdr'))
+
+        raw_size = os.path.getsize(raw_path)
+        if raw_size % SECTOR_SIZE:
+            raise ValueError(f"{raw_path} is not sector aligned")
+
+        results = []
+        for image_format in formats:
+            print(f"⏱️  Benchmarking {image_format}...")
+            result = benchmark_format(raw_path, image_format, work_dir, max_workers)
+            if 'error' in result:
+                print(f"⚠️  {image_format}: {result['error']}")
+            else:
+                print(f"   {result['size'] / (1024 * 1024):.1f} MB "
+                      f"in {result['compress_seconds']:.2f}s, "
+                      f"decompresses at {result['decompress_mb_per_s']:.0f} MB/s")
+            results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    benchmark = {
+        'timestamp': datetime.now().isoformat(),
+        'platform': sys.platform,
+        'app_digest': tree_digest(app_path) if os.path.exists(app_path) else None,
+        'raw_size': raw_size,
+        'results': results,
+    }
+
+    path = get_results_path()
+    write_json(path, benchmark, indent=2)
+    print(f"💾 Saved benchmark results to {path}")
+    return benchmark
+
+
+def load_benchmark() -> Optional[Dict]:
+    try:
+        with open(get_results_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def select_dmg_format(profile: str, benchmark: Optional[Dict] = None,
+                      platform: str = BUILD_PLATFORM) -> str:
+    """Pick a format for a build profile from the last benchmark
+
+    'release' favours download size, 'dev' favours build time. Without
+    benchmark results recorded on `platform` the historical UDZO is used.
+    """
+    benchmark = benchmark or load_benchmark()
+    if not benchmark or benchmark.get('platform') != platform:
+        return DEFAULT_FORMAT
+
+    usable = [r for r in benchmark.get('results', []) if 'error' not in r and r.get('format') in FORMATS]
+    if not usable:
+        return DEFAULT_FORMAT
+
+    if profile == 'dev':
+        return min(usable, key=lambda r: r['compress_seconds'])['format']
+
+    baseline = next((r for r in usable if r['format'] == DEFAULT_FORMAT), None)
+    if baseline:
+        min_throughput = baseline['decompress_mb_per_s'] * MIN_RELATIVE_THROUGHPUT
+        usable = [r for r in usable if r['decompress_mb_per_s'] >= min_throughput]
+    return min(usable, key=lambda r: r['size'])['format']
+
+
+def resolve_dmg_format(requested: str, profile: str) -> str:
+    """Turn a --dmg-format value ('auto' or a format name) into a format"""
+    if requested != 'auto':
+        return requested
+    image_format = select_dmg_format(profile)
+    print(f"🗜️  Using {image_format} for {profile} DMG")
+    return image_format
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark DMG compression formats')
+    parser.add_argument('--app', default='dist/Potter.app', help='App bundle to stage')
+    parser.add_argument('--raw', help='Use an existing uncompressed image instead of staging the app')
+    parser.add_argument('--formats', nargs='+', choices=sorted(FORMATS), help='Formats to compare (default: all)')
+    parser.add_argument('--workers', type=int, help='Compression workers (default: all cores)')
+    parser.add_argument('--select', choices=BUILD_PROFILES,
+                        help='Only print the format chosen for a profile from saved results')
+    args = parser.parse_args()
+
+    if args.select:
+        print(select_dmg_format(args.select))
+        sys.exit(0)
+
+    if not args.raw and not os.path.exists(args.app):
+        print(f"❌ App not found: {args.app} (build it first or pass --raw)")
+        sys.exit(1)
+
+    benchmark = run_benchmark(args.app, args.formats, args.workers, args.raw)
+    if benchmark['platform'] != BUILD_PLATFORM:
+        print(f"⚠️  {benchmark['platform']} results are not used for builds; they pick {DEFAULT_FORMAT}")
+    for profile in BUILD_PROFILES:
+        print(f"✅ {profile}: {select_dmg_format(profile, benchmark, benchmark['platform'])}")
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Incremental DMG builds
+Keeps the previous read-write image and the manifest of the app inside it.
+The next build mounts that image and applies only the manifest diff (changed,
+added and removed files), then recompresses only the chunks whose content
+changed, so nightly and watch-mode DMGs cost roughly what changed. Files are
+zeroed before they are replaced or removed, so freed blocks compress to
+nothing and old contents never reach a shipped DMG.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+if __package__:
+    from .build_cache import get_cache_dir, write_json
+    from .build_manifest import create_manifest, diff_manifests, hash_file
+    from .udif_writer import SECTOR_SIZE, UDIFImage, write_udif
+else:
+    from build_cache import get_cache_dir, write_json
+    from build_manifest import create_manifest, diff_manifests, hash_file
+    from udif_writer import SECTOR_SIZE, UDIFImage, write_udif
+
+# Free space left in the read-write image for bundles that grow between builds
+HEADROOM_FACTOR = 2
+MIN_HEADROOM_MB = 32
+# HFS+ rewrites files in place, so zeroing a file clears the blocks it frees
+# (APFS would copy on write and leave the old blocks behind)
+IMAGE_FILESYSTEM = 'HFS+'
+# Patched images fragment over time; start afresh after this many updates
+REBUILD_AFTER_UPDATES = 20
+
+
+def dmg_layout_key(volume_name: str, background_path: Optional[str], layout: Dict) -> str:
+    """Hash of everything outside the app that shapes the image"""
+    key_data = {
+        'volume_name': volume_name,
+        'background': hash_file(background_path) if background_path else None,
+        'layout': layout,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _tree_size(root: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            total += os.lstat(os.path.join(dirpath, name)).st_size
+    return total
+
+
+class IncrementalDMG:
+    """Read-write image, app manifest and last compressed image kept between builds"""
+
+    def __init__(self, app_name: str, cache_dir: Optional[str] = None):
+        self.app_name = app_name
+        self.cache_dir = cache_dir or get_cache_dir('dmg_incremental')
+        self.rw_image = os.path.join(self.cache_dir, 'image.dmg')
+        self.state_path = os.path.join(self.cache_dir, 'state.json')
+        self.compressed_image = os.path.join(self.cache_dir, 'compressed.dmg')
+        self.chunk_index = os.path.join(self.cache_dir, 'chunks.json')
+        self.state = self._load_state()
+        self.changed = True
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        write_json(self.state_path, self.state)
+
+    def can_update(self, layout_key: str) -> bool:
+        """Whether the kept image can be patched rather than rebuilt"""
+        return (os.path.exists(self.rw_image)
+                and self.state.get('layout_key') == layout_key
+                and self.state.get('filesystem') == IMAGE_FILESYSTEM
+                and self.state.get('updates', 0) < REBUILD_AFTER_UPDATES
+                and 'manifest' in self.state)
+
+    def create(self, source_folder: str, volume_name: str, app_path: str, layout_key: str) -> bool:
+        """Build the read-write image from scratch, with room to grow"""
+        print("🔨 Creating read-write DMG for incremental builds...")
+        for path in (self.rw_image, self.compressed_image, self.chunk_index):
+            if os.path.exists(path):
+                os.remove(path)
+
+        size_mb = max(_tree_size(source_folder) * HEADROOM_FACTOR // (1024 * 1024),
+                      _tree_size(source_folder) // (1024 * 1024) + MIN_HEADROOM_MB)
+        result = subprocess.run([
+            'hdiutil', 'create',
+            '-volname', volume_name,
+            '-srcfolder', source_folder,
+            '-fs', IMAGE_FILESYSTEM,
+            '-size', f"{size_mb}m",
+            '-format', 'UDRW',
+            '-ov', self.rw_image
+        ], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ DMG creation failed: {result.stderr}")
+            return False
+
+        self.state = {
+            'layout_key': layout_key,
+            'filesystem': IMAGE_FILESYSTEM,
+            'updates': 0,
+            'manifest': create_manifest(app_path, max_workers=os.cpu_count() or 1),
+        }
+        self._save_state()
+        self.changed = True
+        return True
+
+    def update(self, app_path: str) -> bool:
+        """Apply the app's changes since the last build to the kept image"""
+        manifest = create_manifest(app_path, max_workers=os.cpu_count() or 1)
+        diff = diff_manifests(self.state['manifest'], manifest)
+        changes = sum(len(paths) for paths in diff.values())
+
+        if not changes:
+            print("♻️  App unchanged since the last DMG")
+            self.changed = False
+            return True
+
+        print(f"🩹 Updating DMG in place: {len(diff['changed'])} changed, "
+              f"{len(diff['added'])} added, {len(diff['removed'])} removed")
+
+        mount_point = tempfile.mkdtemp(prefix='potter-dmg-')
+        attach = subprocess.run([
+            'hdiutil', 'attach', self.rw_image, '-readwrite', '-nobrowse',
+            '-noverify', '-noautoopen', '-mountpoint', mount_point
+        ], capture_output=True, text=True)
+        if attach.returncode != 0:
+            print(f"⚠️  Could not mount previous DMG: {attach.stderr.strip()}")
+            os.rmdir(mount_point)
+            return False
+
+        failure = None
+        try:
+            apply_manifest_diff(app_path, os.path.join(mount_point, f"{self.app_name}.app"), diff, manifest)
+        except (OSError, subprocess.SubprocessError) as e:
+            # Most likely out of space or a failed ditto
+            failure = e
+        finally:
+            subprocess.run(['hdiutil', 'detach', mount_point], capture_output=True, text=True)
+            shutil.rmtree(mount_point, ignore_errors=True)
+
+        if failure:
+            # The image is half-patched, so nothing kept matches it any more;
+            # the caller rebuilds from scratch
+            print(f"⚠️  Could not update previous DMG: {failure}")
+            self.discard()
+            return False
+
+        self.state['manifest'] = manifest
+        self.state['updates'] = self.state.get('updates', 0) + 1
+        self._save_state()
+        self.changed = True
+        return True
+
+    def export(self, dmg_path: str, image_format: str, raw_path: str) -> str:
+        """Write the compressed DMG, recompressing only chunks that changed"""
+        if (not self.changed and os.path.exists(self.compressed_image)
+                and self.state.get('format') == image_format):
+            shutil.copy2(self.compressed_image, dmg_path)
+            return dmg_path
+
+        source, offset, size = self._raw_disk(raw_path)
+        next_image = f"{self.compressed_image}.next"
+        next_index = f"{self.chunk_index}.next"
+        write_udif(source, next_image, image_format, reuse=(self.compressed_image, self.chunk_index),
+                   index_path=next_index, raw_offset=offset, raw_size=size)
+        os.replace(next_image, self.compressed_image)
+        os.replace(next_index, self.chunk_index)
+
+        self.state['format'] = image_format
+        self._save_state()
+        shutil.copy2(self.compressed_image, dmg_path)
+        return dmg_path
+
+
+    def _raw_disk(self, raw_path: str) -> Tuple[str, int, Optional[int]]:
+        """(file, offset, size) of the kept image's raw sectors
+
+        A UDRW image stores its sectors uncompressed, so they are read in
+        place; only an unexpected layout pays for a full hdiutil convert.
+        """
+        try:
+            image = UDIFImage(self.rw_image)
+            offset = image.flat_data_offset()
+            if offset is not None:
+                return self.rw_image, offset, image.sector_count * SECTOR_SIZE
+        except (OSError, ValueError, KeyError):
+            pass
+
+        base = os.path.splitext(raw_path)[0]
+        try:
+            subprocess.run([
+                'hdiutil', 'convert', self.rw_image, '-format', 'UDTO', '-ov', '-o', base
+            ], check=True, capture_output=True, text=True)
+        except subprocess.SubprocessError as e:
+            self.discard()
+            raise RuntimeError(f"Could not convert the kept DMG, it will be rebuilt next time: {e}")
+        if f"{base}.cdr" != raw_path:
+            os.replace(f"{base}.cdr", raw_path)
+        return raw_path, 0, None
+
+    def discard(self):
+        """Drop the kept images and state so the next build starts from scratch"""
+        for path in (self.rw_image, self.compressed_image, self.chunk_index):
+            if os.path.exists(path):
+                os.remove(path)
+        self.state = {}
+        self._save_state()
+
+    def discard_compressed(self):
+        """Forget the compressed image so the next export writes it afresh"""
+        for path in (self.compressed_image, self.chunk_index):
+            if os.path.exists(path):
+                os.remove(path)
+        self.state.pop('format', None)
+        self._save_state()
+
+
+def _copy_entry(src: str, dest: str):
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dest)
+    elif os.path.isdir(src):
+        os.makedirs(dest, exist_ok=True)
+        shutil.copystat(src, dest)
+    elif sys.platform == 'darwin':
+        # ditto keeps extended attributes and resource forks
+        subprocess.run(['ditto', src, dest], check=True, capture_output=True)
+    else:
+        shutil.copy2(src, dest)
+
+
+def _zero_file(path: str):
+    """Overwrite a file's contents with zeros in place"""
+    remaining = os.path.getsize(path)
+    block = bytes(min(remaining, 1024 * 1024))
+    with open(path, 'r+b') as f:
+        while remaining:
+            remaining -= f.write(block[:remaining])
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _remove_entry(path: str):
+    """Remove a file or tree, zeroing regular files first"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                file_path = os.path.join(dirpath, name)
+                if not os.path.islink(file_path):
+                    _zero_file(file_path)
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        if not os.path.islink(path):
+            _zero_file(path)
+        os.remove(path)
+
+
+def apply_manifest_diff(src_root: str, dest_root: str, diff: Dict[str, List[str]], manifest: Dict[str, Dict]):
+    """Make dest_root match src_root, touching only paths in the diff"""
+    # Deepest first, so directories are empty by the time they go
+    for rel in sorted(diff['removed'], reverse=True):
+        _remove_entry(os.path.join(dest_root, rel))
+
+    # Parents sort before children, so directories exist before their contents
+    for rel in sorted(diff['added'] + diff['changed']):
+        src = os.path.join(src_root, rel)
+        dest = os.path.join(dest_root, rel)
+        if manifest[rel]['type'] == 'dir' and os.path.isdir(dest) and not os.path.islink(dest):
+            shutil.copystat(src, dest)
+            continue
+        _remove_entry(dest)
+        _copy_entry(src, dest)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+.DS_Store writer for the Potter DMG
+Generates the Finder metadata (window bounds, icon view options, background
+picture alias, icon positions) directly so the installer layout can be baked
+into the source folder instead of mounting the image and scripting Finder.
+Includes a reader so the output can be checked on any platform.
+"""
+
+import os
+import plistlib
+import shutil
+import struct
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+PAGE_SIZE = 0x1000
+ALLOCATOR_MAGIC = b'Bud1'
+# Undocumented header bytes; these are what Finder itself writes
+ALLOCATOR_HEADER_TAIL = b'\x00\x00\x10\x0c\x00\x00\x00\x87\x00\x00\x20\x0b\x00\x00\x00\x00'
+
+# Block layout of a single-leaf store (offsets exclude the 4-byte file prefix)
+HEADER_SIZE = 32
+DSDB_OFFSET = 32
+INFO_OFFSET = 2048
+INFO_SIZE = 2048
+LEAF_OFFSET = 4096
+STORE_SIZE = 8192
+
+BACKGROUND_FOLDER = '.background'
+BACKGROUND_NAME = 'background.png'
+
+# Seconds between the classic Mac OS epoch (1904) and the Unix epoch
+MAC_EPOCH_OFFSET = 2082844800
+
+
+class DSStoreRecord:
+    """One (filename, code) entry, e.g. ('Potter.app', 'Iloc')"""
+
+    def __init__(self, filename: str, code: str, type_code: str, value):
+        self.filename = filename
+        self.code = code
+        self.type_code = type_code
+        self.value = value
+
+    def sort_key(self) -> Tuple[str, str]:
+        # Finder orders records by case-insensitive filename, then code
+        return self.filename.lower(), self.code
+
+    def encode(self) -> bytes:
+        name = self.filename.encode('utf-16-be')
+        data = struct.pack('>I', len(name) // 2) + name
+        data += self.code.encode('ascii') + self.type_code.encode('ascii')
+
+        if self.type_code in ('long', 'shor'):
+            data += struct.pack('>I', self.value)
+        elif self.type_code == 'bool':
+            data += struct.pack('>?', self.value)
+        elif self.type_code == 'blob':
+            data += struct.pack('>I', len(self.value)) + self.value
+        elif self.type_code == 'type':
+            data += self.value.encode('ascii')
+        elif self.type_code == 'ustr':
+            text = self.value.encode('utf-16-be')
+            data += struct.pack('>I', len(text) // 2) + text
+        elif self.type_code in ('comp', 'dutc'):
+            data += struct.pack('>Q', self.value)
+        else:
+            raise ValueError(f"Unsupported .DS_Store record type: {self.type_code}")
+        return data
+
+    def __repr__(self):
+        return f"DSStoreRecord({self.filename!r}, {self.code!r}, {self.type_code!r})"
+
+
+def _block_address(offset: int, size: int) -> int:
+    return offset | (size.bit_length() - 1)
+
+
+def write_ds_store(path: str, records: Iterable[DSStoreRecord]):
+    """Write records as a .DS_Store file (buddy allocator + single-leaf B-tree)"""
+    records = sorted(records, key=DSStoreRecord.sort_key)
+
+    leaf = struct.pack('>II', 0, len(records)) + b''.join(r.encode() for r in records)
+    if len(leaf) > PAGE_SIZE:
+        raise ValueError(".DS_Store records do not fit in a single B-tree page")
+
+    # Block 0: allocator info, block 1: DSDB header, block 2: the leaf node
+    addresses = [
+        _block_address(INFO_OFFSET, INFO_SIZE),
+        _block_address(DSDB_OFFSET, 32),
+        _block_address(LEAF_OFFSET, PAGE_SIZE),
+    ]
+
+    info = struct.pack('>II', len(addresses), 0)
+    info += b''.join(struct.pack('>I', a) for a in addresses).ljust(256 * 4, b'\0')
+    info += struct.pack('>I', 1) + struct.pack('>B', 4) + b'DSDB' + struct.pack('>I', 1)
+
+    # Free lists per power of two: everything between the DSDB block and the info block
+    free = {size_log2: [1 << size_log2] for size_log2 in range(6, 11)}
+    for size_log2 in range(32):
+        offsets = free.get(size_log2, [])
+        info += struct.pack('>I', len(offsets)) + b''.join(struct.pack('>I', o) for o in offsets)
+
+    dsdb = struct.pack('>IIIII', 2, 0, len(records), 1, PAGE_SIZE)
+    header = ALLOCATOR_MAGIC + struct.pack('>III', INFO_OFFSET, INFO_SIZE, INFO_OFFSET) + ALLOCATOR_HEADER_TAIL
+
+    store = bytearray(STORE_SIZE)
+    store[0:len(header)] = header
+    store[DSDB_OFFSET:DSDB_OFFSET + len(dsdb)] = dsdb
+    store[INFO_OFFSET:INFO_OFFSET + len(info)] = info
+    store[LEAF_OFFSET:LEAF_OFFSET + len(leaf)] = leaf
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack('>I', 1))
+        f.write(store)
+
+
+def read_ds_store(source: Union[str, bytes]) -> List[DSStoreRecord]:
+    """Parse a .DS_Store file (path or bytes) into records"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            source = f.read()
+    data = memoryview(source)[4:]
+
+    if bytes(data[0:4]) != ALLOCATOR_MAGIC:
+        raise ValueError("Not a .DS_Store file (missing Bud1 header)")
+    info_offset, _info_size = struct.unpack_from('>II', data, 4)
+
+    count, _ = struct.unpack_from('>II', data, info_offset)
+    addresses = struct.unpack_from(f'>{count}I', data, info_offset + 8)
+    pos = info_offset + 8 + ((count + 255) // 256) * 256 * 4
+
+    directories = {}
+    (dir_count,) = struct.unpack_from('>I', data, pos)
+    pos += 4
+    for _ in range(dir_count):
+        name_len = data[pos]
+        name = bytes(data[pos + 1:pos + 1 + name_len]).decode('ascii')
+        (block,) = struct.unpack_from('>I', data, pos + 1 + name_len)
+        directories[name] = block
+        pos += 1 + name_len + 4
+
+    def block_offset(block: int) -> int:
+        return addresses[block] & ~0x1F
+
+    root, _levels, _records, _nodes, _page = struct.unpack_from('>IIIII', data, block_offset(directories['DSDB']))
+
+    records = []
+
+    def read_node(block: int):
+        pos = block_offset(block)
+        rightmost, node_count = struct.unpack_from('>II', data, pos)
+        pos += 8
+        for _ in range(node_count):
+            if rightmost:
+                (child,) = struct.unpack_from('>I', data, pos)
+                pos += 4
+                read_node(child)
+            record, pos = _decode_record(data, pos)
+            records.append(record)
+        if rightmost:
+            read_node(rightmost)
+
+    read_node(root)
+    return records
+
+
+def _decode_record(data: memoryview, pos: int) -> Tuple[DSStoreRecord, int]:
+    (name_len,) = struct.unpack_from('>I', data, pos)
+    pos += 4
+    filename = bytes(data[pos:pos + name_len * 2]).decode('utf-16-be')
+    pos += name_len * 2
+    code = bytes(data[pos:pos + 4]).decode('ascii')
+    type_code = bytes(data[pos + 4:pos + 8]).decode('ascii')
+    pos += 8
+
+    if type_code in ('long', 'shor'):
+        (value,) = struct.unpack_from('>I', data, pos)
+        pos += 4
+    elif type_code == 'bool':
+        value = bool(data[pos])
+        pos += 1
+    elif type_code == 'blob':
+        (length,) = struct.unpack_from('>I', data, pos)
+        value = bytes(data[pos + 4:pos + 4 + length])
+        pos += 4 + length
+    elif type_code == 'type':
+        value = bytes(data[pos:pos + 4]).decode('ascii')
+        pos += 4
+    elif type_code == 'ustr':
+        (length,) = struct.unpack_from('>I', data, pos)
+        value = bytes(data[pos + 4:pos + 4 + length * 2]).decode('utf-16-be')
+        pos += 4 + length * 2
+    elif type_code in ('comp', 'dutc'):
+        (value,) = struct.unpack_from('>Q', data, pos)
+        pos += 8
+    else:
+        raise ValueError(f"Unsupported .DS_Store record type: {type_code}")
+
+    return DSStoreRecord(filename, code, type_code, value), pos
+
+
+# ── Record builders ───────────────────────────────────────────
+
+def icon_location(filename: str, x: int, y: int) -> DSStoreRecord:
+    """Iloc record placing an item's icon centre at (x, y)"""
+    return DSStoreRecord(filename, 'Iloc', 'blob', struct.pack('>IIII', x, y, 0xFFFFFFFF, 0xFFFF0000))
+
+
+def decode_icon_location(record: DSStoreRecord) -> Tuple[int, int]:
+    x, y, _, _ = struct.unpack('>IIII', record.value)
+    return x, y
+
+
+def window_settings(bounds: Tuple[int, int, int, int]) -> DSStoreRecord:
+    """bwsp record: window frame with toolbar, sidebar and status bar hidden"""
+    left, top, right, bottom = bounds
+    settings = {
+        'ContainerShowSidebar': False,
+        'ShowPathbar': False,
+        'ShowSidebar': False,
+        'ShowStatusBar': False,
+        'ShowTabView': False,
+        'ShowToolbar': False,
+        'SidebarWidth': 0,
+        'WindowBounds': f"{{{{{left}, {top}}}, {{{right - left}, {bottom - top}}}}}",
+    }
+    return DSStoreRecord('.', 'bwsp', 'blob', plistlib.dumps(settings, fmt=plistlib.FMT_BINARY))
+
+
+def icon_view_settings(icon_size: int, background_alias: Optional[bytes] = None,
+                       text_size: float = 12.0) -> DSStoreRecord:
+    """icvp record: free-arranged icon view, optionally with a background picture"""
+    settings = {
+        'arrangeBy': 'none',
+        'backgroundColorBlue': 1.0,
+        'backgroundColorGreen': 1.0,
+        'backgroundColorRed': 1.0,
+        'backgroundType': 0,
+        'gridOffsetX': 0.0,
+        'gridOffsetY': 0.0,
+        'gridSpacing': 100.0,
+        'iconSize': float(icon_size),
+        'labelOnBottom': True,
+        'showIconPreview': True,
+        'showItemInfo': False,
+        'textSize': text_size,
+        'viewOptionsVersion': 1,
+    }
+    if background_alias is not None:
+        settings['backgroundType'] = 2
+        settings['backgroundImageAlias'] = background_alias
+    return DSStoreRecord('.', 'icvp', 'blob', plistlib.dumps(settings, fmt=plistlib.FMT_BINARY))
+
+
+def build_alias(volume_name: str, relative_path: str, created: Optional[datetime] = None) -> bytes:
+    """Version 2 alias record for a file on a not-yet-mounted volume
+
+    Without a mounted volume there is no volume date or catalog node ID, so
+    Finder resolves the alias through the POSIX and Carbon paths instead.
+    """
+    relative_path = relative_path.strip('/')
+    parts = relative_path.split('/')
+    filename = parts[-1]
+    parent = parts[-2] if len(parts) > 1 else volume_name
+    mac_date = int(created.timestamp()) + MAC_EPOCH_OFFSET if created else 0
+
+    def pascal(text: str, size: int) -> bytes:
+        encoded = text.encode('mac_roman', 'replace')[:size - 1]
+        return struct.pack('>B', len(encoded)) + encoded.ljust(size - 1, b'\0')
+
+    body = struct.pack('>h', 0)  # kind: file
+    body += pascal(volume_name, 28)
+    body += struct.pack('>I2sh', mac_date, b'H+', 5)  # fs type, disk type: ejectable
+    body += struct.pack('>I', 0)  # parent CNID
+    body += pascal(filename, 64)
+    body += struct.pack('>II4s4shhI2s10s', 0, mac_date, b'\0' * 4, b'\0' * 4, -1, -1, 0, b'\0\0', b'\0' * 10)
+
+    def tag(number: int, value: bytes) -> bytes:
+        chunk = struct.pack('>hh', number, len(value)) + value
+        return chunk + b'\0' if len(value) % 2 else chunk
+
+    def unicode_name(text: str) -> bytes:
+        encoded = text.encode('utf-16-be')
+        return struct.pack('>H', len(encoded) // 2) + encoded
+
+    body += tag(0, parent.encode('utf-8'))
+    body += tag(2, f"{volume_name}:{relative_path.replace('/', ':')}".encode('utf-8'))
+    body += tag(14, unicode_name(filename))
+    body += tag(15, unicode_name(volume_name))
+    body += tag(18, f"/{relative_path}".encode('utf-8'))
+    body += tag(19, f"/Volumes/{volume_name}".encode('utf-8'))
+    body += struct.pack('>hh', -1, 0)
+
+    return struct.pack('>4shh', b'\0' * 4, len(body) + 8, 2) + body
+
+
+def read_alias_paths(alias: bytes) -> Dict[str, str]:
+    """Volume name and POSIX paths stored in an alias written by build_alias"""
+    volume_name = alias[11:11 + alias[10]].decode('mac_roman')
+    pos = 150
+    paths = {'volume_name': volume_name}
+    while pos + 4 <= len(alias):
+        number, length = struct.unpack_from('>hh', alias, pos)
+        if number == -1:
+            break
+        value = alias[pos + 4:pos + 4 + length]
+        if number == 18:
+            paths['path'] = value.decode('utf-8')
+        elif number == 19:
+            paths['mount_point'] = value.decode('utf-8')
+        pos += 4 + length + (length % 2)
+    return paths
+
+
+# ── DMG layout ────────────────────────────────────────────────
+
+def create_dmg_layout(source_folder: str, volume_name: str, positions: Dict[str, Tuple[int, int]],
+                      window_bounds: Tuple[int, int, int, int], icon_size: int,
+                      background_path: Optional[str] = None) -> str:
+    """Write .background and .DS_Store into a DMG source folder; returns the .DS_Store path"""
+    alias = None
+    if background_path:
+        background_folder = os.path.join(source_folder, BACKGROUND_FOLDER)
+        os.makedirs(background_folder, exist_ok=True)
+        shutil.copy2(background_path, os.path.join(background_folder, BACKGROUND_NAME))
+        alias = build_alias(volume_name, f"{BACKGROUND_FOLDER}/{BACKGROUND_NAME}")
+
+    records = [
+        window_settings(window_bounds),
+        icon_view_settings(icon_size, alias),
+        DSStoreRecord('.', 'vSrn', 'long', 1),
+    ]
+    records += [icon_location(name, x, y) for name, (x, y) in positions.items()]
+
+    ds_store_path = os.path.join(source_folder, '.DS_Store')
+    write_ds_store(ds_store_path, records)
+    return ds_store_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Usage: dsstore_writer.py <.DS_Store>")
+        sys.exit(1)
+
+    for record in read_ds_store(sys.argv[1]):
+        value = record.value
+        if record.code == 'Iloc':
+            value = decode_icon_location(record)
+        elif record.type_code == 'blob' and value.startswith(b'bplist'):
+            value = plistlib.loads(value)
+            if 'backgroundImageAlias' in value:
+                value['backgroundImageAlias'] = read_alias_paths(value['backgroundImageAlias'])
+        print(f"{record.filename}\t{record.code}\t{value}")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Potter Notarization Manager
+Submits artifacts to Apple's notary service without blocking, records every
+submission in a local journal and polls for the result with backoff, so a
+build can keep working while Apple processes it and a later run can resume
+waiting or stapling after an interrupted one
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+if __package__:
+    from .build_cache import get_cache_dir, read_json, update_json, write_json
+    from .signing_utils import get_cdhash
+else:
+    from build_cache import get_cache_dir, read_json, update_json, write_json
+    from signing_utils import get_cdhash
+
+STATUS_IN_PROGRESS = 'In Progress'
+STATUS_ACCEPTED = 'Accepted'
+FAILED_STATUSES = ('Invalid', 'Rejected')
+
+DEFAULT_POLL_INTERVAL = 15
+DEFAULT_MAX_POLL_INTERVAL = 120
+DEFAULT_TIMEOUT = 60 * 60
+
+# Where stapler puts the ticket inside a bundle; not covered by the code seal
+BUNDLE_TICKET_PATH = "Contents/CodeResources"
+
+
+class NotarySubmission:
+    """A journal entry for one notarization submission"""
+
+    def __init__(self, submission_id: str, artifact_path: str, artifact_hash: str,
+                 staple_paths: List[str], status: str = STATUS_IN_PROGRESS,
+                 submitted_at: Optional[str] = None, stapled: bool = False):
+        self.submission_id = submission_id
+        self.artifact_path = artifact_path
+        self.artifact_hash = artifact_hash
+        self.staple_paths = staple_paths
+        self.status = status
+        self.submitted_at = submitted_at or datetime.now().isoformat()
+        self.stapled = stapled
+        # Satisfied from the ticket cache; never uploaded or journaled
+        self.from_cache = False
+
+    @property
+    def finished(self) -> bool:
+        return self.stapled or self.status in FAILED_STATUSES
+
+    def to_dict(self):
+        return {
+            'id': self.submission_id,
+            'artifact_path': self.artifact_path,
+            'artifact_hash': self.artifact_hash,
+            'staple_paths': self.staple_paths,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'stapled': self.stapled,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'NotarySubmission':
+        return cls(data['id'], data['artifact_path'], data['artifact_hash'],
+                   data.get('staple_paths', []), data.get('status', STATUS_IN_PROGRESS),
+                   data.get('submitted_at'), data.get('stapled', False))
+
+    def __str__(self):
+        return f"{self.submission_id} ({os.path.basename(self.artifact_path)}: {self.status})"
+
+
+class NotarizationJournal:
+    """Persistent record of submissions, safe to update from polling threads"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(get_cache_dir('notarization'), 'journal.json')
+
+    def load(self) -> List[NotarySubmission]:
+        return [NotarySubmission.from_dict(entry) for entry in read_json(self.path, [])]
+
+    def record(self, submission: NotarySubmission):
+        """Insert or update a submission (locked: several builds may share the journal)"""
+        def change(entries):
+            entries = [e for e in entries if e.get('id') != submission.submission_id]
+            return entries + [submission.to_dict()]
+        update_json(self.path, change, [], indent=2)
+
+    def find_by_hash(self, artifact_hash: str) -> Optional[NotarySubmission]:
+        """Most recent usable submission of identical content"""
+        for entry in reversed(self.load()):
+            if entry.artifact_hash == artifact_hash and entry.status not in FAILED_STATUSES:
+                return entry
+        return None
+
+    def pending(self) -> List[NotarySubmission]:
+        return [entry for entry in self.load() if not entry.finished]
+
+
+class TicketCache:
+    """Notarization tickets keyed by code-directory hash
+
+    Reproducible builds of the same commit produce the same cdhash, which is
+    what Apple's ticket is issued for. Bundle tickets are kept as files and
+    copied back in; for other artifacts (DMGs) the ticket lives inside the
+    signature, so a hit means stapler can fetch the existing ticket without
+    a new submission.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or get_cache_dir('tickets')
+
+    def lookup(self, cdhash: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.cache_dir, cdhash, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, cdhash: str, path: str, submission_id: str):
+        entry_dir = os.path.join(self.cache_dir, cdhash)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        ticket_path = os.path.join(path, BUNDLE_TICKET_PATH)
+        has_ticket_file = os.path.isdir(path) and os.path.isfile(ticket_path)
+        if has_ticket_file:
+            shutil.copy2(ticket_path, os.path.join(entry_dir, 'ticket'))
+
+        write_json(os.path.join(entry_dir, 'meta.json'), {
+            'submission_id': submission_id,
+            'artifact': os.path.basename(path),
+            'ticket_file': has_ticket_file,
+            'stored_at': datetime.now().isoformat(),
+        }, indent=2)
+
+    def restore(self, cdhash: str, path: str) -> bool:
+        """Copy a cached bundle ticket into place; False if there is none"""
+        cached_ticket = os.path.join(self.cache_dir, cdhash, 'ticket')
+        if not os.path.isdir(path) or not os.path.isfile(cached_ticket):
+            return False
+        shutil.copy2(cached_ticket, os.path.join(path, BUNDLE_TICKET_PATH))
+        return True
+
+
+class NotarytoolBackend:
+    """Talks to Apple's notary service through xcrun notarytool and stapler
+
+    Any object with the same submit/status/log/staple/validate methods can
+    stand in for this one, e.g. a local fake service in tests.
+    """
+
+    def __init__(self, apple_id: str, password: str, team_id: str = ''):
+        self.auth = ['--apple-id', apple_id, '--password', password, '--team-id', team_id]
+
+    def submit(self, artifact_path: str) -> str:
+        """Upload an artifact and return its submission ID"""
+        data = self._run_json(['submit', artifact_path])
+        return data['id']
+
+    def status(self, submission_id: str) -> str:
+        """Current status of a submission"""
+        return self._run_json(['info', submission_id])['status']
+
+    def log(self, submission_id: str) -> str:
+        """Apple's processing log for a submission"""
+        result = subprocess.run(['xcrun', 'notarytool', 'log', submission_id] + self.auth,
+                                capture_output=True, text=True)
+        return result.stdout or result.stderr
+
+    def staple(self, path: str) -> bool:
+        """Attach the notarization ticket to an artifact"""
+        result = subprocess.run(['xcrun', 'stapler', 'staple', path], capture_output=True, text=True)
+        return result.returncode == 0
+
+    def validate(self, path: str) -> bool:
+        """Check that a valid ticket is stapled to an artifact"""
+        result = subprocess.run(['xcrun', 'stapler', 'validate', path], capture_output=True, text=True)
+        return result.returncode == 0
+
+    def _run_json(self, args: List[str]) -> Dict:
+        cmd = ['xcrun', 'notarytool'] + args + self.auth + ['--output-format', 'json']
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"notarytool {args[0]} failed: {result.stderr.strip() or result.stdout.strip()}")
+        return json.loads(result.stdout)
+
+
+class PendingNotarization:
+    """A submission being polled in the background"""
+
+    def __init__(self, manager: 'NotarizationManager', submission: NotarySubmission,
+                 future: 'Future[bool]'):
+        self.manager = manager
+        self.submission = submission
+        self.future = future
+
+    def finish(self) -> bool:
+        """Wait for Apple's verdict, then staple; True if accepted and stapled"""
+        if not self.future.result():
+            return False
+        return self.manager.staple(self.submission)
+
+
+class NotarizationManager:
+    """Submits artifacts and waits for them in the background"""
+
+    def __init__(self, backend, journal: Optional[NotarizationJournal] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+                 timeout: float = DEFAULT_TIMEOUT, sleep=time.sleep,
+                 ticket_cache: Optional[TicketCache] = None, cdhash_for=get_cdhash):
+        self.backend = backend
+        self.journal = journal or NotarizationJournal()
+        self.ticket_cache = ticket_cache or TicketCache()
+        self._cdhash_for = cdhash_for
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self._sleep = sleep
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='notarization')
+
+    def has_cached_tickets(self, paths: List[str]) -> bool:
+        """True if every path's cdhash already has a notarization ticket"""
+        cdhashes = [self._cdhash_for(path) for path in paths]
+        return all(cdhashes) and all(self.ticket_cache.lookup(cdhash) for cdhash in cdhashes)
+
+    def submit(self, artifact_path: str, artifact_hash: str,
+               staple_paths: Optional[List[str]] = None) -> NotarySubmission:
+        """Submit an artifact, or reuse a cached ticket or earlier submission"""
+        staple_paths = staple_paths or [artifact_path]
+
+        if self.has_cached_tickets(staple_paths):
+            cdhash = self._cdhash_for(staple_paths[0])
+            print(f"🎫 Notarization ticket cached for cdhash {cdhash}; skipping upload")
+            cached = NotarySubmission(f"cached-{cdhash}", artifact_path, artifact_hash,
+                                      staple_paths, STATUS_ACCEPTED)
+            cached.from_cache = True
+            return cached
+
+        previous = self.journal.find_by_hash(artifact_hash)
+        if previous:
+            print(f"♻️  Resuming earlier notarization submission {previous}")
+            previous.staple_paths = staple_paths
+            previous.stapled = False
+            self.journal.record(previous)
+            return previous
+
+        submission_id = self.backend.submit(artifact_path)
+        submission = NotarySubmission(submission_id, artifact_path, artifact_hash, staple_paths)
+        self.journal.record(submission)
+        print(f"📤 Submitted {os.path.basename(artifact_path)} for notarization: {submission_id}")
+        return submission
+
+    def start(self, artifact_path: str, artifact_hash: str,
+              staple_paths: Optional[List[str]] = None) -> PendingNotarization:
+        """Submit and poll in the background, leaving stapling to the caller
+
+        Stapling rewrites the artifact, so it is deferred until the caller is
+        done reading it (e.g. copying the app into a DMG).
+        """
+        submission = self.submit(artifact_path, artifact_hash, staple_paths)
+        future = self._executor.submit(self.wait, submission, False)
+        return PendingNotarization(self, submission, future)
+
+    def wait_async(self, submission: NotarySubmission) -> 'Future[bool]':
+        """Poll and staple in the background; the future resolves to success"""
+        return self._executor.submit(self.wait, submission)
+
+    def wait(self, submission: NotarySubmission, staple: bool = True) -> bool:
+        """Poll with backoff until Apple decides, then staple on acceptance"""
+        interval = self.poll_interval
+        deadline = time.monotonic() + self.timeout
+
+        while submission.status == STATUS_IN_PROGRESS:
+            if time.monotonic() > deadline:
+                print(f"❌ Notarization of {submission} timed out; resume later with --resume")
+                return False
+            self._sleep(interval)
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+            try:
+                status = self.backend.status(submission.submission_id)
+            except Exception as e:
+                print(f"⚠️  Could not poll notarization status ({e}), retrying...")
+                continue
+
+            if status != submission.status:
+                submission.status = status
+                self.journal.record(submission)
+
+        if submission.status != STATUS_ACCEPTED:
+            print(f"❌ Notarization failed: {submission}")
+            print(self.backend.log(submission.submission_id))
+            return False
+
+        print(f"✅ Notarization accepted: {submission}")
+        return self.staple(submission) if staple else True
+
+    def staple(self, submission: NotarySubmission) -> bool:
+        """Staple the ticket to every recorded path; True only if each one validates"""
+        stapled = True
+        for path in submission.staple_paths:
+            if not os.path.exists(path):
+                print(f"⚠️  Cannot staple missing artifact: {path}")
+                stapled = False
+                continue
+
+            cdhash = self._cdhash_for(path)
+            if cdhash and submission.from_cache and self.ticket_cache.restore(cdhash, path):
+                print(f"🎫 Restored cached ticket for {os.path.basename(path)}")
+            elif not self.backend.staple(path):
+                print(f"❌ Failed to staple ticket to {path}")
+                stapled = False
+                continue
+
+            if not self.backend.validate(path):
+                print(f"❌ Stapled ticket on {path} did not validate")
+                stapled = False
+                continue
+
+            print(f"✅ Notarization ticket stapled to {os.path.basename(path)}")
+            if cdhash and not submission.from_cache:
+                self.ticket_cache.store(cdhash, path, submission.submission_id)
+
+        submission.stapled = stapled
+        if not submission.from_cache:
+            self.journal.record(submission)
+        return stapled
+
+    def resume(self) -> bool:
+        """Finish every submission an earlier run left waiting or unstapled"""
+        pending = self.journal.pending()
+        if not pending:
+            print("✅ No pending notarization submissions")
+            return True
+
+        futures = [self.wait_async(submission) for submission in pending]
+        return all(future.result() for future in futures)
+
+
+def create_notarization_manager(config: Dict) -> Optional[NotarizationManager]:
+    """Manager for the configured Apple ID, or None if credentials are missing"""
+    if not config.get('apple_id') or not config.get('app_password'):
+        return None
+
+    backend = NotarytoolBackend(config['apple_id'], config['app_password'], config.get('team_id') or '')
+    return NotarizationManager(backend)
+
+
+def main():
+    """CLI for inspecting and resuming notarization submissions"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Potter Notarization Manager')
+    parser.add_argument('--status', action='store_true', help='List journaled submissions')
+    parser.add_argument('--resume', action='store_true',
+                        help='Wait for and staple submissions left pending by an earlier run')
+
+    args = parser.parse_args()
+    journal = NotarizationJournal()
+
+    if args.resume:
+        if __package__:
+            from .build_app import get_signing_config
+        else:
+            from build_app import get_signing_config
+
+        manager = create_notarization_manager(get_signing_config())
+        if not manager:
+            print("❌ APPLE_ID and APPLE_APP_PASSWORD are required to resume notarization")
+            raise SystemExit(1)
+        raise SystemExit(0 if manager.resume() else 1)
+
+    for entry in journal.load():
+        stapled = " stapled" if entry.stapled else ""
+        print(f"{entry.submitted_at}  {entry}{stapled}")
+
+
+if __name__ == "__main__":
+    main()
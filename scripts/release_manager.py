@@ -14,11 +14,19 @@ import xml.etree.ElementTree as ET
 from pathlib import Path
 from datetime import datetime
 import re
-from typing import Optional, Dict, Any
+import signal
+import tempfile
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
 
 # Import our utilities
-from version_manager import get_current_version, set_version, bump_version
-from release_utils import generate_ai_release_notes, get_commits_for_release_notes
+if __package__:
+    from .version_manager import get_current_version, set_version, bump_version
+    from .release_utils import generate_ai_release_notes, get_commits_for_release_notes
+else:
+    from version_manager import get_current_version, set_version, bump_version
+    from release_utils import generate_ai_release_notes, get_commits_for_release_notes
 
 
 class ReleaseConfig:
@@ -38,8 +46,10 @@ class CodenameManager:
     @staticmethod
     def get_current_codename() -> str:
         try:
-            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-            from codename_utils import get_current_codename
+            if __package__:
+                from .codename_utils import get_current_codename
+            else:
+                from codename_utils import get_current_codename
             return get_current_codename()
         except Exception as e:
             print(f"⚠️  Could not get codename: {e}")
@@ -48,8 +58,10 @@ class CodenameManager:
     @staticmethod
     def get_enhanced_release_title(version: str) -> str:
         try:
-            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-            from codename_utils import get_enhanced_release_title
+            if __package__:
+                from .codename_utils import get_enhanced_release_title
+            else:
+                from codename_utils import get_enhanced_release_title
             return get_enhanced_release_title(version)
         except Exception as e:
             print(f"⚠️  Could not get codename for release title: {e}")
@@ -58,8 +70,10 @@ class CodenameManager:
     @staticmethod
     def get_enhanced_dmg_name(version: str) -> str:
         try:
-            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-            from codename_utils import get_enhanced_dmg_name
+            if __package__:
+                from .codename_utils import get_enhanced_dmg_name
+            else:
+                from codename_utils import get_enhanced_dmg_name
             return get_enhanced_dmg_name(version)
         except Exception as e:
             return "Potter.dmg"
@@ -68,20 +82,30 @@ class CodenameManager:
 class ReleaseNotesManager:
     """Handles release notes generation and input"""
     
-    def __init__(self, config: ReleaseConfig):
+    def __init__(self, config: ReleaseConfig, interactive: bool = True):
         self.config = config
+        self.interactive = interactive
         self.codename_manager = CodenameManager()
     
-    def get_release_notes(self, version: str, use_ai: bool = True) -> str:
-        """Get release notes using AI generation or manual input"""
+    def get_release_notes(self, version: str, use_ai: bool = True, provided_notes: Optional[str] = None) -> str:
+        """Get release notes from the provided text, AI generation or manual input"""
         codename = self.codename_manager.get_current_codename()
         print(f"\n🎭 This release codename: {codename}")
         
+        if provided_notes is not None:
+            if not provided_notes.strip():
+                raise ValueError("Provided release notes are empty")
+            print("📝 Using provided release notes")
+            return self._enhance_manual_notes(provided_notes.strip(), codename)
+        
         if use_ai:
             ai_notes = self._try_ai_generation(version, codename)
             if ai_notes:
                 return ai_notes
         
+        if not self.interactive:
+            raise ValueError("No release notes: AI generation failed and --yes allows no manual entry "
+                             "(pass --notes or --notes-file)")
         return self._get_manual_notes(version, codename)
     
     def _try_ai_generation(self, version: str, codename: str) -> Optional[str]:
@@ -98,6 +122,10 @@ class ReleaseNotesManager:
         print(ai_notes)
         print("=" * 60)
         
+        if not self.interactive:
+            print("✅ Using AI-generated notes (--yes)")
+            return ai_notes
+        
         try:
             response = input("\nUse these AI-generated notes? [Y/n]: ").strip().lower()
             if response in ['', 'y', 'yes']:
@@ -178,33 +206,103 @@ class ReleaseNotesManager:
 *This release is codenamed **{codename}** - continuing Potter's tradition of elegant, powerful text processing.*"""
 
 
+class BackgroundBuild:
+    """A build running while the release continues in the foreground
+
+    Output goes to a log file, so the build never blocks on a full pipe and
+    never interleaves with the release-notes prompts. The build gets its own
+    process group: Ctrl+C at a prompt reaches only the release manager, which
+    then stops the whole build tree itself.
+    """
+    
+    def __init__(self, command: list):
+        self.log = tempfile.NamedTemporaryFile(mode='w+', prefix='potter-release-build-',
+                                               suffix='.log', delete=False)
+        self.started = time.perf_counter()
+        self.finished = None
+        self.process = subprocess.Popen(command, stdout=self.log, stderr=subprocess.STDOUT,
+                                        text=True, start_new_session=True)
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+    
+    def _watch(self):
+        self.process.wait()
+        self.finished = time.perf_counter()
+    
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+    
+    def wait(self) -> Tuple[int, str]:
+        """Block until the build exits; returns (return code, output)"""
+        self._watcher.join()
+        self.log.seek(0)
+        output = self.log.read()
+        self.log.close()
+        return self.process.returncode, output
+    
+    def cancel(self) -> bool:
+        """Stop the build and everything it started; True if it was still running"""
+        running = self.process.poll() is None
+        if running:
+            print("🛑 Stopping background build")
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        self._watcher.join()
+        self.log.close()
+        return running
+
+
 class AppBuilder:
     """Handles app building operations"""
     
     def __init__(self, config: ReleaseConfig):
         self.config = config
     
-    def build_app(self) -> bool:
-        """Build the app using the build script with proper signing"""
-        print("🔨 Building signed Potter.app for release...")
+    def start_build(self) -> Optional[BackgroundBuild]:
+        """Start the signed build in the background"""
+        print("🔨 Building signed Potter.app for release in the background...")
         
         try:
-            result = subprocess.run(['make', 'build'], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print("✅ Signed build completed successfully")
-                return True
-            else:
-                print(f"❌ Build failed with return code {result.returncode}")
-                if result.stdout:
-                    print(f"STDOUT: {result.stdout}")
-                if result.stderr:
-                    print(f"STDERR: {result.stderr}")
-                return False
-                
+            build = BackgroundBuild(['make', 'build'])
+            print(f"📄 Build log: {build.log.name}")
+            return build
         except Exception as e:
             print(f"❌ Build error: {e}")
+            return None
+    
+    def finish_build(self, build: Optional[BackgroundBuild]) -> bool:
+        """Wait for a build started by start_build"""
+        if build is None:
+            return False
+        
+        if build.finished is None:
+            print("⏳ Waiting for the build to finish...")
+        returncode, output = build.wait()
+        
+        if returncode == 0:
+            print(f"✅ Signed build completed successfully in {build.elapsed:.0f}s")
+            os.unlink(build.log.name)
+            return True
+        else:
+            print(f"❌ Build failed with return code {returncode}")
+            if output:
+                print(f"OUTPUT: {output}")
+            print(f"📄 Full log kept at {build.log.name}")
             return False
+    
+    def cancel_build(self, build: Optional[BackgroundBuild]):
+        """Stop a build whose release was abandoned"""
+        # A build that already finished keeps its log (finish_build decides)
+        if build is not None and build.cancel() and os.path.exists(build.log.name):
+            os.unlink(build.log.name)
+    
+    def build_app(self) -> bool:
+        """Build the app using the build script with proper signing"""
+        return self.finish_build(self.start_build())
 
 
 class AppcastManager:
@@ -313,8 +411,9 @@ class AppcastManager:
 class GitManager:
     """Handles git operations"""
     
-    def __init__(self, config: ReleaseConfig):
+    def __init__(self, config: ReleaseConfig, interactive: bool = True):
         self.config = config
+        self.interactive = interactive
     
     def commit_appcast_changes(self, version: str) -> bool:
         """Commit appcast changes"""
@@ -357,7 +456,7 @@ class GitManager:
         print()
         
         try:
-            response = input("Push commits to remote? [y/N]: ").strip().lower()
+            response = input("Push commits to remote? [y/N]: ").strip().lower() if self.interactive else 'yes'
             if response in ['y', 'yes']:
                 print("📤 Pushing commits to remote...")
                 
@@ -440,12 +539,13 @@ class GitHubManager:
 class ReleaseManager:
     """Main release manager orchestrating the entire process"""
     
-    def __init__(self):
+    def __init__(self, interactive: bool = True):
         self.config = ReleaseConfig()
-        self.notes_manager = ReleaseNotesManager(self.config)
+        self.interactive = interactive
+        self.notes_manager = ReleaseNotesManager(self.config, interactive)
         self.app_builder = AppBuilder(self.config)
         self.appcast_manager = AppcastManager(self.config)
-        self.git_manager = GitManager(self.config)
+        self.git_manager = GitManager(self.config, interactive)
         self.github_manager = GitHubManager(self.config)
         self.codename_manager = CodenameManager()
     
@@ -459,15 +559,33 @@ class ReleaseManager:
             print(f"📋 Current version: {current_version}")
             print(f"🆕 New version: {new_version}")
             
-            # Get release notes
-            release_notes = self._get_release_notes(args, new_version)
-            
             # Update version
             set_version(new_version)
             print(f"✅ Version updated to {new_version}")
             
-            # Build and get DMG
-            dmg_path, dmg_name = self._build_and_get_dmg(new_version)
+            # Notes don't affect the build, so write them while it runs. The
+            # build is detached from the terminal, so anything that ends the
+            # release early (an error, Ctrl+C at a prompt or while waiting)
+            # must stop it here
+            build = self.app_builder.start_build()
+            if build is None:
+                # Don't ask for notes (or spend AI calls) for a release that can't build
+                set_version(current_version)
+                print(f"↩️  Version restored to {current_version}")
+                return False
+            notes_started = time.perf_counter()
+            try:
+                release_notes = self._get_release_notes(args, new_version)
+                notes_elapsed = time.perf_counter() - notes_started
+                
+                # Wait for the build and get DMG
+                dmg_path, dmg_name = self._finish_build_and_get_dmg(new_version, build)
+            except BaseException:
+                self.app_builder.cancel_build(build)
+                set_version(current_version)
+                print(f"↩️  Version restored to {current_version}")
+                raise
+            print(f"⏱️  Notes took {notes_elapsed:.0f}s and the build {build.elapsed:.0f}s, side by side")
             
             # Update appcast
             appcast_path = self.appcast_manager.update_appcast(new_version, dmg_path, release_notes, dmg_name)
@@ -503,6 +621,10 @@ class ReleaseManager:
         suggested_version = bump_version(current_version, args.bump)
         print(f"💡 Suggested version ({args.bump} bump): {suggested_version}")
         
+        if not self.interactive:
+            print(f"Using {suggested_version} (--yes)")
+            return suggested_version
+        
         try:
             user_input = input(f"Enter version (press Enter for {suggested_version}): ").strip()
             if user_input:
@@ -518,22 +640,25 @@ class ReleaseManager:
     def _get_release_notes(self, args, version: str) -> str:
         """Get release notes"""
         use_ai = not args.no_ai
-        release_notes = self.notes_manager.get_release_notes(version, use_ai)
+        provided_notes = args.notes
+        if args.notes_file:
+            with open(args.notes_file) as f:
+                provided_notes = f.read()
+        release_notes = self.notes_manager.get_release_notes(version, use_ai, provided_notes)
         
         if not release_notes:
             raise ValueError("Release notes are required")
         
         return release_notes
     
-    def _build_and_get_dmg(self, version: str) -> tuple:
-        """Build app and return DMG path and name"""
+    def _finish_build_and_get_dmg(self, version: str, build: Optional[BackgroundBuild]) -> tuple:
+        """Wait for the background build and return DMG path and name"""
         expected_dmg_name = self.codename_manager.get_enhanced_dmg_name(version)
         expected_dmg_path = f"dist/{expected_dmg_name}"
         
-        if not self.app_builder.build_app():
+        if not self.app_builder.finish_build(build):
             raise RuntimeError("Build failed")
         
-        import time
         time.sleep(3)  # Wait for DMG to be ready
         
         if not os.path.exists(expected_dmg_path):
@@ -572,13 +697,18 @@ def main():
     parser.add_argument('--version', help='Specific version to release')
     parser.add_argument('--no-ai', action='store_true',
                        help='Skip AI-generated release notes')
+    notes_group = parser.add_mutually_exclusive_group()
+    notes_group.add_argument('--notes', help='Release notes text (skips generation and review)')
+    notes_group.add_argument('--notes-file', help='Read release notes from a file (skips generation and review)')
+    parser.add_argument('--yes', action='store_true',
+                       help='Non-interactive: accept the suggested version and AI notes, and push without asking')
     
     args = parser.parse_args()
     
     print("🎭 Potter Release Manager")
     print("=" * 50)
     
-    release_manager = ReleaseManager()
+    release_manager = ReleaseManager(interactive=not args.yes)
     success = release_manager.run_release(args)
     
     sys.exit(0 if success else 1)
@@ -11,8 +11,8 @@ import re
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
-from dotenv import load_dotenv
-import openai
+# openai and dotenv are imported where used: they are only needed for AI
+# release notes and dominate this module's import time otherwise
 
 
 class GitCommit:
@@ -139,6 +139,8 @@ class LLMReleaseNotesGenerator:
     
     def _get_api_key(self) -> Optional[str]:
         """Get API key from .env file or environment variables"""
+        from dotenv import load_dotenv
+        
         # Load .env file from root directory
         env_file_path = os.path.join(os.path.dirname(__file__), '..', '.env')
         load_dotenv(env_file_path)
@@ -251,6 +253,8 @@ Format as markdown with proper headers and sections. Start with a brief release
     
     def _call_openai(self, prompt: str) -> str:
         """Call OpenAI API to generate release notes"""
+        import openai
+        
         client = openai.OpenAI(api_key=self.api_key)
         
         response = client.chat.completions.create(
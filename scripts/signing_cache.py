@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Signature reuse cache for Potter builds
+Stores signed copies of bundled frameworks keyed by their unsigned content,
+signing identity, entitlements and codesign options, so byte-identical
+frameworks (Sparkle) are restored instead of re-signed on every build
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional, Tuple
+
+if __package__:
+    from .build_cache import get_cache_dir, read_json, update_json
+    from .build_manifest import hash_file, tree_digest
+    from .signing_utils import SigningComponent
+else:
+    from build_cache import get_cache_dir, read_json, update_json
+    from build_manifest import hash_file, tree_digest
+    from signing_utils import SigningComponent
+
+# Bump when the key layout or stored tree format changes
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 8
+
+
+class SigningCacheMiss:
+    """A cacheable subtree that had to be signed; stored once signing succeeds"""
+
+    def __init__(self, root: SigningComponent, key: str):
+        self.root = root
+        self.key = key
+
+
+class SigningCache:
+    """Content-addressed store of signed framework trees"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir or get_cache_dir('signing')
+        self.max_entries = max_entries
+
+    def key_for(self, root: SigningComponent, subtree: List[SigningComponent], identity: str) -> str:
+        """Cache key for a framework and everything signed inside it"""
+        options = []
+        for component in subtree:
+            options.append({
+                'path': os.path.relpath(component.path, root.path),
+                'kind': component.kind,
+                'runtime': component.runtime,
+                'entitlements': hash_file(component.entitlements) if component.entitlements else None,
+            })
+
+        key_data = {
+            'format': CACHE_FORMAT_VERSION,
+            'content': tree_digest(root.path),
+            'identity': identity,
+            'components': options,
+        }
+        encoded = json.dumps(key_data, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def restore(self, key: str, dest: str) -> bool:
+        """Replace dest with the cached signed tree, if present"""
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return False
+
+        if os.path.isdir(dest) and not os.path.islink(dest):
+            shutil.rmtree(dest)
+        elif os.path.lexists(dest):
+            os.remove(dest)
+
+        # cp -a keeps the framework's Versions/Current symlinks intact
+        result = subprocess.run(['cp', '-a', entry, dest], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"⚠️  Could not restore signed {os.path.basename(dest)} from cache: {result.stderr}")
+            return False
+
+        os.utime(entry)
+        return True
+
+    def store(self, key: str, src: str):
+        """Save a freshly signed tree under key"""
+        entry = self._entry_path(key)
+        if os.path.exists(entry):
+            return
+
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix='.incoming-')
+        staged = os.path.join(staging, os.path.basename(entry))
+        try:
+            result = subprocess.run(['cp', '-a', src, staged], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"⚠️  Could not cache signed {os.path.basename(src)}: {result.stderr}")
+                return
+            try:
+                os.replace(staged, entry)
+            except OSError:
+                # Another build stored the same key first
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._prune()
+
+    def partition(self, plan: List[SigningComponent], identity: str) -> Tuple[List[SigningComponent], List[SigningCacheMiss]]:
+        """Restore cached frameworks and return the plan that still needs signing"""
+        remaining = list(plan)
+        misses = []
+
+        for root in [c for c in plan if c.kind == 'framework']:
+            subtree = [c for c in plan if c is root or c.path.startswith(root.path + '/')]
+            key = self.key_for(root, subtree, identity)
+
+            if self.restore(key, root.path):
+                print(f"♻️  Reusing cached signature for {root.name}")
+                remaining = [c for c in remaining if c not in subtree]
+            else:
+                misses.append(SigningCacheMiss(root, key))
+
+        return remaining, misses
+
+    def store_all(self, misses: List[SigningCacheMiss]):
+        """Store every subtree that was signed during this build"""
+        for miss in misses:
+            self.store(miss.key, miss.root.path)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _prune(self):
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if not name.startswith('.')
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+class GatekeeperCache:
+    """spctl assessments keyed by cdhash
+
+    Only accepted assessments are cached: a rejection for an unnotarized
+    build may turn into an acceptance once it is notarized.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.path = os.path.join(cache_dir or get_cache_dir('spctl'), 'accepted.json')
+
+    def is_accepted(self, cdhash: str) -> bool:
+        return cdhash in self._load()
+
+    def record_accepted(self, cdhash: str, output: str):
+        update_json(self.path, lambda entries: {**entries, cdhash: output}, {}, indent=2)
+
+    def _load(self) -> dict:
+        return read_json(self.path, {})
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Code signing utilities for Potter builds
+Discovers the inside-out signing plan of an app bundle and signs it with a
+bounded pool of concurrent, batched codesign invocations
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# codesign is dominated by the --timestamp round trip, not CPU, so a few
+# workers beyond the core count are still useful
+DEFAULT_SIGNING_WORKERS = 4
+
+# Upper bound on paths per codesign invocation; keeps one slow batch from
+# serialising a whole level
+DEFAULT_BATCH_SIZE = 8
+
+IDENTITY_LINE = re.compile(r'^\s*\d+\)\s+([0-9A-F]{40})\s+"(.*)"(?:\s+\((.+)\))?\s*$')
+SHA1_HASH = re.compile(r'^[0-9A-Fa-f]{40}$')
+
+# Identity name -> certificate SHA-1, resolved once per build process
+_resolved_identities: Dict[str, str] = {}
+
+
+class SigningIdentity:
+    """A code signing identity as listed by security find-identity"""
+
+    def __init__(self, sha1: str, name: str, status: Optional[str] = None):
+        self.sha1 = sha1
+        self.name = name
+        self.status = status
+
+    @property
+    def valid(self) -> bool:
+        return self.status is None
+
+    def __str__(self):
+        suffix = f" ({self.status})" if self.status else ""
+        return f"{self.sha1} \"{self.name}\"{suffix}"
+
+
+def list_signing_identities(keychain: Optional[str] = None) -> List[SigningIdentity]:
+    """List every code signing identity, including expired or revoked ones"""
+    cmd = ['security', 'find-identity', '-p', 'codesigning']
+    if keychain:
+        cmd.append(keychain)
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"security find-identity failed: {result.stderr.strip()}")
+
+    return parse_find_identity_output(result.stdout)
+
+
+def parse_find_identity_output(output: str) -> List[SigningIdentity]:
+    """Parse the 'Matching identities' section of security find-identity"""
+    identities = []
+    for line in output.splitlines():
+        # The "Valid identities only" section repeats the valid entries
+        if 'Valid identities only' in line:
+            break
+        match = IDENTITY_LINE.match(line)
+        if match:
+            sha1, name, status = match.groups()
+            identities.append(SigningIdentity(sha1, name, status))
+    return identities
+
+
+def resolve_signing_identity(identity: str, keychain: Optional[str] = None) -> str:
+    """Resolve a signing identity name to its certificate SHA-1 hash
+
+    codesign --sign searches the keychain by name on every call; passing the
+    hash skips that lookup. Resolution happens once per process and fails if
+    the identity is missing, ambiguous or no longer valid, so a bad keychain
+    is reported before the build rather than at the first codesign call.
+    """
+    if identity in _resolved_identities:
+        return _resolved_identities[identity]
+
+    identities = list_signing_identities(keychain)
+
+    if SHA1_HASH.match(identity):
+        candidates = [i for i in identities if i.sha1 == identity.upper()]
+    else:
+        # Exact name first, then the substring match codesign itself would use
+        candidates = [i for i in identities if i.name == identity] or \
+            [i for i in identities if identity in i.name]
+
+    if not candidates:
+        raise ValueError(f"Signing identity not found in keychain: {identity}")
+
+    valid = [i for i in candidates if i.valid]
+    if not valid:
+        details = ', '.join(str(i) for i in candidates)
+        raise ValueError(f"Signing identity is not valid (expired or revoked): {details}")
+
+    distinct = {i.sha1: i for i in valid}
+    if len(distinct) > 1:
+        details = '\n   '.join(str(i) for i in distinct.values())
+        raise ValueError(f"Signing identity is ambiguous: {identity}\n   {details}")
+
+    resolved = valid[0]
+    _resolved_identities[identity] = resolved.sha1
+    return resolved.sha1
+
+
+class SigningComponent:
+    """A single codesign target inside an app bundle"""
+
+    def __init__(self, path: str, kind: str, depth: int,
+                 entitlements: Optional[str] = None, runtime: bool = True,
+                 verify: bool = False):
+        self.path = path
+        self.kind = kind
+        self.depth = depth
+        self.entitlements = entitlements
+        self.runtime = runtime
+        self.verify = verify
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def options_key(self) -> tuple:
+        """Components with equal keys can share one codesign invocation"""
+        return (self.entitlements, self.runtime, self.verify)
+
+    def __str__(self):
+        return f"{self.kind} {self.name}"
+
+
+class SigningResult:
+    """Outcome of signing one component"""
+
+    def __init__(self, component: SigningComponent, success: bool, output: str = ''):
+        self.component = component
+        self.success = success
+        self.output = output
+
+
+class CodesignBackend:
+    """Signs components by invoking the codesign CLI"""
+
+    def __init__(self, identity: str):
+        self.identity = identity
+
+    def build_command(self, components: List[SigningComponent]) -> List[str]:
+        """Build one codesign command line for components sharing options"""
+        options = components[0]
+        cmd = ['codesign', '--force']
+        if len(components) > 1:
+            # Without this codesign stops at the first failing path
+            cmd.append('--continue')
+        if options.verify:
+            cmd.append('--verify')
+        cmd.extend(['--verbose', '--sign', self.identity])
+        if options.entitlements:
+            cmd.extend(['--entitlements', options.entitlements])
+        cmd.append('--timestamp')
+        if options.runtime:
+            cmd.extend(['--options', 'runtime'])
+        cmd.extend(component.path for component in components)
+        return cmd
+
+    def sign(self, component: SigningComponent) -> SigningResult:
+        """Sign a single component"""
+        result = subprocess.run(self.build_command([component]), capture_output=True, text=True)
+        return SigningResult(component, result.returncode == 0, result.stderr)
+
+    def sign_batch(self, components: List[SigningComponent]) -> List[SigningResult]:
+        """Sign several components in one codesign process
+
+        With --continue, codesign processes every path even after one fails.
+        It prefixes each report line with the path it concerns, which is how
+        results are attributed, so only paths reported as failed (or not
+        reported at all) count as failures and get retried on their own.
+        """
+        if len(components) == 1:
+            return [self.sign(components[0])]
+
+        result = subprocess.run(self.build_command(components), capture_output=True, text=True)
+        return attribute_batch_output(components, result.returncode, result.stderr)
+
+
+def attribute_batch_output(components: List[SigningComponent], returncode: int,
+                           output: str) -> List[SigningResult]:
+    """Split a batched codesign report into per-component results"""
+    lines_by_path = {component.path: [] for component in components}
+    # Longest paths first so a bundle never claims lines of something nested in it
+    paths = sorted(lines_by_path, key=len, reverse=True)
+
+    for line in output.splitlines():
+        for path in paths:
+            if line.startswith(f"{path}:"):
+                lines_by_path[path].append(line[len(path) + 1:].strip())
+                break
+
+    results = []
+    for component in components:
+        lines = lines_by_path[component.path]
+        if returncode == 0:
+            success = True
+        else:
+            success = any(line.startswith('signed') for line in lines) and \
+                not any('error' in line.lower() or 'failed' in line.lower() for line in lines)
+        results.append(SigningResult(component, success, '\n'.join(lines)))
+    return results
+
+
+def discover_signing_plan(app_path: str, executable_name: str,
+                          entitlements_file: str) -> List[SigningComponent]:
+    """List everything that needs a signature, tagged with its nesting depth"""
+    plan = []
+
+    frameworks_dir = f"{app_path}/Contents/Frameworks"
+    if os.path.exists(frameworks_dir):
+        for framework in sorted(os.listdir(frameworks_dir)):
+            if not framework.endswith('.framework'):
+                continue
+            framework_path = f"{frameworks_dir}/{framework}"
+            version_dir = f"{framework_path}/Versions/B"
+
+            xpc_services_dir = f"{version_dir}/XPCServices"
+            if os.path.exists(xpc_services_dir):
+                for xpc_service in sorted(os.listdir(xpc_services_dir)):
+                    if xpc_service.endswith('.xpc'):
+                        plan.append(SigningComponent(
+                            f"{xpc_services_dir}/{xpc_service}", 'XPC service', 2))
+
+            autoupdate_path = f"{version_dir}/Autoupdate"
+            if os.path.exists(autoupdate_path):
+                plan.append(SigningComponent(autoupdate_path, 'executable', 2))
+
+            updater_app_path = f"{version_dir}/Updater.app"
+            if os.path.exists(updater_app_path):
+                plan.append(SigningComponent(updater_app_path, 'helper app', 2))
+
+            plan.append(SigningComponent(framework_path, 'framework', 1))
+
+    plan.append(SigningComponent(
+        f"{app_path}/Contents/MacOS/{executable_name}", 'executable', 1,
+        entitlements=entitlements_file, verify=True))
+    plan.append(SigningComponent(
+        app_path, 'app bundle', 0, entitlements=entitlements_file, verify=True))
+
+    return plan
+
+
+class SigningScheduler:
+    """Signs a plan level by level, deepest components first
+
+    Components at the same depth never contain each other, so each level is
+    signed concurrently. A level only starts once everything nested inside it
+    has been signed. The signer is any object with a ``sign(component)`` method
+    returning a SigningResult, which keeps the scheduler testable without
+    codesign. Signers that also provide ``sign_batch(components)`` get
+    components with identical options grouped into shared invocations; members
+    of a batch that fail are retried on their own.
+    """
+
+    def __init__(self, signer, max_workers: int = DEFAULT_SIGNING_WORKERS,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.signer = signer
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+
+    def levels(self, plan: List[SigningComponent]) -> List[List[SigningComponent]]:
+        """Group the plan into levels in signing order"""
+        depths = sorted({component.depth for component in plan}, reverse=True)
+        return [[c for c in plan if c.depth == depth] for depth in depths]
+
+    def run(self, plan: List[SigningComponent]) -> bool:
+        """Sign every component, stopping at the first level with a failure"""
+        for level in self.levels(plan):
+            results = self._sign_level(level)
+
+            failed = [r for r in results if not r.success]
+            for result in results:
+                if result.success:
+                    print(f"✅ Signed {result.component}")
+                else:
+                    print(f"❌ Signing {result.component} failed: {result.output}")
+
+            if failed:
+                return False
+
+        return True
+
+    def batches(self, level: List[SigningComponent]) -> List[List[SigningComponent]]:
+        """Split a level into codesign invocations"""
+        if not hasattr(self.signer, 'sign_batch'):
+            return [[component] for component in level]
+
+        groups = {}
+        for component in level:
+            groups.setdefault(component.options_key(), []).append(component)
+
+        batches = []
+        for group in groups.values():
+            for start in range(0, len(group), self.batch_size):
+                batches.append(group[start:start + self.batch_size])
+        return batches
+
+    def _sign_level(self, level: List[SigningComponent]) -> List[SigningResult]:
+        batches = self.batches(level)
+        if len(batches) == 1 or self.max_workers == 1:
+            batch_results = [self._sign_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                batch_results = list(executor.map(self._sign_batch, batches))
+
+        results = [result for batch in batch_results for result in batch]
+
+        # Retry only the members that failed inside a shared invocation
+        retried = []
+        for result in results:
+            if not result.success and len(self._batch_of(result.component, batches)) > 1:
+                print(f"🔁 Retrying {result.component} on its own")
+                retried.append(self._sign_one(result.component))
+            else:
+                retried.append(result)
+        return retried
+
+    def _batch_of(self, component: SigningComponent, batches: List[List[SigningComponent]]) -> List[SigningComponent]:
+        return next(batch for batch in batches if component in batch)
+
+    def _sign_batch(self, batch: List[SigningComponent]) -> List[SigningResult]:
+        if len(batch) == 1:
+            return [self._sign_one(batch[0])]
+
+        print(f"🔐 Signing {', '.join(str(component) for component in batch)}")
+        try:
+            return self.signer.sign_batch(batch)
+        except Exception as e:
+            return [SigningResult(component, False, str(e)) for component in batch]
+
+    def _sign_one(self, component: SigningComponent) -> SigningResult:
+        print(f"🔐 Signing {component}")
+        try:
+            return self.signer.sign(component)
+        except Exception as e:
+            return SigningResult(component, False, str(e))
+
+
+def verify_component(component: SigningComponent) -> SigningResult:
+    """Verify one component's own signature (without --deep)"""
+    result = subprocess.run(
+        ['codesign', '--verify', '--strict', '--verbose=2', component.path],
+        capture_output=True, text=True
+    )
+    return SigningResult(component, result.returncode == 0, result.stderr)
+
+
+def verify_components(plan: List[SigningComponent],
+                      max_workers: int = os.cpu_count() or DEFAULT_SIGNING_WORKERS,
+                      verifier=verify_component) -> List[SigningResult]:
+    """Verify every component of a signing plan in parallel
+
+    Replaces 'codesign --verify --deep', which re-hashes nested code serially
+    and is deprecated. Each component is checked independently, so order does
+    not matter here.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(plan)))) as executor:
+        return list(executor.map(verifier, plan))
+
+
+def get_cdhash(path: str) -> Optional[str]:
+    """Code directory hash of signed code, from codesign -d"""
+    result = subprocess.run(['codesign', '-d', '-vvv', path], capture_output=True, text=True)
+    for line in (result.stderr + result.stdout).splitlines():
+        if line.startswith('CDHash='):
+            return line.split('=', 1)[1].strip()
+    return None
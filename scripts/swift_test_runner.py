@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Sharded Swift test runner for Potter
+Builds the test bundle once, lists its tests and runs test classes in
+shards balanced by each test's recorded duration history, one process per
+shard, each with its own HOME, Application Support, preferences and temp
+directory. Suites that touch machine-global state (the pasteboard,
+synthesized events) run afterwards on their own. Results from every shard
+are merged into a single xunit report.
+"""
+
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+if __package__:
+    from .test_cache import TestResultCache, test_cache_disabled
+    from .test_impact import ImpactState, plan_test_selection, tested_commit
+    from .test_profiler import DEFAULT_TEST_DURATION, TestHistory, TestOutputParser, TestResult
+else:
+    from test_cache import TestResultCache, test_cache_disabled
+    from test_impact import ImpactState, plan_test_selection, tested_commit
+    from test_profiler import DEFAULT_TEST_DURATION, TestHistory, TestOutputParser, TestResult
+
+SWIFT_PROJECT_DIR = "swift-potter"
+TEST_SOURCES_DIR = "Tests"
+DEFAULT_XUNIT_PATH = "build/test-results/PotterTests.xml"
+DEFAULT_SHARD_TIMEOUT = 300
+
+# Test files mentioning these share state across processes (the general
+# pasteboard, the event stream) and must not overlap with any other shard
+GLOBAL_STATE_PATTERNS = ('NSPasteboard', 'CGEvent', 'clipboard')
+
+
+def is_swift_testing(test_id: str) -> bool:
+    """swift-testing identifiers are functions (end with ')'); XCTest ones are not"""
+    return test_id.endswith(')')
+
+
+def scratch_args(scratch_path: Optional[str]) -> List[str]:
+    """SwiftPM arguments selecting a build directory other than .build"""
+    return ['--scratch-path', scratch_path] if scratch_path else []
+
+
+def list_tests(package_dir: str = SWIFT_PROJECT_DIR, scratch_path: Optional[str] = None) -> List[str]:
+    """Test identifiers ('Module.Suite/test') from 'swift test list'"""
+    result = subprocess.run(['swift', 'test', 'list', '--skip-build'] + scratch_args(scratch_path), cwd=package_dir,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"swift test list failed: {result.stderr.strip()}")
+    return [line.strip() for line in result.stdout.splitlines() if '/' in line and '.' in line.split('/')[0]]
+
+
+def find_global_state_suites(tests_dir: str) -> List[str]:
+    """Suite names (without module) declared in test files that touch global state"""
+    suites = []
+    for name in sorted(os.listdir(tests_dir)):
+        if not name.endswith('.swift'):
+            continue
+        with open(os.path.join(tests_dir, name), encoding='utf-8') as f:
+            source = f.read()
+        if any(pattern in source for pattern in GLOBAL_STATE_PATTERNS):
+            suites += re.findall(r'(?:class|struct)\s+(\w+)\s*:', source)
+    return suites
+
+
+def plan_shards(tests: List[str], shard_count: int, durations: Dict[str, float]) -> List[List[str]]:
+    """Split suites into shards of similar total duration (longest first)
+
+    Whole suites stay together so class-level setUp/tearDown behave as in a
+    normal run.
+    """
+    suite_tests = {}
+    for test_id in tests:
+        suite_tests.setdefault(test_id.split('/', 1)[0], []).append(test_id)
+
+    known = [d for d in durations.values() if d > 0]
+    default = sorted(known)[len(known) // 2] if known else DEFAULT_TEST_DURATION
+    suite_time = {
+        suite: sum(durations.get(test_id, default) for test_id in ids)
+        for suite, ids in suite_tests.items()
+    }
+
+    shards = [[] for _ in range(max(1, min(shard_count, len(suite_tests))))]
+    loads = [0.0] * len(shards)
+    for suite in sorted(suite_time, key=lambda s: (-suite_time[s], s)):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(suite)
+        loads[lightest] += suite_time[suite]
+    return [shard for shard in shards if shard]
+
+
+def isolated_environment(root: str) -> Dict[str, str]:
+    """Environment giving a test process its own home, preferences and temp dir"""
+    for sub in ('Library/Application Support', 'Library/Preferences', 'Library/Caches', 'tmp'):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+    env = dict(os.environ)
+    env['HOME'] = root
+    # Foundation resolves ~, Application Support and the defaults domain from this
+    env['CFFIXED_USER_HOME'] = root
+    env['TMPDIR'] = os.path.join(root, 'tmp') + '/'
+    return env
+
+
+def get_test_bundle(package_dir: str, scratch_path: Optional[str] = None) -> str:
+    bin_path = subprocess.run(['swift', 'build', '--build-tests', '--show-bin-path'] + scratch_args(scratch_path),
+                              cwd=package_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    bundles = [name for name in os.listdir(bin_path) if name.endswith('PackageTests.xctest')]
+    if not bundles:
+        raise RuntimeError(f"No test bundle found in {bin_path}")
+    return os.path.join(bin_path, bundles[0])
+
+
+def xctest_command(bundle: str, suites: List[str]) -> List[str]:
+    # Running the bundle directly avoids SwiftPM's lock on .build, which
+    # would serialize concurrent 'swift test' invocations
+    return ['xcrun', 'xctest', '-XCTest', ','.join(suites), bundle]
+
+
+class ShardedTestRunner:
+    """Runs a Swift package's tests across isolated processes"""
+
+    def __init__(self, package_dir: str = SWIFT_PROJECT_DIR, shard_count: Optional[int] = None,
+                 timeout: int = DEFAULT_SHARD_TIMEOUT, xunit_path: str = DEFAULT_XUNIT_PATH,
+                 scratch_path: Optional[str] = None):
+        self.package_dir = package_dir
+        # A separate scratch path lets the tests build while another SwiftPM
+        # build holds the lock on .build
+        self.scratch_path = scratch_path
+        self.shard_count = shard_count or os.cpu_count() or 1
+        self.timeout = timeout
+        self.xunit_path = xunit_path
+        self.history = TestHistory()
+        self.results = {}
+        self._print_lock = threading.Lock()
+
+    def build(self) -> bool:
+        print("🔨 Building tests...")
+        result = subprocess.run(['swift', 'build', '--build-tests'] + scratch_args(self.scratch_path),
+                                cwd=self.package_dir,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ Test build failed: {result.stderr or result.stdout}")
+            return False
+        return True
+
+    def run(self, suites: Optional[Iterable[str]] = None) -> bool:
+        """Build, run every test (or only the named suites) and write the xunit report"""
+        if not self.build():
+            return False
+
+        tests = list_tests(self.package_dir, self.scratch_path)
+        if suites is not None:
+            selected = set(suites)
+            tests = [t for t in tests if t.split('/', 1)[0].rsplit('.', 1)[-1] in selected]
+        xctests = [t for t in tests if not is_swift_testing(t)]
+        swift_testing = [t for t in tests if is_swift_testing(t)]
+
+        global_names = set(find_global_state_suites(os.path.join(self.package_dir, TEST_SOURCES_DIR)))
+        serial = [t for t in xctests if t.split('/')[0].rsplit('.', 1)[-1] in global_names]
+        serial_ids = set(serial)
+        parallel = [t for t in xctests if t not in serial_ids]
+
+        shards = plan_shards(parallel, self.shard_count, self.history.expected_durations())
+        print(f"🧪 Running {len(tests)} tests: {len(shards)} parallel shards, "
+              f"{len(set(t.split('/')[0] for t in serial))} global-state suites serially")
+
+        bundle = get_test_bundle(self.package_dir, self.scratch_path)
+        start = time.perf_counter()
+        work_dir = tempfile.mkdtemp(prefix='potter-tests-')
+        try:
+            with ThreadPoolExecutor(max_workers=len(shards) + 1) as executor:
+                jobs = [executor.submit(self._run_xctest_shard, bundle, shard, index, work_dir, tests)
+                        for index, shard in enumerate(shards)]
+                if swift_testing:
+                    jobs.append(executor.submit(self._run_swift_testing, swift_testing, work_dir))
+                for job in jobs:
+                    self._collect(job.result())
+
+            # Global-state suites must not overlap with anything else
+            serial_suites = sorted(set(t.split('/')[0] for t in serial))
+            if serial_suites:
+                self._collect(self._run_xctest_shard(bundle, serial_suites, len(shards), work_dir, tests))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - start
+        write_xunit(list(self.results.values()), self.xunit_path, elapsed)
+        self.history.record(self.results.values())
+
+        failed = [r for r in self.results.values() if not r.passed]
+        print(f"📊 {len(self.results) - len(failed)}/{len(self.results)} passed in {elapsed:.1f}s "
+              f"(report: {self.xunit_path})")
+        for result in failed:
+            print(f"   ❌ {result.test_id}: {result.message.splitlines()[0] if result.message else result.status}")
+
+        slower = [r for r in self.history.regressions() if r[0] in self.results]
+        if slower:
+            print(f"📈 {len(slower)} tests slower than usual (see scripts/test_profiler.py):")
+            for test_id, usual, latest in slower[:5]:
+                print(f"   {usual:.2f}s → {latest:.2f}s  {test_id}")
+        return not failed
+
+    def _collect(self, results: Dict[str, TestResult]):
+        self.results.update(results)
+
+    def _stream(self, command: List[str], env: Dict[str, str]) -> Tuple[TestOutputParser, Optional[int]]:
+        """Run a test process, parsing its output as it arrives
+
+        Returns the parser and the exit code (None if the process timed out).
+        """
+        parser = TestOutputParser()
+        # Own process group, so a timeout also kills helpers holding the pipe open
+        proc = subprocess.Popen(command, cwd=self.package_dir, env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True, errors='replace', start_new_session=True)
+        timer = threading.Timer(self.timeout, os.killpg, (proc.pid, signal.SIGKILL))
+        timer.start()
+        try:
+            for line in proc.stdout:
+                result = parser.feed(line)
+                if result is not None and result.status == 'failed':
+                    with self._print_lock:
+                        print(f"   ❌ {result.test_id} ({result.seconds:.2f}s)")
+            proc.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+        return parser, None if timed_out else proc.returncode
+
+    def _run_xctest_shard(self, bundle: str, suites: List[str], index: int, work_dir: str,
+                          tests: List[str]) -> Dict[str, TestResult]:
+        env = isolated_environment(os.path.join(work_dir, f"shard-{index}"))
+        shard_suites = set(suites)
+        expected = [t for t in tests if t.split('/')[0] in shard_suites]
+        parser, returncode = self._stream(xctest_command(bundle, suites), env)
+        if returncode is None:
+            missing_status = f"timed out after {self.timeout}s"
+        else:
+            missing_status = f"did not report a result (exit code {returncode})"
+
+        results = parser.results
+        # A crash or timeout leaves tests without a line; count them as failures
+        for test_id in expected:
+            if test_id not in results:
+                results[test_id] = TestResult(test_id, 'failed', 0.0, missing_status)
+        return results
+
+    def _run_swift_testing(self, tests: List[str], work_dir: str) -> Dict[str, TestResult]:
+        env = isolated_environment(os.path.join(work_dir, 'swift-testing'))
+        xunit = os.path.join(work_dir, 'swift-testing.xml')
+        suites = sorted(set(t.split('/', 1)[0] for t in tests))
+        suite_filter = '^(' + '|'.join(re.escape(s) for s in suites) + ')/'
+        _, returncode = self._stream(['swift', 'test', '--skip-build', '--disable-xctest', '--filter',
+                                      suite_filter, '--xunit-output', xunit] + scratch_args(self.scratch_path), env)
+        missing_status = f"timed out after {self.timeout}s" if returncode is None else "did not report a result"
+
+        # Console lines lack the suite name, so full ids come from the xunit
+        # report SwiftPM writes next to the requested path
+        results = {}
+        for path in (xunit, xunit.replace('.xml', '-swift-testing.xml')):
+            if os.path.exists(path):
+                results.update(read_xunit(path))
+        for test_id in tests:
+            if test_id not in results:
+                results[test_id] = TestResult(test_id, 'failed', 0.0, missing_status)
+        return results
+
+
+def run_test_gate(package_dir: str = SWIFT_PROJECT_DIR, shard_count: Optional[int] = None,
+                  all_tests: bool = False, impact: bool = True, use_cache: bool = True,
+                  timeout: int = DEFAULT_SHARD_TIMEOUT, xunit_path: str = DEFAULT_XUNIT_PATH,
+                  scratch_path: Optional[str] = None) -> bool:
+    """Run the suites a change needs, replaying a cached green result when the
+    sources and toolchain are unchanged since it was recorded"""
+    cache = TestResultCache() if use_cache and not test_cache_disabled() else None
+    cache_key = cache.key_for(package_dir) if cache else None
+
+    impact_state = ImpactState()
+    suites = plan_test_selection(package_dir, impact_state, force_full=all_tests) if impact else None
+
+    if suites is not None and not suites:
+        print("✅ No tests affected by changes since the last green run")
+        passed = True
+    elif cache and cache.replay(cache_key, suites):
+        passed = True
+    else:
+        runner = ShardedTestRunner(package_dir, shard_count, timeout, xunit_path, scratch_path)
+        passed = runner.run(suites)
+        if cache and runner.results:
+            cache.store(cache_key, runner.results.values(), complete=suites is None)
+
+    impact_state.record(tested_commit(package_dir), suites is None, passed)
+    return passed
+
+
+def read_xunit(path: str) -> Dict[str, TestResult]:
+    """Results from a JUnit/xunit XML report"""
+    results = {}
+    for case in ET.parse(path).getroot().iter('testcase'):
+        test_id = f"{case.get('classname')}/{case.get('name')}"
+        failure = case.find('failure')
+        if failure is None:
+            failure = case.find('error')
+        status = 'skipped' if case.find('skipped') is not None else 'failed' if failure is not None else 'passed'
+        message = (failure.get('message') or failure.text or '') if failure is not None else ''
+        results[test_id] = TestResult(test_id, status, float(case.get('time') or 0), message)
+    return results
+
+
+def write_xunit(results: List[TestResult], path: str, elapsed: float = 0.0):
+    """Write results as a single xunit report"""
+    failures = [r for r in results if r.status == 'failed']
+    skipped = [r for r in results if r.status == 'skipped']
+    suites = ET.Element('testsuites')
+    suite = ET.SubElement(suites, 'testsuite', name='PotterTests', tests=str(len(results)),
+                          failures=str(len(failures)), skipped=str(len(skipped)),
+                          errors='0', time=f"{elapsed:.3f}")
+    for result in sorted(results, key=lambda r: r.test_id):
+        case = ET.SubElement(suite, 'testcase', classname=result.suite, name=result.name,
+                             time=f"{result.seconds:.3f}")
+        if result.status == 'failed':
+            ET.SubElement(case, 'failure', message=result.message.splitlines()[0] if result.message else 'failed').text = result.message
+        elif result.status == 'skipped':
+            ET.SubElement(case, 'skipped')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ET.ElementTree(suites).write(path, encoding='utf-8', xml_declaration=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run Potter Swift tests in isolated parallel shards')
+    parser.add_argument('--package-dir', default=SWIFT_PROJECT_DIR)
+    parser.add_argument('--shards', type=int, help='Parallel shards (default: all cores)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_SHARD_TIMEOUT, help='Seconds per shard')
+    parser.add_argument('--xunit', default=DEFAULT_XUNIT_PATH, help='Merged xunit report path')
+    parser.add_argument('--impact', action='store_true',
+                        help='Only run suites affected by changes since the last green run')
+    parser.add_argument('--scratch-path', help='SwiftPM build directory for the tests (default: .build)')
+    parser.add_argument('--no-test-cache', action='store_true',
+                        help='Always run the tests, even if these sources already passed '
+                             '(also POTTER_NO_TEST_CACHE=1)')
+    parser.add_argument('--clear-test-cache', action='store_true', help='Forget all cached test results')
+    args = parser.parse_args()
+
+    if args.clear_test_cache:
+        TestResultCache().clear()
+        print("🧹 Test result cache cleared")
+
+    passed = run_test_gate(args.package_dir, args.shards, impact=args.impact,
+                           use_cache=not args.no_test_cache, timeout=args.timeout,
+                           xunit_path=args.xunit, scratch_path=args.scratch_path)
+    sys.exit(0 if passed else 1)
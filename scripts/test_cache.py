@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Swift test result cache
+Stores per-test outcomes under a key made from everything that can change
+them: Sources/, Tests/, Package.swift, Package.resolved and the Swift
+toolchain version. A later run with the same key and an all-green result
+for the requested suites is replayed instead of executed.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from typing import Dict, Iterable, Optional, Set
+
+if __package__:
+    from .build_cache import get_cache_dir, update_json
+    from .build_manifest import hash_file, tree_digest
+else:
+    from build_cache import get_cache_dir, update_json
+    from build_manifest import hash_file, tree_digest
+
+# Bump when the key inputs or entry layout change
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 20
+KEY_DIRECTORIES = ('Sources', 'Tests')
+KEY_FILES = ('Package.swift', 'Package.resolved')
+
+_swift_version = None
+
+
+def get_swift_version() -> str:
+    """'swift --version' output (toolchain and target), cached per process"""
+    global _swift_version
+    if _swift_version is None:
+        try:
+            result = subprocess.run(['swift', '--version'], capture_output=True, text=True)
+            _swift_version = (result.stdout + result.stderr).strip()
+        except OSError:
+            _swift_version = 'unknown'
+    return _swift_version
+
+
+def test_cache_disabled() -> bool:
+    return os.getenv('POTTER_NO_TEST_CACHE', '').lower() in ('1', 'true', 'yes')
+
+
+class TestResultCache:
+    """Per-test pass/fail results keyed by source and toolchain hash"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir or get_cache_dir('test_results')
+        self.max_entries = max_entries
+
+    def key_for(self, package_dir: str) -> str:
+        """Hash of every input that can change a test outcome"""
+        key_data = {
+            'format': CACHE_FORMAT_VERSION,
+            'swift': get_swift_version(),
+        }
+        for name in KEY_DIRECTORIES:
+            path = os.path.join(package_dir, name)
+            key_data[name] = tree_digest(path) if os.path.exists(path) else None
+        for name in KEY_FILES:
+            path = os.path.join(package_dir, name)
+            key_data[name] = hash_file(path) if os.path.exists(path) else None
+
+        encoded = json.dumps(key_data, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def replay(self, key: str, suites: Optional[Set[str]] = None) -> bool:
+        """True if these sources already passed the requested suites (None = all)"""
+        entry = self.load(key)
+        if not entry:
+            return False
+
+        tests = entry.get('tests', {})
+        if suites is None:
+            if not entry.get('complete'):
+                return False
+            covered = tests
+        else:
+            covered = {t: s for t, s in tests.items() if t.split('/', 1)[0].rsplit('.', 1)[-1] in suites}
+            # Every requested suite must have been run under this key
+            ran = {t.split('/', 1)[0].rsplit('.', 1)[-1] for t in covered}
+            if not entry.get('complete') and not suites <= ran:
+                return False
+
+        if not covered or any(status == 'failed' for status in covered.values()):
+            return False
+
+        os.utime(self._entry_path(key))
+        print(f"♻️  Replaying cached green result for {len(covered)} tests "
+              f"(sources and toolchain unchanged since {entry.get('timestamp', 'a previous run')})")
+        return True
+
+    def store(self, key: str, results: Iterable, complete: bool):
+        """Merge one run's results (TestResult objects) into the entry for key"""
+        results = list(results)
+
+        def merge(entry):
+            entry = entry or {'tests': {}, 'complete': False}
+            for result in results:
+                entry['tests'][result.test_id] = result.status
+            entry['complete'] = entry['complete'] or complete
+            entry['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            return entry
+
+        update_json(self._entry_path(key), merge, indent=2, sort_keys=True)
+        self._prune()
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _prune(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.endswith('.json')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            os.remove(stale)
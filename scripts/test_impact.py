@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Test impact analysis for Potter
+Indexes the Swift sources with a lightweight tokenizer (declared types and
+the identifiers each file references), maps files changed since the last
+green run to the test suites that can observe them, and falls back to the
+full suite whenever the answer would be uncertain or a periodic safety-net
+run is due.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+from typing import Dict, List, Optional, Set
+
+if __package__:
+    from .build_cache import get_cache_dir, update_json
+else:
+    from build_cache import get_cache_dir, update_json
+
+SWIFT_PROJECT_DIR = "swift-potter"
+SOURCES_DIR = "Sources"
+TESTS_DIR = "Tests"
+
+# Safety net: run everything after this many impact runs or this much time
+FULL_RUN_INTERVAL = 10
+FULL_RUN_MAX_AGE = 24 * 60 * 60
+# Test files every suite depends on
+SHARED_TEST_FILES = ('TestBase.swift',)
+
+_COMMENT_OR_STRING_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"""(?:.|\n)*?"""|"(?:\\.|[^"\\\n])*"', re.S)
+_DECLARATION_RE = re.compile(
+    r'\b(?:class|struct|enum|protocol|actor|typealias|extension)\s+([A-Za-z_]\w*)'
+)
+# Free functions: 'func' at the start of a line, after modifiers/attributes
+_FUNCTION_RE = re.compile(r'^(?:(?:@\w+|public|internal|fileprivate|private|static)\s+)*func\s+([A-Za-z_]\w*)', re.M)
+_IDENTIFIER_RE = re.compile(r'\b[A-Za-z_]\w*\b')
+
+
+class SwiftFileIndex:
+    """Declarations and references of one Swift file"""
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        code = _COMMENT_OR_STRING_RE.sub(' ', source)
+        self.declared = set(_DECLARATION_RE.findall(code))
+        self.functions = set(_FUNCTION_RE.findall(code))
+        self.references = set(_IDENTIFIER_RE.findall(code))
+
+    @classmethod
+    def load(cls, path: str) -> 'SwiftFileIndex':
+        with open(path, encoding='utf-8') as f:
+            return cls(path, f.read())
+
+
+def index_directory(directory: str) -> Dict[str, SwiftFileIndex]:
+    """Index every .swift file under directory, keyed by path relative to it"""
+    index = {}
+    for dirpath, _, filenames in os.walk(directory):
+        for name in sorted(filenames):
+            if name.endswith('.swift'):
+                path = os.path.join(dirpath, name)
+                index[os.path.relpath(path, directory)] = SwiftFileIndex.load(path)
+    return index
+
+
+class ImpactAnalyzer:
+    """Maps changed source files to the test suites that may be affected"""
+
+    def __init__(self, package_dir: str = SWIFT_PROJECT_DIR):
+        self.package_dir = package_dir
+        self.sources = index_directory(os.path.join(package_dir, SOURCES_DIR))
+        self.tests = index_directory(os.path.join(package_dir, TESTS_DIR))
+
+        # Which source files declare each symbol (extensions and free
+        # functions count as declaring)
+        self.declared_in = {}
+        for path, entry in self.sources.items():
+            for symbol in entry.declared | entry.functions:
+                self.declared_in.setdefault(symbol, set()).add(path)
+
+        # Reverse dependencies: file -> source files referencing its symbols
+        self.dependents = {path: set() for path in self.sources}
+        for path, entry in self.sources.items():
+            for symbol in entry.references & set(self.declared_in):
+                for declaring in self.declared_in[symbol]:
+                    if declaring != path:
+                        self.dependents[declaring].add(path)
+
+    def affected_sources(self, changed: List[str]) -> Set[str]:
+        """Changed source files plus everything that transitively depends on them"""
+        affected = set()
+        pending = [path for path in changed if path in self.sources]
+        while pending:
+            path = pending.pop()
+            if path in affected:
+                continue
+            affected.add(path)
+            pending.extend(self.dependents.get(path, ()))
+        return affected
+
+    def affected_suites(self, changed_sources: List[str], changed_tests: List[str]) -> Set[str]:
+        """Suite type names (without module) to run for a set of changes"""
+        symbols = set()
+        for path in self.affected_sources(changed_sources):
+            symbols |= self.sources[path].declared | self.sources[path].functions
+
+        suites = set()
+        for path, entry in self.tests.items():
+            if path in changed_tests or entry.references & symbols:
+                suites |= entry.declared
+        return suites
+
+    def select_tests(self, tests: List[str], suites: Set[str]) -> List[str]:
+        """Test ids ('Module.Suite/test') belonging to the given suites"""
+        return [t for t in tests if t.split('/', 1)[0].rsplit('.', 1)[-1] in suites]
+
+
+# ── Change detection and run history ──────────────────────────
+
+def _git(args: List[str], cwd: str) -> Optional[str]:
+    result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def changed_files(package_dir: str, since: str) -> Optional[List[str]]:
+    """Files under package_dir changed since a commit (including uncommitted and untracked)"""
+    # Without rename detection, both sides of a rename are listed
+    diff = _git(['diff', '--name-only', '--no-renames', '--relative', since, '--', '.'], package_dir)
+    untracked = _git(['ls-files', '--others', '--exclude-standard', '--', '.'], package_dir)
+    if diff is None or untracked is None:
+        return None
+    return sorted(set(diff.splitlines()) | set(untracked.splitlines()))
+
+
+class ImpactState:
+    """Last green commit and when the suite last ran in full"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.path = os.path.join(cache_dir or get_cache_dir('test_impact'), 'state.json')
+        try:
+            with open(self.path) as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    @property
+    def last_green(self) -> Optional[str]:
+        return self.data.get('last_green')
+
+    def full_run_due(self) -> bool:
+        return (self.data.get('runs_since_full', FULL_RUN_INTERVAL) >= FULL_RUN_INTERVAL
+                or time.time() - self.data.get('last_full', 0) > FULL_RUN_MAX_AGE)
+
+    def record(self, commit: Optional[str], full: bool, passed: bool):
+        def change(data):
+            if passed and commit:
+                data['last_green'] = commit
+            if full and passed:
+                data['runs_since_full'] = 0
+                data['last_full'] = time.time()
+            else:
+                data['runs_since_full'] = data.get('runs_since_full', 0) + 1
+            return data
+        self.data = update_json(self.path, change, {}, indent=2)
+
+
+def plan_test_selection(package_dir: str = SWIFT_PROJECT_DIR, state: Optional[ImpactState] = None,
+                        force_full: bool = False) -> Optional[Set[str]]:
+    """Suites to run, or None for the full suite (with the reason printed)"""
+    state = state or ImpactState()
+
+    if force_full or os.getenv('POTTER_FULL_TESTS'):
+        return None
+    if not state.last_green:
+        print("🧭 No previous green run recorded - running all tests")
+        return None
+    if state.full_run_due():
+        print("🧭 Periodic full run - running all tests")
+        return None
+
+    changed = changed_files(package_dir, state.last_green)
+    if changed is None:
+        print("🧭 Could not diff against the last green commit - running all tests")
+        return None
+
+    sources_prefix = SOURCES_DIR + '/'
+    tests_prefix = TESTS_DIR + '/'
+    changed_sources = [p[len(sources_prefix):] for p in changed if p.startswith(sources_prefix) and p.endswith('.swift')]
+    changed_tests = [p[len(tests_prefix):] for p in changed if p.startswith(tests_prefix) and p.endswith('.swift')]
+    other = [p for p in changed if not (p.startswith(sources_prefix) or p.startswith(tests_prefix)) or not p.endswith('.swift')]
+
+    # Package manifests, resources and shared fixtures can affect anything
+    if other or any(os.path.basename(p) in SHARED_TEST_FILES for p in changed_tests):
+        print(f"🧭 {len(other) or 1} non-source change(s) - running all tests")
+        return None
+
+    # The index only knows the current tree, so whatever depended on a
+    # deleted or renamed source cannot be traced
+    analyzer = ImpactAnalyzer(package_dir)
+    removed = [p for p in changed_sources if p not in analyzer.sources]
+    if removed:
+        print(f"🧭 {len(removed)} source file(s) deleted or renamed - running all tests")
+        return None
+
+    suites = analyzer.affected_suites(changed_sources, changed_tests)
+    print(f"🧭 {len(changed_sources)} source and {len(changed_tests)} test file(s) changed "
+          f"since {state.last_green[:8]} → {len(suites)} affected suite(s)")
+    return suites
+
+
+def current_commit(package_dir: str = SWIFT_PROJECT_DIR) -> Optional[str]:
+    output = _git(['rev-parse', 'HEAD'], package_dir)
+    return output.strip() if output else None
+
+
+def tested_commit(package_dir: str = SWIFT_PROJECT_DIR) -> Optional[str]:
+    """HEAD if the package matches it exactly, else None
+
+    Tests that ran against uncommitted edits say nothing about HEAD: if the
+    edits were reverted, recording HEAD as green would skip suites that never
+    ran against it.
+    """
+    status = _git(['status', '--porcelain', '--', '.'], package_dir)
+    if status is None or status.strip():
+        return None
+    return current_commit(package_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Show which Swift test suites a change affects')
+    parser.add_argument('--package-dir', default=SWIFT_PROJECT_DIR)
+    parser.add_argument('--since', help='Commit to diff against (default: last green run)')
+    args = parser.parse_args()
+
+    if args.since:
+        changed = changed_files(args.package_dir, args.since) or []
+        analyzer = ImpactAnalyzer(args.package_dir)
+        suites = analyzer.affected_suites(
+            [p.split('/', 1)[1] for p in changed if p.startswith(SOURCES_DIR + '/')],
+            [p.split('/', 1)[1] for p in changed if p.startswith(TESTS_DIR + '/')],
+        )
+    else:
+        suites = plan_test_selection(args.package_dir)
+
+    if suites is None:
+        print("all")
+    else:
+        for suite in sorted(suites):
+            print(suite)
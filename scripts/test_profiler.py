@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Swift test profiler
+Parses XCTest and swift-testing console output line by line as tests run,
+keeps a per-test history of durations and outcomes across runs, and reports
+where the test gate spends its time: the slowest tests, duration trends and
+tests that recently got slower. The same history balances test shards.
+"""
+
+import json
+import os
+import re
+import statistics
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+if __package__:
+    from .build_cache import get_cache_dir, update_json
+else:
+    from build_cache import get_cache_dir, update_json
+
+HISTORY_LENGTH = 20
+DEFAULT_TEST_DURATION = 0.5
+# A test regressed when its last run took this much longer than its usual time
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 0.2
+
+_XCTEST_CASE_RE = re.compile(
+    r"Test Case '-\[(?P<suite>\S+) (?P<name>\S+)\]' (?P<status>passed|failed|skipped) \((?P<seconds>[\d.]+) seconds\)"
+)
+_XCTEST_FAILURE_RE = re.compile(r"^(?P<location>\S+:\d+): error: -\[(?P<suite>\S+) (?P<name>\S+)\] : (?P<message>.*)$")
+# swift-testing prints a status symbol (SF Symbols on macOS) before each line
+_SWIFT_TESTING_CASE_RE = re.compile(
+    r'^\S+ Test (?P<name>"[^"]*"|\S+\(.*?\)) (?P<status>passed|failed) after (?P<seconds>[\d.]+) seconds'
+)
+_SWIFT_TESTING_SKIP_RE = re.compile(r'^\S+ Test (?P<name>"[^"]*"|\S+\(.*?\)) skipped')
+_SPARK_BARS = '▁▂▃▄▅▆▇█'
+
+
+class TestResult:
+    """Outcome of one test case"""
+
+    def __init__(self, test_id: str, status: str, seconds: float = 0.0, message: str = ''):
+        self.test_id = test_id
+        self.status = status
+        self.seconds = seconds
+        self.message = message
+
+    @property
+    def suite(self) -> str:
+        return self.test_id.split('/', 1)[0]
+
+    @property
+    def name(self) -> str:
+        return self.test_id.split('/', 1)[-1]
+
+    @property
+    def passed(self) -> bool:
+        return self.status in ('passed', 'skipped')
+
+    def __repr__(self):
+        return f"TestResult({self.test_id!r}, {self.status!r}, {self.seconds})"
+
+
+class TestOutputParser:
+    """Incremental parser for test console output
+
+    feed() takes one line at a time and returns the result it completes, if
+    any, so callers can report while the tests are still running. XCTest ids
+    are 'Suite/test'; swift-testing prints no suite, so its ids are the bare
+    function name (the runner takes the full ids from its xunit report).
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.failures = {}
+
+    def feed(self, line: str) -> Optional[TestResult]:
+        line = line.rstrip('\n')
+
+        failure = _XCTEST_FAILURE_RE.match(line)
+        if failure:
+            test_id = f"{failure['suite']}/{failure['name']}"
+            self.failures.setdefault(test_id, []).append(f"{failure['location']}: {failure['message']}")
+            return None
+
+        match = _XCTEST_CASE_RE.search(line)
+        if match:
+            return self._complete(f"{match['suite']}/{match['name']}", match['status'], float(match['seconds']))
+
+        match = _SWIFT_TESTING_CASE_RE.match(line)
+        if match:
+            return self._complete(match['name'].strip('"'), match['status'], float(match['seconds']))
+
+        match = _SWIFT_TESTING_SKIP_RE.match(line)
+        if match:
+            return self._complete(match['name'].strip('"'), 'skipped', 0.0)
+        return None
+
+    def feed_text(self, output: str) -> List[TestResult]:
+        return [r for r in map(self.feed, output.splitlines()) if r is not None]
+
+    def _complete(self, test_id: str, status: str, seconds: float) -> TestResult:
+        result = TestResult(test_id, status, seconds, '\n'.join(self.failures.get(test_id, ())))
+        self.results[test_id] = result
+        return result
+
+
+def parse_test_output(output: str) -> Tuple[Dict[str, TestResult], Dict[str, List[str]]]:
+    """Results and failure messages from complete console output"""
+    parser = TestOutputParser()
+    parser.feed_text(output)
+    return parser.results, parser.failures
+
+
+class TestHistory:
+    """Recent durations and outcomes of every test, kept across runs"""
+
+    def __init__(self, cache_dir: Optional[str] = None, length: int = HISTORY_LENGTH):
+        self.path = os.path.join(cache_dir or get_cache_dir('swift_tests'), 'history.json')
+        self.length = length
+        try:
+            with open(self.path) as f:
+                self.tests = json.load(f)
+        except (OSError, ValueError):
+            self.tests = {}
+
+    def record(self, results: Iterable[TestResult], timestamp: Optional[float] = None):
+        """Append one run's results and save"""
+        timestamp = time.time() if timestamp is None else timestamp
+        results = [result for result in results if result.status != 'skipped']
+
+        def append(tests):
+            for result in results:
+                runs = tests.setdefault(result.test_id, [])
+                runs.append([round(timestamp), round(result.seconds, 4), result.status])
+                del runs[:-self.length]
+            return tests
+
+        # Merged into what is on disk now, not the copy loaded at startup
+        self.tests = update_json(self.path, append, {}, sort_keys=True)
+
+    def durations(self, test_id: str) -> List[float]:
+        """Durations of passing runs, oldest first"""
+        return [seconds for _, seconds, status in self.tests.get(test_id, ()) if status == 'passed']
+
+    def typical_duration(self, test_id: str) -> Optional[float]:
+        """Median of recent passing runs; robust to the odd slow run"""
+        durations = self.durations(test_id)
+        return statistics.median(durations[-5:]) if durations else None
+
+    def expected_durations(self) -> Dict[str, float]:
+        """Expected duration per test id, for shard balancing"""
+        expected = {}
+        for test_id in self.tests:
+            typical = self.typical_duration(test_id)
+            if typical is not None:
+                expected[test_id] = typical
+        return expected
+
+    def slowest(self, count: int = 10) -> List[Tuple[str, float]]:
+        ranked = sorted(self.expected_durations().items(), key=lambda item: -item[1])
+        return ranked[:count]
+
+    def regressions(self, factor: float = REGRESSION_FACTOR,
+                    min_seconds: float = REGRESSION_MIN_SECONDS) -> List[Tuple[str, float, float]]:
+        """(test id, usual, latest) for tests whose last passing run was markedly slower"""
+        regressed = []
+        for test_id in self.tests:
+            durations = self.durations(test_id)
+            if len(durations) < 3:
+                continue
+            usual = statistics.median(durations[:-1][-5:])
+            latest = durations[-1]
+            if latest > usual * factor and latest - usual >= min_seconds:
+                regressed.append((test_id, usual, latest))
+        return sorted(regressed, key=lambda item: -(item[2] - item[1]))
+
+    def failure_rate(self, test_id: str) -> float:
+        runs = self.tests.get(test_id, ())
+        return sum(1 for run in runs if run[2] == 'failed') / len(runs) if runs else 0.0
+
+    def trend(self, test_id: str) -> str:
+        """Sparkline of recent passing durations"""
+        durations = self.durations(test_id)
+        if not durations:
+            return ''
+        low, high = min(durations), max(durations)
+        scale = (high - low) or 1.0
+        return ''.join(_SPARK_BARS[int((d - low) / scale * (len(_SPARK_BARS) - 1))] for d in durations)
+
+
+def print_report(history: TestHistory, count: int = 15):
+    """Slowest tests, their trends and recent regressions"""
+    expected = history.expected_durations()
+    if not expected:
+        print("📭 No test history yet - run the tests first")
+        return
+
+    total = sum(expected.values())
+    print(f"⏱️  {len(expected)} tests, {total:.1f}s of test time per full run")
+    print(f"\n🐢 Slowest {min(count, len(expected))} tests:")
+    for test_id, seconds in history.slowest(count):
+        flaky = history.failure_rate(test_id)
+        flaky_note = f"  ⚠️ failed {flaky:.0%} of recent runs" if flaky else ''
+        print(f"   {seconds:7.2f}s {seconds / total:5.1%}  {history.trend(test_id):<{history.length}}  {test_id}{flaky_note}")
+
+    regressions = history.regressions()
+    if regressions:
+        print(f"\n📈 {len(regressions)} tests slower than usual in their last run:")
+        for test_id, usual, latest in regressions[:count]:
+            print(f"   {usual:6.2f}s → {latest:6.2f}s  {test_id}")
+    else:
+        print("\n✅ No duration regressions")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Report Swift test durations and regressions')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest tests to show')
+    parser.add_argument('--parse', metavar='LOG',
+                        help="Record results from a saved test log ('-' for stdin) before reporting")
+    args = parser.parse_args()
+
+    history = TestHistory()
+    if args.parse:
+        log = sys.stdin if args.parse == '-' else open(args.parse)
+        with log:
+            output_parser = TestOutputParser()
+            for line in log:
+                output_parser.feed(line)
+        history.record(output_parser.results.values())
+        print(f"📝 Recorded {len(output_parser.results)} results")
+    print_report(history, args.top)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+UDIF (.dmg) container writer
+Converts a raw disk image (hdiutil UDTO/.cdr) into a compressed UDIF image.
+UDIF stores the disk as independently compressed chunks, so chunks are
+compressed on a process pool and written in order; the blkx table, koly
+trailer and CRC-32 checksums are generated here. A reader decompresses the
+result again so conversions can be verified on any platform; on macOS the
+result is also checked by hdiutil itself, since the reader shares this
+module's assumptions about the format.
+"""
+
+import bz2
+import hashlib
+import json
+import lzma
+import os
+import plistlib
+import shutil
+import struct
+import subprocess
+import sys
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+if __package__:
+    from .zip_writer import crc32_combine
+else:
+    from zip_writer import crc32_combine
+
+SECTOR_SIZE = 512
+CHUNK_SECTORS = 2048  # 1 MiB chunks, as hdiutil uses for UDZO
+MAX_IN_FLIGHT_FACTOR = 2
+
+KOLY_SIZE = 512
+KOLY_VERSION = 4
+KOLY_FLAG_FLATTENED = 0x1
+IMAGE_VARIANT_DEVICE = 1
+CHECKSUM_CRC32 = 2
+MISH_VERSION = 1
+MISH_HEADER_SIZE = 204
+MISH_CHUNK_SIZE = 40
+
+CHUNK_ZERO = 0x00000000
+CHUNK_RAW = 0x00000001
+CHUNK_ZLIB = 0x80000005
+CHUNK_BZIP2 = 0x80000006
+CHUNK_LZFSE = 0x80000007
+CHUNK_LZMA = 0x80000008
+CHUNK_COMMENT = 0x7FFFFFFE
+CHUNK_TERMINATOR = 0xFFFFFFFF
+
+# hdiutil format name -> chunk type
+FORMATS = {
+    'UDZO': CHUNK_ZLIB,
+    'UDBZ': CHUNK_BZIP2,
+    'ULFO': CHUNK_LZFSE,
+    'ULMO': CHUNK_LZMA,
+}
+
+
+def _lzfse():
+    try:
+        import lzfse
+    except ImportError:
+        raise ValueError("ULFO needs the 'pyliblzfse' package (import lzfse)")
+    return lzfse
+
+
+def compress_chunk(chunk_type: int, data: bytes) -> bytes:
+    """Compress one chunk with the codec for a UDIF chunk type"""
+    if chunk_type == CHUNK_ZLIB:
+        return zlib.compress(data, 9)
+    if chunk_type == CHUNK_BZIP2:
+        return bz2.compress(data, 9)
+    if chunk_type == CHUNK_LZMA:
+        return lzma.compress(data, format=lzma.FORMAT_XZ)
+    if chunk_type == CHUNK_LZFSE:
+        return _lzfse().compress(data)
+    raise ValueError(f"Unsupported UDIF chunk type: {chunk_type:#x}")
+
+
+def decompress_chunk(chunk_type: int, data: bytes, size: int) -> bytes:
+    """Inverse of compress_chunk; size is the expected uncompressed length"""
+    if chunk_type == CHUNK_ZERO:
+        return bytes(size)
+    if chunk_type == CHUNK_RAW:
+        return data
+    if chunk_type == CHUNK_ZLIB:
+        return zlib.decompress(data)
+    if chunk_type == CHUNK_BZIP2:
+        return bz2.decompress(data)
+    if chunk_type == CHUNK_LZMA:
+        return lzma.decompress(data)
+    if chunk_type == CHUNK_LZFSE:
+        return _lzfse().decompress(data)
+    raise ValueError(f"Unsupported UDIF chunk type: {chunk_type:#x}")
+
+
+# Chunks of a previous image that may be copied instead of recompressed;
+# set in each worker process by _init_worker
+_reuse_image = None
+_reuse_chunks = {}
+
+
+def _init_worker(reuse_image: Optional[str], reuse_chunks: Dict[str, list]):
+    global _reuse_image, _reuse_chunks
+    _reuse_image = reuse_image
+    _reuse_chunks = reuse_chunks
+
+
+def _encode_chunk(raw_path: str, offset: int, length: int, chunk_type: int) -> Tuple[int, bytes, int, int, str, bool]:
+    """Worker: read and compress one chunk
+
+    Returns (type, data, crc32, length, sha256, reused).
+    """
+    with open(raw_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+
+    crc = zlib.crc32(data)
+    digest = hashlib.sha256(data).hexdigest()
+    if not data.strip(b'\0'):
+        return CHUNK_ZERO, b'', crc, len(data), digest, False
+
+    previous = _reuse_chunks.get(digest)
+    if previous:
+        previous_type, previous_offset, previous_length = previous
+        with open(_reuse_image, 'rb') as f:
+            f.seek(previous_offset)
+            return previous_type, f.read(previous_length), crc, len(data), digest, True
+
+    compressed = compress_chunk(chunk_type, data)
+    if len(compressed) >= len(data):
+        return CHUNK_RAW, data, crc, len(data), digest, False
+    return chunk_type, compressed, crc, len(data), digest, False
+
+
+def load_chunk_index(index_path: str, image_format: str, chunk_sectors: int = CHUNK_SECTORS) -> Dict[str, list]:
+    """Chunk digests of a previous image, if it used the same format and chunk size"""
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('format') != image_format or index.get('chunk_sectors') != chunk_sectors:
+        return {}
+    return index.get('chunks', {})
+
+
+def _checksum(value: int) -> bytes:
+    """UDIF checksum field: type, bit size, then 32 words of which CRC-32 uses one"""
+    return struct.pack('>II', CHECKSUM_CRC32, 32) + struct.pack('>I', value) + bytes(124)
+
+
+def write_udif(raw_path: str, dmg_path: str, image_format: str = 'UDZO',
+               max_workers: Optional[int] = None, chunk_sectors: int = CHUNK_SECTORS,
+               partition_name: str = 'whole disk (Apple_HFS : 0)',
+               reuse: Optional[Tuple[str, str]] = None, index_path: Optional[str] = None,
+               raw_offset: int = 0, raw_size: Optional[int] = None) -> str:
+    """Convert a raw disk image into a compressed UDIF image
+
+    reuse is (previous image, its chunk index): chunks whose content is
+    unchanged are copied from that image instead of recompressed. index_path
+    records this image's chunk index for the next conversion. raw_offset and
+    raw_size select the disk inside a larger file, such as the data fork of a
+    read-write image (see UDIFImage.flat_data_offset).
+    """
+    if image_format not in FORMATS:
+        raise ValueError(f"Unknown DMG format '{image_format}' (expected one of {', '.join(FORMATS)})")
+    chunk_type = FORMATS[image_format]
+    if chunk_type == CHUNK_LZFSE:
+        _lzfse()
+
+    if raw_size is None:
+        raw_size = os.path.getsize(raw_path) - raw_offset
+    if raw_size % SECTOR_SIZE:
+        raise ValueError(f"{raw_path} is not a whole number of {SECTOR_SIZE}-byte sectors")
+    sector_count = raw_size // SECTOR_SIZE
+    chunk_bytes = chunk_sectors * SECTOR_SIZE
+    max_workers = max_workers or os.cpu_count() or 1
+
+    reuse_image, reuse_chunks = None, {}
+    if reuse and os.path.exists(reuse[0]):
+        reuse_image = reuse[0]
+        reuse_chunks = load_chunk_index(reuse[1], image_format, chunk_sectors)
+
+    chunks = []
+    chunk_index = {}
+    reused = 0
+    data_crc = 0
+    partition_crc = 0
+    data_length = 0
+    tmp_path = f"{dmg_path}.partial"
+
+    with open(tmp_path, 'wb') as out, ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker,
+            initargs=(reuse_image, reuse_chunks)) as executor:
+        pending = deque()
+
+        def write_next():
+            nonlocal data_crc, partition_crc, data_length, reused
+            offset, future = pending.popleft()
+            encoded_type, data, crc, length, digest, was_reused = future.result()
+            chunks.append((encoded_type, offset // SECTOR_SIZE, length // SECTOR_SIZE, data_length, len(data)))
+            if encoded_type != CHUNK_ZERO:
+                chunk_index[digest] = [encoded_type, data_length, len(data)]
+            reused += was_reused
+            out.write(data)
+            data_crc = zlib.crc32(data, data_crc)
+            partition_crc = crc32_combine(partition_crc, crc, length)
+            data_length += len(data)
+
+        # Keep a bounded window of chunks in flight; write them back in order
+        for offset in range(0, raw_size, chunk_bytes):
+            length = min(chunk_bytes, raw_size - offset)
+            pending.append((offset, executor.submit(_encode_chunk, raw_path, raw_offset + offset, length, chunk_type)))
+            if len(pending) >= max_workers * MAX_IN_FLIGHT_FACTOR:
+                write_next()
+        while pending:
+            write_next()
+
+        mish = struct.pack('>4sIQQQII', b'mish', MISH_VERSION, 0, sector_count, 0,
+                           chunk_sectors + 8, 0)
+        mish += bytes(24) + _checksum(partition_crc) + struct.pack('>I', len(chunks) + 1)
+        for encoded_type, sector, sectors, compressed_offset, compressed_length in chunks:
+            mish += struct.pack('>IIQQQQ', encoded_type, 0, sector, sectors, compressed_offset, compressed_length)
+        mish += struct.pack('>IIQQQQ', CHUNK_TERMINATOR, 0, sector_count, 0, data_length, 0)
+
+        resources = {
+            'resource-fork': {
+                'blkx': [{
+                    'Attributes': '0x0050',
+                    'CFName': partition_name,
+                    'Data': mish,
+                    'ID': '0',
+                    'Name': partition_name,
+                }],
+            },
+        }
+        xml = plistlib.dumps(resources, fmt=plistlib.FMT_XML)
+        xml_offset = data_length
+        out.write(xml)
+
+        # Master checksum: CRC-32 over each blkx checksum
+        master_crc = zlib.crc32(struct.pack('>I', partition_crc))
+
+        koly = struct.pack('>4sIIIQQQQQII16s', b'koly', KOLY_VERSION, KOLY_SIZE, KOLY_FLAG_FLATTENED,
+                           0, 0, data_length, 0, 0, 1, 1, uuid.uuid4().bytes)
+        koly += _checksum(data_crc)
+        koly += struct.pack('>QQ', xml_offset, len(xml)) + bytes(120)
+        koly += _checksum(master_crc)
+        koly += struct.pack('>IQIII', IMAGE_VARIANT_DEVICE, sector_count, 0, 0, 0)
+        out.write(koly)
+
+    os.replace(tmp_path, dmg_path)
+
+    if reuse_chunks:
+        print(f"♻️  Reused {reused} of {len(chunks)} compressed chunks")
+    if index_path:
+        with open(f"{index_path}.tmp", 'w') as f:
+            json.dump({'format': image_format, 'chunk_sectors': chunk_sectors, 'chunks': chunk_index}, f)
+        os.replace(f"{index_path}.tmp", index_path)
+    return dmg_path
+
+
+# ── Reader ────────────────────────────────────────────────────
+
+class UDIFImage:
+    """Parsed koly trailer and blkx tables of a UDIF image"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            f.seek(-KOLY_SIZE, os.SEEK_END)
+            koly = f.read(KOLY_SIZE)
+            if koly[:4] != b'koly':
+                raise ValueError(f"{path} has no UDIF koly trailer")
+
+            (_, self.version, _, self.flags, _, self.data_offset, self.data_length,
+             _, _, _, _, _) = struct.unpack_from('>4sIIIQQQQQII16s', koly, 0)
+            self.data_checksum = self._read_checksum(koly, 80)
+            self.xml_offset, xml_length = struct.unpack_from('>QQ', koly, 216)
+            self.master_checksum = self._read_checksum(koly, 352)
+            self.sector_count = struct.unpack_from('>Q', koly, 492)[0]
+
+            f.seek(self.xml_offset)
+            resources = plistlib.loads(f.read(xml_length))
+
+        self.partitions = [self._parse_mish(entry) for entry in resources['resource-fork']['blkx']]
+
+    @staticmethod
+    def _read_checksum(data: bytes, offset: int) -> int:
+        checksum_type, _bits, value = struct.unpack_from('>III', data, offset)
+        if checksum_type != CHECKSUM_CRC32:
+            raise ValueError(f"Unsupported UDIF checksum type {checksum_type}")
+        return value
+
+    def _parse_mish(self, entry: Dict) -> Dict:
+        data = entry['Data']
+        if data[:4] != b'mish':
+            raise ValueError(f"blkx entry '{entry.get('Name')}' has no mish table")
+        _, _, first_sector, sector_count, data_offset, _, _ = struct.unpack_from('>4sIQQQII', data, 0)
+        checksum = self._read_checksum(data, 64)
+        (chunk_count,) = struct.unpack_from('>I', data, MISH_HEADER_SIZE - 4)
+
+        chunks = []
+        for index in range(chunk_count):
+            chunk = struct.unpack_from('>IIQQQQ', data, MISH_HEADER_SIZE + index * MISH_CHUNK_SIZE)
+            if chunk[0] == CHUNK_TERMINATOR:
+                break
+            if chunk[0] != CHUNK_COMMENT:
+                chunks.append(chunk)
+
+        return {
+            'name': entry.get('Name', ''),
+            'first_sector': first_sector,
+            'sector_count': sector_count,
+            'data_offset': data_offset,
+            'checksum': checksum,
+            'chunks': chunks,
+        }
+
+    def flat_data_offset(self) -> Optional[int]:
+        """File offset of sector 0 if every sector is stored uncompressed and in
+        order (as in UDRW images), so the disk can be read in place"""
+        for partition in self.partitions:
+            for chunk_type, _, sector, sectors, offset, length in partition['chunks']:
+                if (chunk_type != CHUNK_RAW or length != sectors * SECTOR_SIZE
+                        or partition['data_offset'] + offset != (partition['first_sector'] + sector) * SECTOR_SIZE):
+                    return None
+        return self.data_offset
+
+    def iter_sectors(self):
+        """Yield (absolute sector, uncompressed bytes) for every chunk"""
+        with open(self.path, 'rb') as f:
+            for partition in self.partitions:
+                for chunk_type, _, sector, sectors, offset, length in partition['chunks']:
+                    f.seek(self.data_offset + partition['data_offset'] + offset)
+                    data = decompress_chunk(chunk_type, f.read(length), sectors * SECTOR_SIZE)
+                    if len(data) != sectors * SECTOR_SIZE:
+                        raise ValueError(f"Chunk at sector {sector} decompressed to the wrong size")
+                    yield partition['first_sector'] + sector, data
+
+    def verify(self) -> List[str]:
+        """Check data fork, partition and master checksums; returns problems found"""
+        problems = []
+
+        data_crc = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset)
+            remaining = self.data_length
+            while remaining:
+                block = f.read(min(remaining, 1024 * 1024))
+                if not block:
+                    problems.append("Data fork is truncated")
+                    break
+                data_crc = zlib.crc32(block, data_crc)
+                remaining -= len(block)
+        if data_crc != self.data_checksum:
+            problems.append("Data fork checksum mismatch")
+
+        master_crc = 0
+        for partition in self.partitions:
+            partition_crc = 0
+            with open(self.path, 'rb') as f:
+                for chunk_type, _, sector, sectors, offset, length in partition['chunks']:
+                    f.seek(self.data_offset + partition['data_offset'] + offset)
+                    data = decompress_chunk(chunk_type, f.read(length), sectors * SECTOR_SIZE)
+                    partition_crc = zlib.crc32(data, partition_crc)
+            if partition_crc != partition['checksum']:
+                problems.append(f"Checksum mismatch in {partition['name']}")
+            master_crc = zlib.crc32(struct.pack('>I', partition['checksum']), master_crc)
+
+        if master_crc != self.master_checksum:
+            problems.append("Master checksum mismatch")
+        return problems
+
+    def extract(self, raw_path: str):
+        """Write the uncompressed disk image"""
+        with open(raw_path, 'wb') as out:
+            out.truncate(self.sector_count * SECTOR_SIZE)
+            for sector, data in self.iter_sectors():
+                out.seek(sector * SECTOR_SIZE)
+                out.write(data)
+
+
+def verify_udif(dmg_path: str, raw_path: Optional[str] = None) -> bool:
+    """Verify a UDIF image's checksums and, optionally, that it matches raw_path"""
+    try:
+        image = UDIFImage(dmg_path)
+        problems = image.verify()
+
+        if raw_path and not problems:
+            if os.path.getsize(raw_path) != image.sector_count * SECTOR_SIZE:
+                problems.append("Sector count differs from the raw image")
+            else:
+                with open(raw_path, 'rb') as raw:
+                    for sector, data in image.iter_sectors():
+                        raw.seek(sector * SECTOR_SIZE)
+                        if raw.read(len(data)) != data:
+                            problems.append(f"Contents differ from the raw image at sector {sector}")
+                            break
+    except (OSError, ValueError, KeyError, EOFError, struct.error, zlib.error, lzma.LZMAError) as e:
+        problems = [str(e)]
+
+    for problem in problems:
+        print(f"❌ {dmg_path}: {problem}")
+    return not problems
+
+
+def hdiutil_verify(dmg_path: str) -> Optional[bool]:
+    """Check a DMG with hdiutil verify and imageinfo; None where hdiutil is unavailable"""
+    if sys.platform != 'darwin' or not shutil.which('hdiutil'):
+        return None
+
+    for command in ('verify', 'imageinfo'):
+        result = subprocess.run(['hdiutil', command, dmg_path], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ hdiutil {command} rejected {dmg_path}: {result.stderr.strip()}")
+            return False
+    return True
+
+
+def hdiutil_convert(source_path: str, dmg_path: str, image_format: str = 'UDZO') -> bool:
+    """Convert an image with hdiutil, the reference the native writer is checked against"""
+    result = subprocess.run(['hdiutil', 'convert', source_path, '-format', image_format,
+                             '-ov', '-o', dmg_path], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"❌ hdiutil convert failed: {result.stderr.strip()}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert raw disk images to UDIF and verify them')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Compress a raw image into a DMG')
+    convert_parser.add_argument('raw_path')
+    convert_parser.add_argument('dmg_path')
+    convert_parser.add_argument('--format', default='UDZO', choices=sorted(FORMATS))
+    convert_parser.add_argument('--workers', type=int)
+
+    verify_parser = subparsers.add_parser('verify', help='Check a DMG (against a raw image)')
+    verify_parser.add_argument('dmg_path')
+    verify_parser.add_argument('raw_path', nargs='?')
+    verify_parser.add_argument('--hdiutil', action='store_true', help='Also check the image with hdiutil (macOS)')
+
+    args = parser.parse_args()
+    if args.command == 'convert':
+        try:
+            write_udif(args.raw_path, args.dmg_path, args.format, args.workers)
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        print(f"✅ Created {args.dmg_path}")
+    elif verify_udif(args.dmg_path, args.raw_path) and not (args.hdiutil and hdiutil_verify(args.dmg_path) is False):
+        print(f"✅ {args.dmg_path} verified")
+    else:
+        raise SystemExit(1)
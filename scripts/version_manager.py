@@ -4,47 +4,25 @@ Potter Version Manager
 Provides deterministic version management with single source of truth
 """
 
-import os
-import plistlib
-import re
-from pathlib import Path
+if __package__:
+    from .bundle_metadata import SOURCE_INFO_PLIST, load_metadata, update_metadata
+else:
+    from bundle_metadata import SOURCE_INFO_PLIST, load_metadata, update_metadata
 
 # Single source of truth for version
-INFO_PLIST_PATH = "swift-potter/Sources/Resources/Info.plist"
+INFO_PLIST_PATH = SOURCE_INFO_PLIST
 
 def get_current_version():
     """Get current version from the authoritative source (Info.plist)"""
-    if not os.path.exists(INFO_PLIST_PATH):
-        raise FileNotFoundError(f"Info.plist not found at {INFO_PLIST_PATH}")
-    
-    with open(INFO_PLIST_PATH, 'rb') as f:
-        plist_data = plistlib.load(f)
-    
-    version = plist_data.get('CFBundleShortVersionString')
-    if not version:
-        raise ValueError("CFBundleShortVersionString not found in Info.plist")
-    
-    return version
+    return load_metadata(INFO_PLIST_PATH).version
 
 def set_version(new_version):
-    """Set version in the authoritative source (Info.plist)"""
-    if not re.match(r'^\d+\.\d+\.\d+$', new_version):
-        raise ValueError(f"Invalid version format: {new_version}. Must be X.Y.Z")
-    
-    if not os.path.exists(INFO_PLIST_PATH):
-        raise FileNotFoundError(f"Info.plist not found at {INFO_PLIST_PATH}")
-    
-    # Read current plist
-    with open(INFO_PLIST_PATH, 'rb') as f:
-        plist_data = plistlib.load(f)
-    
-    # Update version fields
-    plist_data['CFBundleVersion'] = new_version
-    plist_data['CFBundleShortVersionString'] = new_version
-    
-    # Write back
-    with open(INFO_PLIST_PATH, 'wb') as f:
-        plistlib.dump(plist_data, f)
+    """Set version in the authoritative source (Info.plist)
+
+    The update holds a lock and replaces the file atomically, so concurrent
+    release jobs cannot corrupt it.
+    """
+    update_metadata(lambda metadata: metadata.with_version(new_version), INFO_PLIST_PATH)
     
     print(f"✅ Updated version to {new_version} in {INFO_PLIST_PATH}")
     return new_version
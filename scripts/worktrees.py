@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Git worktree helpers for builds of other commits
+A worktree is a second checkout sharing the main repository's object store.
+Worktrees here are long-lived slots: moving one to another commit keeps its
+SwiftPM .build directory, so the next build there is incremental.
+"""
+
+import os
+import shutil
+import subprocess
+from typing import List, Optional
+
+# Untracked paths kept when a slot moves to another commit
+KEEP_ON_CHECKOUT = ('swift-potter/.build', 'swift-potter/.build-tests')
+
+
+def git(args: List[str], cwd: str) -> str:
+    result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def repo_root(path: str = '.') -> str:
+    return git(['rev-parse', '--show-toplevel'], path).strip()
+
+
+def resolve_commit(repo: str, rev: str) -> str:
+    """Full SHA for a revision (branch, tag, short SHA, HEAD~3, ...)"""
+    return git(['rev-parse', '--verify', f"{rev}^{{commit}}"], repo).strip()
+
+
+def commits_between(repo: str, good: str, bad: str) -> List[str]:
+    """Commits after good up to and including bad, oldest first (first-parent)"""
+    output = git(['rev-list', '--first-parent', '--reverse', f"{good}..{bad}"], repo)
+    return output.split()
+
+
+class Worktree:
+    """A reusable detached checkout at path"""
+
+    def __init__(self, repo: str, path: str):
+        self.repo = os.path.abspath(repo)
+        self.path = os.path.abspath(path)
+        self.commit = None
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, '.git'))
+
+    def checkout(self, commit: str, keep: Optional[List[str]] = None):
+        """Create the worktree at commit, or move an existing one there"""
+        if not self.exists():
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            # Forget worktrees whose directories were deleted by hand
+            git(['worktree', 'prune'], self.repo)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            git(['worktree', 'add', '--detach', '--force', self.path, commit], self.repo)
+        else:
+            git(['checkout', '--detach', '--force', commit], self.path)
+            exclude = []
+            for path in KEEP_ON_CHECKOUT if keep is None else keep:
+                exclude += ['-e', path]
+            # Previous outputs must not leak into the next build
+            git(['clean', '-ffdx'] + exclude, self.path)
+        self.commit = commit
+
+    def remove(self):
+        if self.exists():
+            git(['worktree', 'remove', '--force', self.path], self.repo)
+        elif os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+
+def build_environment(cache_root: str) -> dict:
+    """Environment for a build in a worktree, sharing the main checkout's caches"""
+    env = dict(os.environ)
+    env['POTTER_BUILD_CACHE'] = os.path.abspath(cache_root)
+    return env
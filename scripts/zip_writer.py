@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Streaming zip writer for notarization uploads
+Archives an app bundle the way 'ditto -c -k --keepParent' does (symlinks,
+permissions, extended attributes as AppleDouble '._' entries) while
+compressing on a worker pool. Files are split into chunks that are deflated
+independently and concatenated, so large files use every core too. Output
+only needs a write() method, so the archive can also go to a pipe ('-').
+"""
+
+import ctypes
+import ctypes.util
+import os
+import stat
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 6
+# Chunks in flight (compressed or being compressed) bound memory to about
+# CHUNK_SIZE * MAX_IN_FLIGHT_FACTOR * workers
+MAX_IN_FLIGHT_FACTOR = 2
+
+ZIP_VERSION = 20
+# Version made by: Unix (3), spec 2.1 - what ditto writes
+ZIP_VERSION_MADE_BY = (3 << 8) | 21
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+ZIP32_LIMIT = 0xFFFFFFFF
+
+APPLEDOUBLE_MAGIC = 0x00051607
+APPLEDOUBLE_VERSION = 0x00020000
+APPLEDOUBLE_FILLER = b'Mac OS X        '
+FINDER_INFO_XATTR = 'com.apple.FinderInfo'
+RESOURCE_FORK_XATTR = 'com.apple.ResourceFork'
+
+
+# ── Extended attributes ───────────────────────────────────────
+
+_libc = None
+
+
+def _darwin_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _libc.listxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int]
+        _libc.listxattr.restype = ctypes.c_ssize_t
+        _libc.getxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p,
+                                   ctypes.c_size_t, ctypes.c_uint32, ctypes.c_int]
+        _libc.getxattr.restype = ctypes.c_ssize_t
+    return _libc
+
+
+def read_xattrs(path: str) -> Dict[str, bytes]:
+    """Extended attributes of a path (not following symlinks)"""
+    if hasattr(os, 'listxattr'):
+        try:
+            return {name: os.getxattr(path, name, follow_symlinks=False)
+                    for name in os.listxattr(path, follow_symlinks=False)}
+        except OSError:
+            return {}
+
+    if sys.platform != 'darwin':
+        return {}
+
+    # Python exposes xattrs on Linux only; call libc directly on macOS
+    libc = _darwin_libc()
+    xattr_nofollow = 0x0001
+    encoded_path = os.fsencode(path)
+
+    size = libc.listxattr(encoded_path, None, 0, xattr_nofollow)
+    if size <= 0:
+        return {}
+    names = ctypes.create_string_buffer(size)
+    size = libc.listxattr(encoded_path, names, size, xattr_nofollow)
+    if size <= 0:
+        return {}
+
+    attrs = {}
+    for raw_name in names.raw[:size].split(b'\0'):
+        if not raw_name:
+            continue
+        value_size = libc.getxattr(encoded_path, raw_name, None, 0, 0, xattr_nofollow)
+        if value_size < 0:
+            continue
+        value = ctypes.create_string_buffer(max(value_size, 1))
+        value_size = libc.getxattr(encoded_path, raw_name, value, value_size, 0, xattr_nofollow)
+        if value_size >= 0:
+            attrs[raw_name.decode('utf-8')] = value.raw[:value_size]
+    return attrs
+
+
+def build_appledouble(xattrs: Dict[str, bytes]) -> bytes:
+    """Encode extended attributes as an AppleDouble file, as ditto does"""
+    finder_info = xattrs.get(FINDER_INFO_XATTR, b'').ljust(32, b'\0')[:32]
+    resource_fork = xattrs.get(RESOURCE_FORK_XATTR, b'')
+    attrs = [(name.encode('utf-8') + b'\0', value) for name, value in sorted(xattrs.items())
+             if name not in (FINDER_INFO_XATTR, RESOURCE_FORK_XATTR)]
+
+    header_size = 26 + 2 * 12
+    # Finder info, then 2 bytes of padding to 4-align the attribute header
+    attr_header_offset = header_size + 32 + 2
+    attr_header_size = 36
+
+    entries = b''
+    entry_offset = attr_header_offset + attr_header_size
+    for name, value in attrs:
+        entry_size = 11 + len(name)
+        entry_offset += (entry_size + 3) & ~3
+    data_start = entry_offset
+
+    data = b''
+    for name, value in attrs:
+        entry = struct.pack('>IIHB', data_start + len(data), len(value), 0, len(name)) + name
+        entries += entry.ljust((len(entry) + 3) & ~3, b'\0')
+        data += value
+
+    resource_offset = data_start + len(data)
+    total_size = resource_offset + len(resource_fork)
+
+    attr_header = struct.pack('>4sIIIIIIIHH', b'ATTR', 0, total_size, data_start, len(data),
+                              0, 0, 0, 0, len(attrs))
+
+    header = struct.pack('>II16sH', APPLEDOUBLE_MAGIC, APPLEDOUBLE_VERSION, APPLEDOUBLE_FILLER, 2)
+    header += struct.pack('>III', 9, header_size, resource_offset - header_size)
+    header += struct.pack('>III', 2, resource_offset, len(resource_fork))
+
+    return header + finder_info + b'\0\0' + attr_header + entries + data + resource_fork
+
+
+# ── CRC-32 combination ────────────────────────────────────────
+
+def _gf2_times(matrix: List[int], vector: int) -> int:
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def _gf2_compose(a: List[int], b: List[int]) -> List[int]:
+    return [_gf2_times(a, column) for column in b]
+
+
+@lru_cache(maxsize=16)
+def _zeros_operator(length: int) -> Tuple[int, ...]:
+    """Matrix that advances a CRC-32 register over `length` zero bytes"""
+    # Operator for a single zero bit
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    # One zero byte is eight zero bits
+    operator = odd
+    for _ in range(3):
+        operator = _gf2_compose(operator, operator)
+
+    result = [1 << n for n in range(32)]
+    while length:
+        if length & 1:
+            result = _gf2_compose(operator, result)
+        length >>= 1
+        if length:
+            operator = _gf2_compose(operator, operator)
+    return tuple(result)
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """CRC-32 of A+B from the CRCs of A and B and the length of B (zlib's crc32_combine)"""
+    if length2 == 0:
+        return crc1
+    return _gf2_times(list(_zeros_operator(length2)), crc1) ^ crc2
+
+
+# ── Archive entries ───────────────────────────────────────────
+
+class ZipEntry:
+    """One member of the archive"""
+
+    def __init__(self, name: str, kind: str, mode: int, mtime: float,
+                 path: Optional[str] = None, data: Optional[bytes] = None, size: int = 0):
+        self.name = name
+        self.kind = kind
+        self.mode = mode
+        self.mtime = mtime
+        self.path = path
+        self.data = data
+        self.size = size
+
+    @property
+    def external_attr(self) -> int:
+        type_bits = {'dir': stat.S_IFDIR, 'symlink': stat.S_IFLNK, 'file': stat.S_IFREG}[self.kind]
+        attr = (type_bits | self.mode) << 16
+        if self.kind == 'dir':
+            attr |= 0x10  # MS-DOS directory bit
+        return attr
+
+
+def iter_entries(source: str, keep_parent: bool = True) -> Iterator[ZipEntry]:
+    """Walk a file or bundle in archive order, interleaving AppleDouble entries"""
+    source = os.path.abspath(source)
+    base = os.path.dirname(source) if keep_parent else source
+
+    def entries_for(path: str) -> Iterator[ZipEntry]:
+        st = os.lstat(path)
+        name = os.path.relpath(path, base).replace(os.sep, '/')
+        mode = stat.S_IMODE(st.st_mode)
+
+        if stat.S_ISLNK(st.st_mode):
+            yield ZipEntry(name, 'symlink', mode, st.st_mtime, data=os.fsencode(os.readlink(path)))
+            return
+        if stat.S_ISDIR(st.st_mode):
+            if name != '.':
+                yield ZipEntry(name + '/', 'dir', mode, st.st_mtime)
+        else:
+            yield ZipEntry(name, 'file', mode, st.st_mtime, path=path, size=st.st_size)
+
+        xattrs = read_xattrs(path)
+        if xattrs and name != '.':
+            parent, _, leaf = name.rpartition('/')
+            double_name = f"{parent}/._{leaf}" if parent else f"._{leaf}"
+            yield ZipEntry(double_name, 'file', 0o644, st.st_mtime, data=build_appledouble(xattrs))
+
+    if not os.path.isdir(source) or os.path.islink(source):
+        yield from entries_for(source)
+        return
+
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        yield from entries_for(dirpath)
+        for filename in sorted(filenames):
+            yield from entries_for(os.path.join(dirpath, filename))
+        # Symlinked directories are archived as links, not followed
+        for dirname in [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            yield from entries_for(os.path.join(dirpath, dirname))
+            dirnames.remove(dirname)
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # DOS dates start in 1980
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def _compress_chunk(path: Optional[str], data: Optional[bytes], offset: int, length: int,
+                    last: bool, level: int) -> Tuple[bytes, int, int]:
+    """Deflate one chunk; returns (compressed, crc32, uncompressed length)"""
+    if data is None:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    # A sync flush ends on a byte boundary without the final-block bit, so
+    # independently compressed chunks concatenate into one valid stream
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.crc32(data), len(data)
+
+
+class _CountingWriter:
+    """Tracks the output offset so the target never needs tell() or seek()"""
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.offset = 0
+
+    def write(self, data: bytes):
+        self.output.write(data)
+        self.offset += len(data)
+
+
+class StreamingZipWriter:
+    """Writes a zip archive of a directory tree to any writable stream"""
+
+    def __init__(self, output: BinaryIO, max_workers: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE, level: int = COMPRESSION_LEVEL):
+        self.out = _CountingWriter(output)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.level = level
+        self.central_directory = []
+        # Header offset, crc, compressed and uncompressed size of the file being streamed
+        self._streaming = None
+
+    def write_tree(self, source: str, keep_parent: bool = True):
+        """Archive source (like ditto --keepParent) and finish the archive"""
+        max_in_flight = self.max_workers * MAX_IN_FLIGHT_FACTOR
+        window = deque()
+        in_flight = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for entry, chunk, first, last in self._chunks(iter_entries(source, keep_parent)):
+                future = executor.submit(_compress_chunk, *chunk) if chunk else None
+                window.append((entry, future, first, last))
+                in_flight += future is not None
+                # Chunks are only submitted as earlier ones are written, in
+                # order, so large files never queue more than the window
+                while in_flight > max_in_flight:
+                    in_flight -= window[0][1] is not None
+                    self._write_chunk(*window.popleft())
+
+            while window:
+                self._write_chunk(*window.popleft())
+
+        self._write_central_directory()
+
+    def _chunks(self, entries: Iterator[ZipEntry]) -> Iterator[Tuple[ZipEntry, Optional[tuple], bool, bool]]:
+        """(entry, _compress_chunk args or None, first, last) for each chunk of each entry"""
+        for entry in entries:
+            if entry.kind != 'file':
+                yield entry, None, True, True
+            elif entry.data is not None:
+                yield entry, (None, entry.data, 0, len(entry.data), True, self.level), True, True
+            else:
+                offsets = range(0, max(entry.size, 1), self.chunk_size)
+                for index, offset in enumerate(offsets):
+                    last = index == len(offsets) - 1
+                    yield entry, (entry.path, None, offset, self.chunk_size, last, self.level), index == 0, last
+
+    def _write_chunk(self, entry: ZipEntry, future, first: bool, last: bool):
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        name = entry.name.encode('utf-8')
+        flags = FLAG_UTF8
+
+        if entry.kind != 'file':
+            header_offset = self.out.offset
+            data = entry.data or b''
+            crc, size = zlib.crc32(data), len(data)
+            self._write_local_header(name, flags, METHOD_STORED, dos_time, dos_date, crc, size, size)
+            self.out.write(data)
+            self._add_central_entry(entry, name, flags, METHOD_STORED, dos_time, dos_date,
+                                    crc, size, size, header_offset)
+            return
+
+        compressed, chunk_crc, chunk_size = future.result()
+        if first and last:
+            # Everything is known up front; no data descriptor needed
+            header_offset = self.out.offset
+            self._write_local_header(name, flags, METHOD_DEFLATED, dos_time, dos_date,
+                                     chunk_crc, len(compressed), chunk_size)
+            self.out.write(compressed)
+            self._add_central_entry(entry, name, flags, METHOD_DEFLATED, dos_time, dos_date,
+                                    chunk_crc, len(compressed), chunk_size, header_offset)
+            return
+
+        # Sizes are only known after the last chunk; stream and trail a descriptor
+        flags |= FLAG_DATA_DESCRIPTOR
+        if first:
+            self._streaming = [self.out.offset, 0, 0, 0]
+            self._write_local_header(name, flags, METHOD_DEFLATED, dos_time, dos_date, 0, 0, 0)
+        self.out.write(compressed)
+        state = self._streaming
+        state[1] = crc32_combine(state[1], chunk_crc, chunk_size)
+        state[2] += len(compressed)
+        state[3] += chunk_size
+
+        if last:
+            header_offset, crc, compressed_size, size = state
+            self._check_zip32(entry.name, compressed_size, size)
+            self.out.write(struct.pack('<IIII', 0x08074B50, crc, compressed_size, size))
+            self._add_central_entry(entry, name, flags, METHOD_DEFLATED, dos_time, dos_date,
+                                    crc, compressed_size, size, header_offset)
+
+    def _add_central_entry(self, entry: ZipEntry, name: bytes, flags: int, method: int, dos_time: int,
+                           dos_date: int, crc: int, compressed_size: int, size: int, header_offset: int):
+        self._check_zip32(entry.name, header_offset, compressed_size, size)
+        self.central_directory.append(
+            (name, flags, method, dos_time, dos_date, crc, compressed_size, size,
+             entry.external_attr, header_offset, self._extra(entry))
+        )
+
+    def _write_local_header(self, name: bytes, flags: int, method: int, dos_time: int,
+                            dos_date: int, crc: int, compressed_size: int, size: int):
+        self.out.write(struct.pack('<IHHHHHIIIHH', 0x04034B50, ZIP_VERSION, flags, method,
+                                   dos_time, dos_date, crc, compressed_size, size, len(name), 0))
+        self.out.write(name)
+
+    def _extra(self, entry: ZipEntry) -> bytes:
+        # Extended timestamp keeps full-resolution mtime like ditto
+        return struct.pack('<HHBI', 0x5455, 5, 1, int(entry.mtime) & 0xFFFFFFFF)
+
+    def _write_central_directory(self):
+        start = self.out.offset
+        for (name, flags, method, dos_time, dos_date, crc, compressed_size, size,
+             external_attr, header_offset, extra) in self.central_directory:
+            self.out.write(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014B50, ZIP_VERSION_MADE_BY,
+                                       ZIP_VERSION, flags, method, dos_time, dos_date, crc,
+                                       compressed_size, size, len(name), len(extra), 0, 0, 0,
+                                       external_attr, header_offset))
+            self.out.write(name)
+            self.out.write(extra)
+
+        size = self.out.offset - start
+        count = len(self.central_directory)
+        if count > 0xFFFF:
+            raise ValueError("Too many entries for a zip archive without Zip64")
+        self._check_zip32('central directory', start, size)
+        self.out.write(struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, count, count, size, start, 0))
+
+    @staticmethod
+    def _check_zip32(name: str, *values: int):
+        if any(value > ZIP32_LIMIT for value in values):
+            raise ValueError(f"{name} exceeds 4 GiB; Zip64 is not supported")
+
+
+def create_zip(source: str, zip_path: str, max_workers: Optional[int] = None,
+               keep_parent: bool = True) -> str:
+    """Zip a bundle to a file, equivalent to 'ditto -c -k --keepParent'"""
+    tmp_path = f"{zip_path}.partial"
+    with open(tmp_path, 'wb') as f:
+        StreamingZipWriter(f, max_workers=max_workers).write_tree(source, keep_parent)
+    os.replace(tmp_path, zip_path)
+    return zip_path
+
+
+def stream_zip(source: str, output: BinaryIO, max_workers: Optional[int] = None,
+               keep_parent: bool = True):
+    """Zip a bundle straight into a stream such as an upload body or pipe"""
+    StreamingZipWriter(output, max_workers=max_workers).write_tree(source, keep_parent)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Zip a bundle like ditto -c -k --keepParent')
+    parser.add_argument('source', help='File or bundle to archive')
+    parser.add_argument('zip_path', help="Output zip ('-' for stdout)")
+    parser.add_argument('--workers', type=int, help='Compression workers (default: all cores)')
+    args = parser.parse_args()
+
+    if args.zip_path == '-':
+        stream_zip(args.source, sys.stdout.buffer, args.workers)
+    else:
+        create_zip(args.source, args.zip_path, args.workers)
+        print(f"✅ Created {args.zip_path}")
@@ -0,0 +1,138 @@
+"""Size attribution on synthesized thin and universal Mach-O binaries"""
+
+import struct
+
+import pytest
+
+from scripts import binary_size
+from scripts.binary_size import (FAT_MAGIC, LC_SEGMENT_64, LC_SYMTAB, MH_MAGIC_64, S_ATTR_PURE_INSTRUCTIONS,
+                                 S_ZEROFILL, MachOBinary, analyze, diff_reports, load_report, save_report,
+                                 split_symbol)
+
+CPU_ARM64 = 0x0100000c
+CPU_X86_64 = 0x01000007
+
+TEXT = 0x100000000
+DATA = 0x100100000
+BSS = 0x100200000
+
+# (name, section number, address); sizes run to the next symbol or section end
+SYMBOLS = [
+    ('_$s6Potter16PromptEditDialogV4bodyQrvg', 1, TEXT),
+    ('_$s6Potter16PromptEditDialogV5titleSSvg', 1, TEXT + 0x300),
+    ('_$s6Potter13SettingsStoreC6sharedACvpZ', 1, TEXT + 0x400),
+    ('_main', 1, TEXT + 0x500),
+    ('_$s6Potter13SettingsStoreCMf', 2, DATA),
+    ('_OBJC_CLASS_$_AppDelegate', 2, DATA + 0x80),
+    ('_$s6Potter5CacheV7storageSDySSSiGvpZ', 3, BSS),
+]
+
+
+def build_macho(cpu=CPU_ARM64, text_size=0x600):
+    """A minimal MH_EXECUTE with __text, __data and __bss plus a symbol table"""
+    sections = [
+        (b'__text', b'__TEXT', TEXT, text_size, S_ATTR_PURE_INSTRUCTIONS),
+        (b'__data', b'__DATA', DATA, 0x100, 0),
+        (b'__bss', b'__DATA', BSS, 0x1000, S_ZEROFILL),
+    ]
+    segment = struct.pack('<II16sQQQQiiII', LC_SEGMENT_64, 72 + 80 * len(sections), b'',
+                          0, 0, 0, 0, 0, 0, len(sections), 0)
+    for sectname, segname, address, size, flags in sections:
+        segment += struct.pack('<16s16sQQIIIIIIII', sectname, segname, address, size, 0, 0, 0, 0, flags, 0, 0, 0)
+
+    strings = b'\0'
+    symbols = b''
+    for name, section, address in SYMBOLS:
+        symbols += struct.pack('<IBBHQ', len(strings), 0x0f, section, 0, address)
+        strings += name.encode() + b'\0'
+    # A debugging (stab) entry must be ignored
+    symbols += struct.pack('<IBBHQ', 0, 0x64, 1, 0, TEXT)
+
+    commands_size = len(segment) + 24
+    symoff = 32 + commands_size
+    stroff = symoff + len(symbols)
+    symtab = struct.pack('<IIIIII', LC_SYMTAB, 24, symoff, len(SYMBOLS) + 1, stroff, len(strings))
+    header = struct.pack('<IiiIIIII', MH_MAGIC_64, cpu, 0, 2, 2, commands_size, 0, 0)
+    return header + segment + symtab + symbols + strings
+
+
+def build_fat(slices):
+    """A universal binary of (cpu, thin binary) slices, each aligned to 4 KB"""
+    data = struct.pack('>II', FAT_MAGIC, len(slices))
+    offset = 0x1000
+    body = b''
+    for cpu, thin in slices:
+        data += struct.pack('>iiIII', cpu, 0, offset + len(body), len(thin), 12)
+        body += thin + bytes(-len(thin) % 0x1000)
+    return data.ljust(offset, b'\0') + body
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('_$s6Potter16PromptEditDialogV4bodyQrvg', ('Potter', 'PromptEditDialog')),
+    ('_$s6Potter11LLMProviderO5ModelV4nameSSvg', ('Potter', 'LLMProvider.Model')),
+    ('_$s6Potter12PromptEditorV0bC5StateV4bodyQrvg', ('Potter', 'PromptEditor.PromptEditorState')),
+    ('_$sSS6PotterE7trimmedSSyF', ('Potter', 'String')),
+    ('_$sSa10FoundationE4joinSSyF', ('Foundation', 'Array')),
+    ('_$sSo8NSWindowC6PotterE5styleyyF', ('Potter', 'NSWindow')),
+    ('_$s0014Pottercaf_gma5ModelV', ('(swift)', '')),
+    ('_OBJC_CLASS_$_AppDelegate', ('(objc)', 'AppDelegate')),
+    ('-[AppDelegate applicationDidFinishLaunching:]', ('(objc)', 'AppDelegate')),
+    ('_main', ('(c)', '')),
+])
+def test_split_symbol(name, expected):
+    assert split_symbol(name) == expected
+
+
+def test_thin_binary_sections_and_symbol_sizes():
+    binary = MachOBinary(build_macho())
+    assert binary.arch == 'arm64'
+    assert [s.full_name for s in binary.sections] == ['__TEXT,__text', '__DATA,__data', '__DATA,__bss']
+    sizes = {s.name: s.size for s in binary.symbols}
+    assert sizes['_$s6Potter16PromptEditDialogV4bodyQrvg'] == 0x300
+    assert sizes['_main'] == 0x100
+    assert sizes['_OBJC_CLASS_$_AppDelegate'] == 0x80
+    assert len(binary.symbols) == len(SYMBOLS)
+
+
+def test_fat_binary_slice_selection():
+    data = build_fat([(CPU_X86_64, build_macho(CPU_X86_64, 0x800)), (CPU_ARM64, build_macho())])
+    assert MachOBinary(data).arch == 'arm64'
+    x86 = MachOBinary(data, 'x86_64')
+    assert x86.arch == 'x86_64' and x86.sections[0].size == 0x800
+    with pytest.raises(ValueError):
+        MachOBinary(build_fat([(CPU_X86_64, build_macho(CPU_X86_64))]), 'arm64')
+
+
+def test_non_macho_is_rejected():
+    with pytest.raises(ValueError):
+        MachOBinary(b'\x7fELF' + bytes(64))
+
+
+def test_analyze_attributes_types_and_skips_zerofill():
+    report = analyze(MachOBinary(build_macho()))
+    assert report['total'] == 0x600 + 0x100
+    assert report['types']['Potter.PromptEditDialog'] == {'text': 0x400, 'data': 0}
+    assert report['types']['Potter.SettingsStore'] == {'text': 0x100, 'data': 0x80}
+    assert 'Potter.Cache' not in report['types']
+    assert report['modules']['(c)'] == {'text': 0x100, 'data': 0}
+    assert report['unattributed'] == 0
+
+
+def test_diff_reports_orders_by_largest_change():
+    old = analyze(MachOBinary(build_macho()))
+    new = analyze(MachOBinary(build_macho(text_size=0x900)))
+    assert diff_reports(old, new) == []
+    assert diff_reports(old, new, 'modules') == [('(c)', 0x100, 0x400)]
+
+    grown = dict(new, types=dict(new['types'], **{'Potter.NewView': {'text': 0x10, 'data': 0}}))
+    assert diff_reports(old, grown)[0] == ('Potter.NewView', 0, 0x10)
+
+
+def test_saved_reports_outlive_the_build_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(binary_size, 'REPORTS_DIR', str(tmp_path / 'releases'))
+    monkeypatch.setenv('POTTER_BUILD_CACHE', str(tmp_path / 'cache'))
+    report = analyze(MachOBinary(build_macho()))
+
+    path = save_report(report, '2.1.0')
+    assert path.startswith(str(tmp_path / 'releases'))
+    assert load_report('2.1.0') == report
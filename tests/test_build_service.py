@@ -0,0 +1,121 @@
+"""Coalescing and priority in the build service queue, with builds stubbed out"""
+
+import os
+import subprocess
+
+import pytest
+
+from scripts.build_service import BuildQueue, build_key
+
+
+def _git(repo, *args):
+    return subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=repo,
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / 'potter'
+    repo.mkdir()
+    _git(repo, 'init', '-q')
+    for version in ('2.1.0', '2.2.0'):
+        (repo / 'VERSION').write_text(version)
+        _git(repo, 'add', 'VERSION')
+        _git(repo, 'commit', '-qm', version)
+        _git(repo, 'tag', f"v{version}")
+    return repo
+
+
+@pytest.fixture
+def queue(tmp_path, repo, monkeypatch):
+    monkeypatch.setenv('POTTER_BUILD_CACHE', str(tmp_path / 'cache'))
+    return BuildQueue(str(repo), slots=1, cache_dir=str(tmp_path / 'service'))
+
+
+def stub_builds(queue, tmp_path, fail=False):
+    """Replace the worktree build with one that writes a fake DMG per key"""
+    built = []
+
+    def build(worktree, job):
+        built.append(job.key)
+        if fail:
+            raise RuntimeError('build exited with 1')
+        artifact = tmp_path / 'artifacts' / job.key / 'Potter.dmg'
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        artifact.write_bytes(job.commit.encode())
+        return [str(artifact)]
+
+    queue._build = build
+    return built
+
+
+def test_identical_requests_share_one_job(queue):
+    first = queue.submit('HEAD', {'unsigned': True})
+    second = queue.submit('v2.2.0', {'unsigned': True, 'dmg': True})
+    assert second is first and first.requests == 2
+    assert first.key == build_key(_git(queue.repo, 'rev-parse', 'HEAD'), {'unsigned': True})
+
+    assert queue.submit('HEAD', {'unsigned': True, 'dmg': False}) is not first
+    assert queue.submit('v2.1.0', {'unsigned': True}) is not first
+
+
+def test_unknown_options_and_priorities_are_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit('HEAD', {'notarize': True})
+    with pytest.raises(ValueError):
+        queue.submit('HEAD', {}, priority='urgent')
+
+
+def test_release_builds_run_before_dev_builds(queue):
+    dev = queue.submit('v2.1.0', {'unsigned': True})
+    release = queue.submit('v2.2.0', {})
+    assert (dev.priority, release.priority) == ('dev', 'release')
+
+    assert queue._next_job() is release
+    assert queue._next_job() is dev
+    assert dev.status == 'running'
+
+
+def test_joining_with_higher_priority_moves_a_job_up(queue):
+    older = queue.submit('v2.1.0', {'unsigned': True})
+    newer = queue.submit('v2.2.0', {'unsigned': True})
+    assert queue.submit('v2.2.0', {'unsigned': True}, priority='release') is newer
+    assert newer.priority == 'release'
+
+    assert queue._next_job() is newer
+    assert queue._next_job() is older
+    # The stale dev entry for the promoted job is skipped, not run twice
+    assert len(queue._heap) == 1
+    queue._condition.wait = lambda: pytest.fail('queue should be drained')
+    with pytest.raises(pytest.fail.Exception):
+        queue._next_job()
+
+
+def test_finished_builds_are_reused(tmp_path, queue):
+    built = stub_builds(queue, tmp_path)
+    queue.start()
+    job = queue.submit('HEAD', {})
+    assert job.done.wait(10)
+    assert job.status == 'succeeded' and os.path.exists(job.artifacts[0])
+
+    assert queue.submit('HEAD', {}) is job and job.requests == 2
+
+    # A restarted service serves the stored result without building
+    restarted = BuildQueue(queue.repo, slots=1, cache_dir=queue.cache_dir)
+    stub_builds(restarted, tmp_path)
+    stored = restarted.submit('HEAD', {})
+    assert stored.status == 'succeeded' and stored.artifacts == job.artifacts
+    assert built == [job.key]
+
+
+def test_failed_builds_are_retried(tmp_path, queue):
+    built = stub_builds(queue, tmp_path, fail=True)
+    queue.start()
+    job = queue.submit('HEAD', {})
+    assert job.done.wait(10)
+    assert job.status == 'failed' and 'exited with 1' in job.error
+
+    retry = queue.submit('HEAD', {})
+    assert retry is not job
+    assert retry.done.wait(10)
+    assert built == [job.key, job.key]
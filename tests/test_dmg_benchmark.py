@@ -0,0 +1,66 @@
+"""Choosing a DMG format per build profile from saved benchmark results"""
+
+import pytest
+
+from scripts.dmg_benchmark import DEFAULT_FORMAT, select_dmg_format
+
+
+def _result(image_format, size, compress_seconds, decompress_mb_per_s):
+    return {'format': image_format, 'size': size, 'compress_seconds': compress_seconds,
+            'decompress_mb_per_s': decompress_mb_per_s}
+
+
+@pytest.fixture
+def benchmark():
+    return {
+        'platform': 'darwin',
+        'results': [
+            _result('UDZO', 100, 2.0, 400),
+            _result('UDBZ', 90, 6.0, 150),
+            _result('ULFO', 80, 1.5, 900),
+            # Smallest, but far too slow to mount
+            _result('ULMO', 70, 9.0, 40),
+        ],
+    }
+
+
+def test_release_takes_smallest_fast_enough_format(benchmark):
+    assert select_dmg_format('release', benchmark) == 'ULFO'
+
+
+def test_dev_takes_fastest_to_build(benchmark):
+    assert select_dmg_format('dev', benchmark) == 'ULFO'
+    benchmark['results'][0]['compress_seconds'] = 0.2
+    assert select_dmg_format('dev', benchmark) == 'UDZO'
+
+
+def test_without_baseline_smallest_wins(benchmark):
+    benchmark['results'] = [r for r in benchmark['results'] if r['format'] != 'UDZO']
+    assert select_dmg_format('release', benchmark) == 'ULMO'
+
+
+def test_failed_and_unknown_formats_are_ignored(benchmark):
+    benchmark['results'] = [
+        {'format': 'ULFO', 'error': 'lzfse unavailable'},
+        _result('UDXX', 1, 0.1, 5000),
+        _result('UDZO', 100, 2.0, 400),
+    ]
+    assert select_dmg_format('release', benchmark) == 'UDZO'
+    assert select_dmg_format('dev', benchmark) == 'UDZO'
+
+
+@pytest.mark.parametrize('platform', ['linux', None])
+def test_results_from_other_platforms_are_not_used(benchmark, platform):
+    benchmark['platform'] = platform
+    assert select_dmg_format('release', benchmark) == DEFAULT_FORMAT
+    assert select_dmg_format('dev', benchmark) == DEFAULT_FORMAT
+
+
+def test_local_results_can_be_inspected_off_macos(benchmark):
+    benchmark['platform'] = 'linux'
+    assert select_dmg_format('release', benchmark, platform='linux') == 'ULFO'
+
+
+def test_no_saved_results_fall_back(tmp_path, monkeypatch):
+    monkeypatch.setenv('POTTER_BUILD_CACHE', str(tmp_path))
+    assert select_dmg_format('release') == DEFAULT_FORMAT
@@ -0,0 +1,77 @@
+"""Patching and exporting the kept read-write DMG without hdiutil"""
+
+import os
+
+import pytest
+
+from scripts.build_manifest import create_manifest, diff_manifests
+from scripts.dmg_incremental import REBUILD_AFTER_UPDATES, IncrementalDMG, _remove_entry, apply_manifest_diff
+from scripts.udif_writer import SECTOR_SIZE, UDIFImage, verify_udif, write_udif
+
+
+@pytest.fixture
+def kept(tmp_path):
+    return IncrementalDMG('Potter', cache_dir=str(tmp_path / 'kept'))
+
+
+def test_removed_files_are_zeroed_first(tmp_path):
+    # A hard link still sees the blocks the removed name pointed at
+    path, link = tmp_path / 'old', tmp_path / 'link'
+    path.write_bytes(b'secret' * 1000)
+    os.link(path, link)
+
+    _remove_entry(str(path))
+    assert not path.exists()
+    assert link.read_bytes() == bytes(6000)
+
+
+def test_manifest_diff_is_applied(tmp_path):
+    old, new = tmp_path / 'old', tmp_path / 'new'
+    for root in (old, new):
+        (root / 'Contents' / 'MacOS').mkdir(parents=True)
+        (root / 'Contents' / 'Info.plist').write_text('same')
+    (old / 'Contents' / 'MacOS' / 'Potter').write_bytes(b'v1')
+    (old / 'Contents' / 'Removed').mkdir()
+    (old / 'Contents' / 'Removed' / 'file').write_bytes(b'gone')
+    (new / 'Contents' / 'MacOS' / 'Potter').write_bytes(b'v2')
+    (new / 'Contents' / 'Added').write_bytes(b'new')
+
+    manifest = create_manifest(str(new))
+    apply_manifest_diff(str(new), str(old), diff_manifests(create_manifest(str(old)), manifest), manifest)
+    assert diff_manifests(create_manifest(str(old)), manifest) == {'changed': [], 'added': [], 'removed': []}
+
+
+def test_export_reads_flat_image_in_place(tmp_path, kept):
+    # Incompressible sectors are stored raw and in order, like a UDRW image
+    raw = tmp_path / 'disk.raw'
+    raw.write_bytes(os.urandom(64 * SECTOR_SIZE))
+    os.makedirs(kept.cache_dir)
+    write_udif(str(raw), kept.rw_image, chunk_sectors=8)
+    assert UDIFImage(kept.rw_image).flat_data_offset() == 0
+
+    dmg, raw_path = tmp_path / 'Potter.dmg', tmp_path / 'temp.cdr'
+    kept.export(str(dmg), 'UDZO', str(raw_path))
+    assert not raw_path.exists()
+    assert verify_udif(str(dmg), str(raw))
+
+
+def test_compressed_image_is_not_flat(tmp_path):
+    raw = tmp_path / 'disk.raw'
+    raw.write_bytes(b'Potter' * 8192)
+    write_udif(str(raw), str(tmp_path / 'disk.dmg'), chunk_sectors=8)
+    assert UDIFImage(str(tmp_path / 'disk.dmg')).flat_data_offset() is None
+
+
+def test_image_is_rebuilt_after_many_updates(kept):
+    os.makedirs(kept.cache_dir)
+    open(kept.rw_image, 'wb').close()
+    kept.state = {'layout_key': 'k', 'filesystem': 'HFS+', 'updates': 0, 'manifest': {}}
+    assert kept.can_update('k')
+    assert not kept.can_update('other')
+
+    kept.state['updates'] = REBUILD_AFTER_UPDATES
+    assert not kept.can_update('k')
+
+    # Images from before HFS+ was enforced are rebuilt too
+    kept.state = {'layout_key': 'k', 'manifest': {}}
+    assert not kept.can_update('k')
@@ -0,0 +1,57 @@
+"""Round trips of the generated DMG .DS_Store"""
+
+import plistlib
+
+import pytest
+
+from scripts.dsstore_writer import (DSStoreRecord, create_dmg_layout, decode_icon_location, read_alias_paths,
+                                    read_ds_store, write_ds_store)
+
+
+def test_records_round_trip_in_finder_order(tmp_path):
+    records = [
+        DSStoreRecord('Potter.app', 'Iloc', 'blob', b'\x00\x01\x02'),
+        DSStoreRecord('.', 'vSrn', 'long', 1),
+        DSStoreRecord('Applications', 'ptbN', 'ustr', 'Programme'),
+        DSStoreRecord('.', 'ICVO', 'bool', True),
+        DSStoreRecord('applications', 'modD', 'dutc', 1 << 40),
+        DSStoreRecord('.', 'vstl', 'type', 'icnv'),
+    ]
+    path = str(tmp_path / '.DS_Store')
+    write_ds_store(path, records)
+
+    read = read_ds_store(path)
+    expected = sorted(records, key=DSStoreRecord.sort_key)
+    assert [(r.filename, r.code, r.type_code, r.value) for r in read] == \
+        [(r.filename, r.code, r.type_code, r.value) for r in expected]
+
+
+def test_unsupported_record_type_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_ds_store(str(tmp_path / '.DS_Store'), [DSStoreRecord('.', 'xxxx', 'nope', 0)])
+
+
+def test_dmg_layout_round_trip(tmp_path):
+    background = tmp_path / 'background.png'
+    background.write_bytes(b'\x89PNG')
+    source = tmp_path / 'dmg'
+    source.mkdir()
+
+    ds_store = create_dmg_layout(str(source), 'Potter', {'Potter.app': (140, 200), 'Applications': (420, 200)},
+                                 (200, 120, 760, 520), 128, str(background))
+
+    assert (source / '.background' / 'background.png').read_bytes() == b'\x89PNG'
+    records = {(r.filename, r.code): r for r in read_ds_store(ds_store)}
+    assert decode_icon_location(records[('Potter.app', 'Iloc')]) == (140, 200)
+    assert decode_icon_location(records[('Applications', 'Iloc')]) == (420, 200)
+
+    window = plistlib.loads(records[('.', 'bwsp')].value)
+    assert window['WindowBounds'] == '{{200, 120}, {560, 400}}'
+
+    view = plistlib.loads(records[('.', 'icvp')].value)
+    assert view['iconSize'] == 128.0 and view['backgroundType'] == 2
+    assert read_alias_paths(view['backgroundImageAlias']) == {
+        'volume_name': 'Potter',
+        'path': '/.background/background.png',
+        'mount_point': '/Volumes/Potter',
+    }
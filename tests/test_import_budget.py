@@ -0,0 +1,15 @@
+"""No potter-tools subcommand may import an optional dependency at startup
+
+Import times themselves are checked by `make check-imports`; wall-clock
+budgets are too noisy to assert inside the test suite.
+"""
+
+import pytest
+
+from scripts import cli
+
+
+@pytest.mark.parametrize('command', sorted(cli.COMMANDS))
+def test_command_defers_optional_dependencies(command):
+    _, imported = cli.measure_import(cli.COMMANDS[command][0])
+    assert not [module for module in cli.DEFERRED_MODULES if module in imported]
@@ -0,0 +1,98 @@
+"""Submit, poll and staple against a stand-in notary service"""
+
+import pytest
+
+from scripts.notarization_manager import (STATUS_ACCEPTED, STATUS_IN_PROGRESS, NotarizationJournal,
+                                          NotarizationManager, TicketCache)
+
+
+class FakeNotary:
+    """Accepts after a number of polls; stapling can be made to fail"""
+
+    def __init__(self, polls=2, verdict=STATUS_ACCEPTED, staples=True):
+        self.polls = polls
+        self.verdict = verdict
+        self.staples = staples
+        self.submitted = []
+        self.stapled = []
+
+    def submit(self, artifact_path):
+        self.submitted.append(artifact_path)
+        return f"sub-{len(self.submitted)}"
+
+    def status(self, submission_id):
+        self.polls -= 1
+        return STATUS_IN_PROGRESS if self.polls > 0 else self.verdict
+
+    def log(self, submission_id):
+        return '{"issues": []}'
+
+    def staple(self, path):
+        self.stapled.append(path)
+        return self.staples
+
+    def validate(self, path):
+        return self.staples
+
+
+@pytest.fixture(autouse=True)
+def build_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('POTTER_BUILD_CACHE', str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / 'Potter.dmg'
+    path.write_bytes(b'dmg')
+    return str(path)
+
+
+def _manager(backend, cdhash=None):
+    return NotarizationManager(backend, NotarizationJournal(), poll_interval=0, sleep=lambda _: None,
+                               ticket_cache=TicketCache(), cdhash_for=lambda path: cdhash)
+
+
+def test_accepted_submission_is_stapled_and_journaled(artifact):
+    backend = FakeNotary()
+    manager = _manager(backend)
+
+    assert manager.start(artifact, 'hash').finish()
+    assert backend.stapled == [artifact]
+    [entry] = NotarizationJournal().load()
+    assert entry.status == STATUS_ACCEPTED and entry.stapled and entry.finished
+
+
+def test_failed_staple_fails_the_notarization(artifact):
+    backend = FakeNotary(staples=False)
+    manager = _manager(backend)
+
+    assert not manager.start(artifact, 'hash').finish()
+    # Accepted but unstapled stays pending so --resume can retry the staple
+    [entry] = NotarizationJournal().pending()
+    assert entry.status == STATUS_ACCEPTED and not entry.stapled
+
+
+def test_rejected_submission_is_not_stapled(artifact):
+    backend = FakeNotary(verdict='Invalid')
+    assert not _manager(backend).start(artifact, 'hash').finish()
+    assert backend.stapled == []
+
+
+def test_identical_content_resumes_the_earlier_submission(artifact):
+    backend = FakeNotary(staples=False)
+    _manager(backend).start(artifact, 'hash').finish()
+
+    backend.staples = True
+    assert _manager(backend).resume()
+    assert _manager(backend).submit(artifact, 'hash').submission_id == 'sub-1'
+    assert backend.submitted == [artifact]
+
+
+def test_cached_ticket_skips_the_upload(artifact):
+    backend = FakeNotary()
+    assert _manager(backend, cdhash='abc').start(artifact, 'hash').finish()
+
+    backend.submitted.clear()
+    submission = _manager(backend, cdhash='abc').submit(artifact, 'other-hash')
+    assert submission.from_cache
+    assert backend.submitted == []
@@ -0,0 +1,22 @@
+"""The release flow around its background build"""
+
+from argparse import Namespace
+
+from scripts import release_manager
+from scripts.release_manager import ReleaseManager
+
+
+def test_build_that_cannot_start_ends_the_release_before_notes(monkeypatch):
+    versions = []
+    monkeypatch.setattr(release_manager, 'get_current_version', lambda: '2.1.0')
+    monkeypatch.setattr(release_manager, 'set_version', versions.append)
+
+    manager = ReleaseManager(interactive=False)
+    monkeypatch.setattr(manager.app_builder, 'start_build', lambda: None)
+
+    notes_requested = []
+    monkeypatch.setattr(manager, '_get_release_notes', lambda *args: notes_requested.append(args))
+
+    assert manager.run_release(Namespace(version='2.2.0')) is False
+    assert not notes_requested
+    assert versions == ['2.2.0', '2.1.0']
@@ -0,0 +1,82 @@
+"""Level-by-level, batched signing against a fake codesign backend"""
+
+import threading
+
+from scripts.signing_utils import SigningComponent, SigningResult, SigningScheduler, attribute_batch_output
+
+
+class FakeBackend:
+    """Records every invocation; paths in fail_in_batch only fail when batched"""
+
+    def __init__(self, fail_in_batch=(), fail=()):
+        self.fail_in_batch = set(fail_in_batch)
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def sign(self, component):
+        with self._lock:
+            self.calls.append([component.path])
+        return SigningResult(component, component.path not in self.fail)
+
+    def sign_batch(self, components):
+        with self._lock:
+            self.calls.append([c.path for c in components])
+        return [SigningResult(c, c.path not in self.fail and c.path not in self.fail_in_batch)
+                for c in components]
+
+
+def _plan():
+    return [
+        SigningComponent('Potter.app', 'app', 0, entitlements='potter.entitlements'),
+        SigningComponent('Potter.app/Contents/Frameworks/A.framework', 'framework', 2),
+        SigningComponent('Potter.app/Contents/Frameworks/B.framework', 'framework', 2),
+        SigningComponent('Potter.app/Contents/Frameworks/C.framework', 'framework', 2),
+        SigningComponent('Potter.app/Contents/MacOS/helper', 'binary', 1, entitlements='helper.entitlements'),
+    ]
+
+
+def test_levels_are_signed_deepest_first_in_shared_batches():
+    backend = FakeBackend()
+    assert SigningScheduler(backend, max_workers=4).run(_plan())
+
+    assert [sorted(call) for call in backend.calls] == [
+        ['Potter.app/Contents/Frameworks/A.framework',
+         'Potter.app/Contents/Frameworks/B.framework',
+         'Potter.app/Contents/Frameworks/C.framework'],
+        ['Potter.app/Contents/MacOS/helper'],
+        ['Potter.app'],
+    ]
+
+
+def test_batches_respect_options_and_size():
+    plan = _plan()[1:4] + [SigningComponent('Potter.app/Contents/Frameworks/D.framework', 'framework', 2,
+                                            runtime=False)]
+    batches = SigningScheduler(FakeBackend(), batch_size=2).batches(plan)
+    assert [[c.name for c in batch] for batch in batches] == [
+        ['A.framework', 'B.framework'], ['C.framework'], ['D.framework'],
+    ]
+
+
+def test_failed_batch_member_is_retried_alone():
+    backend = FakeBackend(fail_in_batch={'Potter.app/Contents/Frameworks/B.framework'})
+    assert SigningScheduler(backend).run(_plan())
+    assert ['Potter.app/Contents/Frameworks/B.framework'] in backend.calls
+
+
+def test_failure_stops_before_outer_levels():
+    backend = FakeBackend(fail={'Potter.app/Contents/MacOS/helper'})
+    assert not SigningScheduler(backend).run(_plan())
+    assert ['Potter.app'] not in backend.calls
+
+
+def test_batch_output_blames_only_the_failing_path():
+    components = _plan()[1:4]
+    output = '\n'.join([
+        'Potter.app/Contents/Frameworks/A.framework: signed bundle with Mach-O universal',
+        'Potter.app/Contents/Frameworks/B.framework: errSecInternalComponent',
+        'Potter.app/Contents/Frameworks/C.framework: signed bundle with Mach-O universal',
+    ])
+    results = attribute_batch_output(components, 1, output)
+    assert [r.success for r in results] == [True, False, True]
+    assert results[1].output == 'errSecInternalComponent'
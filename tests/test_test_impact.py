@@ -0,0 +1,66 @@
+"""Test selection from the changes since the last green run"""
+
+import subprocess
+import time
+
+import pytest
+
+from scripts.test_impact import ImpactState, plan_test_selection
+
+SOURCES = {
+    'Sources/Potter/Hotkeys.swift': 'struct HotkeyParser {\n  func parse() {}\n}\n',
+    'Sources/Potter/Settings.swift': 'class SettingsStore {\n  let parser = HotkeyParser()\n}\n',
+    'Sources/Potter/Clipboard.swift': 'func readClipboard() -> String { "" }\n',
+    'Sources/Potter/Menu.swift': 'struct MenuModel {\n  let text = readClipboard()\n}\n',
+    'Tests/PotterTests/HotkeyTests.swift': 'final class HotkeyTests {\n  let p = HotkeyParser()\n}\n',
+    'Tests/PotterTests/SettingsTests.swift': 'final class SettingsTests {\n  let s = SettingsStore()\n}\n',
+    'Tests/PotterTests/MenuTests.swift': 'final class MenuTests {\n  let m = MenuModel()\n}\n',
+}
+
+
+def _git(package, *args):
+    subprocess.run(['git', *args], cwd=package, check=True, capture_output=True)
+
+
+@pytest.fixture
+def package(tmp_path):
+    package = tmp_path / 'swift-potter'
+    for path, code in SOURCES.items():
+        (package / path).parent.mkdir(parents=True, exist_ok=True)
+        (package / path).write_text(code)
+    _git(package, 'init', '-q')
+    _git(package, 'add', '.')
+    _git(package, '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'green')
+    return package
+
+
+@pytest.fixture
+def state(tmp_path, package):
+    state = ImpactState(str(tmp_path / 'state'))
+    head = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=package, capture_output=True, text=True).stdout.strip()
+    state.data = {'last_green': head, 'runs_since_full': 0, 'last_full': time.time()}
+    return state
+
+
+def test_unchanged_tree_runs_nothing(package, state):
+    assert plan_test_selection(str(package), state) == set()
+
+
+def test_change_selects_dependent_suites(package, state):
+    (package / 'Sources/Potter/Hotkeys.swift').write_text('struct HotkeyParser {\n  func parse() { }\n}\n')
+    assert plan_test_selection(str(package), state) == {'HotkeyTests', 'SettingsTests'}
+
+
+def test_free_functions_link_files(package, state):
+    (package / 'Sources/Potter/Clipboard.swift').write_text('func readClipboard() -> String { "x" }\n')
+    assert plan_test_selection(str(package), state) == {'MenuTests'}
+
+
+def test_deleted_source_runs_everything(package, state):
+    (package / 'Sources/Potter/Hotkeys.swift').unlink()
+    assert plan_test_selection(str(package), state) is None
+
+
+def test_renamed_source_runs_everything(package, state):
+    _git(package, 'mv', 'Sources/Potter/Settings.swift', 'Sources/Potter/SettingsStore.swift')
+    assert plan_test_selection(str(package), state) is None
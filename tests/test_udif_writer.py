@@ -0,0 +1,64 @@
+"""Raw image -> UDIF -> raw image round trips through the native writer"""
+
+import os
+
+import pytest
+
+from scripts.udif_writer import SECTOR_SIZE, UDIFImage, verify_udif, write_udif
+
+CHUNK_SECTORS = 8
+
+
+@pytest.fixture
+def raw_image(tmp_path):
+    """Random, zeroed and compressible chunks, ending in a partial chunk"""
+    chunk = CHUNK_SECTORS * SECTOR_SIZE
+    data = os.urandom(chunk) + bytes(chunk) + b'Potter ' * (chunk // 7) + bytes(chunk % 7) + os.urandom(SECTOR_SIZE * 3)
+    path = tmp_path / 'image.cdr'
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize('image_format', ['UDZO', 'UDBZ', 'ULMO'])
+def test_round_trip(tmp_path, raw_image, image_format):
+    dmg = str(tmp_path / 'image.dmg')
+    write_udif(raw_image, dmg, image_format, max_workers=2, chunk_sectors=CHUNK_SECTORS)
+
+    assert verify_udif(dmg, raw_image)
+    extracted = tmp_path / 'extracted.cdr'
+    UDIFImage(dmg).extract(str(extracted))
+    assert extracted.read_bytes() == open(raw_image, 'rb').read()
+
+
+def test_corruption_is_detected(tmp_path, raw_image):
+    dmg = tmp_path / 'image.dmg'
+    write_udif(raw_image, str(dmg), chunk_sectors=CHUNK_SECTORS)
+
+    data = bytearray(dmg.read_bytes())
+    data[10] ^= 0xFF
+    dmg.write_bytes(bytes(data))
+    assert not verify_udif(str(dmg))
+
+
+def test_unchanged_chunks_are_reused(tmp_path, raw_image, capsys):
+    first, index = str(tmp_path / 'first.dmg'), str(tmp_path / 'chunks.json')
+    write_udif(raw_image, first, chunk_sectors=CHUNK_SECTORS, index_path=index)
+
+    # Change only the last sector; the earlier chunks can be copied as they are
+    with open(raw_image, 'r+b') as f:
+        f.seek(-SECTOR_SIZE, os.SEEK_END)
+        f.write(os.urandom(SECTOR_SIZE))
+
+    second = str(tmp_path / 'second.dmg')
+    write_udif(raw_image, second, chunk_sectors=CHUNK_SECTORS, reuse=(first, index),
+               index_path=str(tmp_path / 'next.json'))
+    assert verify_udif(second, raw_image)
+    # The random and text chunks are copied; zeros need no data, the tail changed
+    assert 'Reused 2 of 4 compressed chunks' in capsys.readouterr().out
+
+
+def test_rejects_partial_sectors(tmp_path):
+    raw = tmp_path / 'odd.cdr'
+    raw.write_bytes(b'x' * (SECTOR_SIZE + 1))
+    with pytest.raises(ValueError):
+        write_udif(str(raw), str(tmp_path / 'odd.dmg'))
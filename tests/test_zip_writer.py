@@ -0,0 +1,122 @@
+"""Archives from the parallel writer read back like ditto's"""
+
+import os
+import stat
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+from scripts import zip_writer
+from scripts.zip_writer import (APPLEDOUBLE_MAGIC, MAX_IN_FLIGHT_FACTOR, StreamingZipWriter, crc32_combine,
+                                create_zip)
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    """A small app bundle with an executable, a multi-chunk file and symlinks"""
+    app = tmp_path / 'Potter.app'
+    (app / 'Contents' / 'MacOS').mkdir(parents=True)
+    (app / 'Contents' / 'Frameworks' / 'Kit.framework' / 'Versions' / 'A').mkdir(parents=True)
+    (app / 'Contents' / 'Info.plist').write_text('<plist/>')
+    binary = app / 'Contents' / 'MacOS' / 'Potter'
+    binary.write_bytes(os.urandom(CHUNK * 5 + 123))
+    binary.chmod(0o755)
+    (app / 'Contents' / 'Empty').write_bytes(b'')
+    framework = app / 'Contents' / 'Frameworks' / 'Kit.framework'
+    (framework / 'Versions' / 'A' / 'Kit').write_bytes(b'kit' * 5000)
+    os.symlink('A', framework / 'Versions' / 'Current')
+    os.symlink('Versions/Current/Kit', framework / 'Kit')
+    return app
+
+
+def _mode(info):
+    return info.external_attr >> 16
+
+
+def test_round_trip_keeps_contents_modes_and_symlinks(tmp_path, bundle):
+    archive = tmp_path / 'Potter.zip'
+    with open(archive, 'wb') as f:
+        StreamingZipWriter(f, max_workers=3, chunk_size=CHUNK).write_tree(str(bundle))
+
+    with zipfile.ZipFile(archive) as z:
+        assert z.testzip() is None
+        infos = {info.filename: info for info in z.infolist()}
+
+        assert 'Potter.app/' in infos and stat.S_ISDIR(_mode(infos['Potter.app/']))
+        binary = infos['Potter.app/Contents/MacOS/Potter']
+        assert stat.S_IMODE(_mode(binary)) == 0o755
+        assert z.read(binary) == (bundle / 'Contents' / 'MacOS' / 'Potter').read_bytes()
+        assert z.read('Potter.app/Contents/Empty') == b''
+
+        current = infos['Potter.app/Contents/Frameworks/Kit.framework/Versions/Current']
+        assert stat.S_ISLNK(_mode(current))
+        assert z.read(current) == b'A'
+        link = infos['Potter.app/Contents/Frameworks/Kit.framework/Kit']
+        assert z.read(link) == b'Versions/Current/Kit'
+        # Symlinked directories are stored as links, not followed
+        assert not [name for name in infos if name.startswith('Potter.app/Contents/Frameworks/Kit.framework/Versions/Current/')]
+
+
+def test_extended_attributes_become_appledouble_entries(tmp_path, bundle):
+    plist = bundle / 'Contents' / 'Info.plist'
+    try:
+        os.setxattr(plist, 'user.potter.test', b'quarantine-free')
+    except (AttributeError, OSError):
+        pytest.skip('extended attributes not supported here')
+
+    archive = tmp_path / 'Potter.zip'
+    create_zip(str(bundle), str(archive), max_workers=2)
+
+    with zipfile.ZipFile(archive) as z:
+        double = z.read('Potter.app/Contents/._Info.plist')
+    assert struct.unpack('>I', double[:4])[0] == APPLEDOUBLE_MAGIC
+    assert b'user.potter.test\0' in double and double.endswith(b'quarantine-free')
+
+
+def test_keep_parent_can_be_dropped(tmp_path, bundle):
+    archive = tmp_path / 'Contents.zip'
+    create_zip(str(bundle), str(archive), max_workers=1, keep_parent=False)
+    with zipfile.ZipFile(archive) as z:
+        assert 'Contents/Info.plist' in z.namelist()
+        assert not [name for name in z.namelist() if name.startswith('Potter.app')]
+
+
+def test_crc32_combine_matches_zlib():
+    a, b = os.urandom(1000), os.urandom(CHUNK + 7)
+    assert crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)) == zlib.crc32(a + b)
+    assert crc32_combine(zlib.crc32(a), zlib.crc32(b''), 0) == zlib.crc32(a)
+
+
+def test_chunks_in_flight_are_bounded(tmp_path, bundle, monkeypatch):
+    counts = {'in_flight': 0, 'peak': 0}
+
+    class CountingExecutor(zip_writer.ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            counts['in_flight'] += 1
+            counts['peak'] = max(counts['peak'], counts['in_flight'])
+            return super().submit(*args, **kwargs)
+
+    write_chunk = StreamingZipWriter._write_chunk
+
+    def counting_write_chunk(self, entry, future, first, last):
+        counts['in_flight'] -= future is not None
+        return write_chunk(self, entry, future, first, last)
+
+    monkeypatch.setattr(zip_writer, 'ThreadPoolExecutor', CountingExecutor)
+    monkeypatch.setattr(StreamingZipWriter, '_write_chunk', counting_write_chunk)
+
+    (bundle / 'Contents' / 'Resources').mkdir()
+    (bundle / 'Contents' / 'Resources' / 'Large').write_bytes(os.urandom(CHUNK * 64))
+    archive = tmp_path / 'Potter.zip'
+    with open(archive, 'wb') as f:
+        StreamingZipWriter(f, max_workers=2, chunk_size=CHUNK).write_tree(str(bundle))
+
+    # The window is drained as soon as it exceeds its limit
+    assert counts['peak'] <= 2 * MAX_IN_FLIGHT_FACTOR + 1
+    assert counts['in_flight'] == 0
+    with zipfile.ZipFile(archive) as z:
+        assert z.testzip() is None